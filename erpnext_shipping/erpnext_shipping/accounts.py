@@ -0,0 +1,203 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Several accounts per shipping provider.
+
+Besides the credentials of its settings, LetMeShip and SendCloud can have additional
+accounts, each optionally reserved for one company. Every account gets its own connection
+pool and request budget. Interactive calls go to the least loaded eligible account,
+background jobs rotate through them. A booked Shipment keeps its account, so that its
+label and tracking are requested with the account that booked it.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+DEFAULT_ACCOUNT = "Default"
+LOAD_KEY = "erpnext_shipping:account_load"
+BUDGET_WINDOW = 60  # seconds
+IN_FLIGHT_TTL = 5 * 60  # seconds, in case a worker dies mid-request
+
+
+class ProviderAccount(NamedTuple):
+	provider: str
+	name: str
+	api_key: str
+	api_secret: str
+	company: str | None = None
+	requests_per_minute: int = 0  # 0 for no limit
+
+
+def get_accounts(provider: str, settings, api_key: str, api_secret: str) -> list[ProviderAccount]:
+	"""Return the enabled accounts of a provider, the one of its settings first.
+
+	`api_key` and `api_secret` are the credentials stored in the settings themselves.
+	"""
+	accounts = []
+	if api_key:
+		accounts.append(
+			ProviderAccount(
+				provider, DEFAULT_ACCOUNT, api_key, api_secret, None, cint(settings.requests_per_minute)
+			)
+		)
+
+	for row in settings.get("accounts") or []:
+		if row.enabled:
+			accounts.append(
+				ProviderAccount(
+					provider,
+					row.account_name,
+					row.api_key,
+					row.get_password("api_secret"),
+					row.company,
+					cint(row.requests_per_minute),
+				)
+			)
+
+	return accounts
+
+
+def get_account(
+	accounts: list[ProviderAccount], account_name: str | None = None, company: str | None = None
+) -> ProviderAccount:
+	"""Return the account named `account_name`, or pick one for `company`.
+
+	Accounts reserved for `company` are preferred over shared ones.
+	"""
+	if not accounts:
+		frappe.throw(_("No account has been set up for this provider."), title=_("Mandatory"))
+
+	provider = accounts[0].provider
+	if account_name:
+		for account in accounts:
+			if account.name == account_name:
+				return account
+		frappe.throw(
+			_("{0} account {1} does not exist or is disabled.").format(provider, frappe.bold(account_name))
+		)
+
+	eligible = [account for account in accounts if company and account.company == company] or [
+		account for account in accounts if not account.company
+	]
+	if not eligible:
+		frappe.throw(_("No {0} account is available for company {1}.").format(provider, company))
+	if len(eligible) == 1:
+		return eligible[0]
+
+	load = dict(zip(eligible, get_loads(eligible), strict=True))
+	available = [
+		account
+		for account in eligible
+		if not account.requests_per_minute or load[account][1] < account.requests_per_minute
+	] or eligible
+
+	if getattr(frappe.local, "request", None):
+		# interactive: fewest requests in flight, then most budget left
+		return min(
+			available,
+			key=lambda account: (
+				load[account][0],
+				load[account][1] / account.requests_per_minute if account.requests_per_minute else 0,
+			),
+		)
+
+	# background: spread over the accounts in turn
+	cache = frappe.cache()
+	turn = cache.incr(cache.make_key(f"{LOAD_KEY}:{provider}:turn"))
+	return available[turn % len(available)]
+
+
+def get_booking_account(account_name: str | None) -> str:
+	"""Return the account a booked Shipment was booked with.
+
+	Shipments booked before there were several accounts have none: they were booked with
+	the credentials of the settings.
+	"""
+	return account_name or DEFAULT_ACCOUNT
+
+
+def validate_account_company(account: ProviderAccount, company: str | None):
+	"""Make sure an account chosen by the client may be used for `company`."""
+	if account.company and account.company != company:
+		frappe.throw(
+			_("{0} account {1} is reserved for company {2}.").format(
+				account.provider, frappe.bold(account.name), frappe.bold(account.company)
+			),
+			frappe.PermissionError,
+		)
+
+
+def get_load_keys(account: ProviderAccount) -> tuple[str, str]:
+	cache = frappe.cache()
+	window = int(time.time() // BUDGET_WINDOW)
+	return (
+		cache.make_key(f"{LOAD_KEY}:{account.provider}:{account.name}:in_flight"),
+		cache.make_key(f"{LOAD_KEY}:{account.provider}:{account.name}:{window}"),
+	)
+
+
+def get_loads(accounts: list[ProviderAccount]) -> list[tuple[int, int]]:
+	"""Return the requests in flight and the requests of the current minute per account."""
+	pipeline = frappe.cache().pipeline(transaction=False)
+	for account in accounts:
+		for key in get_load_keys(account):
+			pipeline.get(key)
+	values = [cint(value) for value in pipeline.execute()]
+	return list(zip(values[::2], values[1::2], strict=True))
+
+
+@contextmanager
+def account_slot(account: ProviderAccount | None):
+	"""Count a request against the load and budget of `account`."""
+	if not account:
+		yield
+		return
+
+	cache = frappe.cache()
+	in_flight_key, budget_key = get_load_keys(account)
+	pipeline = cache.pipeline(transaction=False)
+	pipeline.incr(in_flight_key)
+	pipeline.expire(in_flight_key, IN_FLIGHT_TTL)
+	pipeline.incr(budget_key)
+	pipeline.expire(budget_key, BUDGET_WINDOW)
+	pipeline.execute()
+	try:
+		yield
+	finally:
+		cache.decr(in_flight_key)
+
+
+def count_request(account: ProviderAccount | None):
+	"""Count a request against the budget of `account`, e.g. the second one of a hedged call."""
+	if not account:
+		return
+
+	_in_flight_key, budget_key = get_load_keys(account)
+	pipeline = frappe.cache().pipeline(transaction=False)
+	pipeline.incr(budget_key)
+	pipeline.expire(budget_key, BUDGET_WINDOW)
+	pipeline.execute()
+
+
+def validate_accounts(settings):
+	"""Make sure the account names of a provider's settings are unique."""
+	names = {DEFAULT_ACCOUNT}
+	for row in settings.get("accounts") or []:
+		if row.account_name in names:
+			frappe.throw(
+				_("Row {0}: Account name {1} is already used.").format(row.idx, frappe.bold(row.account_name))
+			)
+		names.add(row.account_name)
+
+
+def get_shipment_company(shipment: str | None) -> str | None:
+	if not shipment:
+		return None
+	pickup_company, delivery_company = frappe.db.get_value(
+		"Shipment", shipment, ["pickup_company", "delivery_company"]
+	) or (None, None)
+	return pickup_company or delivery_company
@@ -0,0 +1,78 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Optional asyncio transport for provider requests.
+
+With httpx installed (`pip install "httpx[http2]"`) and "Use Async Transport" enabled in
+Shipping Settings, the tracking job and bulk label fetching send their provider requests
+concurrently from a single worker, multiplexed over HTTP/2 where the provider supports it.
+Everything touching the database stays sequential, before or after the requests.
+
+Async requests don't go through `single_flight`, which blocks on Redis.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any
+
+import frappe
+from frappe.utils import cint
+
+try:
+	import httpx
+except ImportError:
+	httpx = None
+
+try:
+	import h2  # noqa: F401 - enables HTTP/2 in httpx
+except ImportError:
+	HTTP2_AVAILABLE = False
+else:
+	HTTP2_AVAILABLE = True
+
+DEFAULT_MAX_IN_FLIGHT = 500
+REQUEST_TIMEOUT = 30  # seconds
+
+
+def is_async_enabled() -> bool:
+	return bool(httpx and frappe.db.get_single_value("Shipping Settings", "use_async_transport"))
+
+
+def get_max_in_flight() -> int:
+	return (
+		cint(frappe.db.get_single_value("Shipping Settings", "max_in_flight_requests"))
+		or DEFAULT_MAX_IN_FLIGHT
+	)
+
+
+def get_client(max_in_flight: int) -> "httpx.AsyncClient":
+	return httpx.AsyncClient(
+		http2=HTTP2_AVAILABLE,
+		timeout=REQUEST_TIMEOUT,
+		limits=httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight),
+	)
+
+
+def run_concurrently(
+	call: Callable[["httpx.AsyncClient", Any], Awaitable[Any]],
+	items: Iterable,
+	max_in_flight: int | None = None,
+) -> list:
+	"""Await `call(client, item)` for all items with at most `max_in_flight` at a time and
+	return the results in the order of `items`. A failed call returns its exception.
+	"""
+	return asyncio.run(_gather(call, list(items), max_in_flight or get_max_in_flight()))
+
+
+async def _gather(call, items: list, max_in_flight: int) -> list:
+	semaphore = asyncio.Semaphore(max_in_flight)
+
+	async with get_client(max_in_flight) as client:
+
+		async def limited(item):
+			# every call runs in its own context, give it its own flags too, so that the
+			# error `show_error_alert` reports in `frappe.flags` stays with its call
+			frappe.local.flags = frappe._dict(frappe.local.flags)
+			async with semaphore:
+				return await call(client, item)
+
+		return await asyncio.gather(*(limited(item) for item in items), return_exceptions=True)
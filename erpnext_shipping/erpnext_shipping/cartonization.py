@@ -0,0 +1,231 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Pack Delivery Note items into parcels before rating.
+
+Items are packed first-fit by decreasing volume. Each box is filled at its extreme points
+(the corners next to already placed items), trying every rotation of an item. Packed
+boxes are then swapped for the smallest box of the catalog that still holds their
+contents. The boxes come from Shipment Parcel Template, the item dimensions from custom
+fields on Item.
+
+Identical item sets are packed only once per process, so packing many similar Delivery
+Notes in one batch is cheap.
+"""
+
+import math
+from collections import Counter
+from functools import lru_cache
+from itertools import permutations
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+# (length, width, height, weight) of one unit, in cm and kg
+Piece = tuple[float, float, float, float]
+# (name, length, width, height, max weight), max weight 0 means no limit
+Box = tuple[str, float, float, float, float]
+
+PACKING_CACHE_SIZE = 4096
+WEIGHT_UOM = "Kg"
+
+
+class _OpenBox:
+	__slots__ = ("box", "placed", "points", "weight")
+
+	def __init__(self, box: Box):
+		self.box = box
+		self.placed = []  # (x, y, z, length, width, height, piece)
+		self.points = [(0.0, 0.0, 0.0)]
+		self.weight = 0.0
+
+	def place(self, piece: Piece) -> bool:
+		_name, box_length, box_width, box_height, max_weight = self.box
+		if max_weight and self.weight + piece[3] > max_weight:
+			return False
+
+		for point in sorted(self.points, key=lambda p: (p[2], p[1], p[0])):
+			x, y, z = point
+			for length, width, height in set(permutations(piece[:3])):
+				if x + length > box_length or y + width > box_width or z + height > box_height:
+					continue
+				if any(
+					x < px + pl
+					and px < x + length
+					and y < py + pw
+					and py < y + width
+					and z < pz + ph
+					and pz < z + height
+					for px, py, pz, pl, pw, ph, _piece in self.placed
+				):
+					continue
+
+				self.placed.append((x, y, z, length, width, height, piece))
+				self.points.remove(point)
+				self.points += [(x + length, y, z), (x, y + width, z), (x, y, z + height)]
+				self.weight += piece[3]
+				return True
+
+		return False
+
+	@property
+	def pieces(self) -> list[Piece]:
+		return [placed[-1] for placed in self.placed]
+
+
+def get_volume(dimensions) -> float:
+	return dimensions[0] * dimensions[1] * dimensions[2]
+
+
+def fill_box(box: Box, pieces: list[Piece]) -> _OpenBox | None:
+	"""Return the box with all pieces placed, or None if they don't fit."""
+	open_box = _OpenBox(box)
+	if all(open_box.place(piece) for piece in pieces):
+		return open_box
+
+
+@lru_cache(maxsize=PACKING_CACHE_SIZE)
+def pack_items(items: tuple[tuple[Piece, int], ...], boxes: tuple[Box, ...]) -> tuple[tuple, ...]:
+	"""Pack pieces with their quantities into boxes.
+
+	Returns one (length, width, height, weight) tuple per parcel. A piece that fits in no box
+	becomes a parcel of its own dimensions. Pass `items` sorted, so that equal item sets
+	share the cached result.
+	"""
+	boxes = sorted(boxes, key=lambda box: get_volume(box[1:4]))
+	pieces = sorted(
+		(piece for piece, qty in items for _i in range(qty)),
+		key=lambda piece: (get_volume(piece), piece[3]),
+		reverse=True,
+	)
+
+	open_boxes, parcels = [], []
+	for piece in pieces:
+		if any(open_box.place(piece) for open_box in open_boxes):
+			continue
+
+		for box in boxes:
+			open_box = fill_box(box, [piece])
+			if open_box:
+				open_boxes.append(open_box)
+				break
+		else:
+			parcels.append((*(math.ceil(side) for side in piece[:3]), piece[3]))
+
+	for open_box in open_boxes:
+		# a box opened for a large piece may end up far from full
+		for box in boxes:
+			if get_volume(box[1:4]) >= get_volume(open_box.box[1:4]):
+				break
+			smaller_box = fill_box(box, open_box.pieces)
+			if smaller_box:
+				open_box = smaller_box
+				break
+
+		_name, length, width, height, _max_weight = open_box.box
+		parcels.append((math.ceil(length), math.ceil(width), math.ceil(height), open_box.weight))
+
+	return tuple(parcels)
+
+
+def get_parcel_rows(parcels: tuple[tuple, ...]) -> list[dict]:
+	"""Group identical parcels into `shipment_parcel` rows."""
+	return [
+		{"length": length, "width": width, "height": height, "weight": flt(weight, 3), "count": count}
+		for (length, width, height, weight), count in Counter(
+			(length, width, height, flt(weight, 3)) for length, width, height, weight in parcels
+		).items()
+	]
+
+
+def get_box_catalog() -> tuple[Box, ...]:
+	return tuple(
+		(box.name, flt(box.length), flt(box.width), flt(box.height), flt(box.max_weight))
+		for box in frappe.get_all(
+			"Shipment Parcel Template", fields=["name", "length", "width", "height", "max_weight"]
+		)
+		if box.length and box.width and box.height
+	)
+
+
+@frappe.whitelist()
+def get_packed_parcels(delivery_notes) -> list[dict]:
+	"""Return the `shipment_parcel` rows for shipping the items of these Delivery Notes."""
+	delivery_notes = frappe.parse_json(delivery_notes)
+	for delivery_note in delivery_notes:
+		frappe.has_permission("Delivery Note", "read", doc=delivery_note, throw=True)
+
+	return pack_delivery_notes([delivery_notes])[0]
+
+
+def pack_delivery_notes(groups: list[list[str]], raise_exception: bool = True) -> list[list[dict] | None]:
+	"""Pack the items of each group of Delivery Notes into parcels.
+
+	Each group is shipped together. All groups are loaded with a few queries, independent of
+	their number. With `raise_exception` off, groups with items lacking dimensions yield None.
+	"""
+	delivery_notes = list({delivery_note for group in groups for delivery_note in group})
+	if not delivery_notes:
+		return [[] for _group in groups]
+
+	items_by_delivery_note = {}
+	for item in frappe.get_all(
+		"Delivery Note Item",
+		filters={"parenttype": "Delivery Note", "parent": ("in", delivery_notes)},
+		fields=["parent", "item_code", "stock_qty", "weight_per_unit", "weight_uom"],
+	):
+		items_by_delivery_note.setdefault(item.parent, []).append(item)
+
+	item_codes = list({item.item_code for items in items_by_delivery_note.values() for item in items})
+	dimensions = {
+		item.name: (flt(item.shipping_length), flt(item.shipping_width), flt(item.shipping_height))
+		for item in frappe.get_all(
+			"Item",
+			filters={"name": ("in", item_codes)},
+			fields=["name", "shipping_length", "shipping_width", "shipping_height"],
+		)
+	}
+	weight_factors = get_weight_factors(
+		{item.weight_uom for items in items_by_delivery_note.values() for item in items if item.weight_uom}
+	)
+	boxes = get_box_catalog()
+
+	packed = []
+	for group in groups:
+		quantities, missing = Counter(), set()
+		for delivery_note in group:
+			for item in items_by_delivery_note.get(delivery_note, []):
+				item_dimensions = dimensions.get(item.item_code)
+				if not item_dimensions or not all(item_dimensions):
+					missing.add(item.item_code)
+					continue
+
+				weight = flt(item.weight_per_unit) * weight_factors.get(item.weight_uom, 1)
+				quantities[(*item_dimensions, weight)] += cint(math.ceil(flt(item.stock_qty)))
+
+		if missing:
+			if raise_exception:
+				frappe.throw(
+					_("Please set the shipping dimensions of these Items: {0}").format(
+						", ".join(sorted(missing))
+					)
+				)
+			packed.append(None)
+			continue
+
+		packed.append(get_parcel_rows(pack_items(tuple(sorted(quantities.items())), boxes)))
+
+	return packed
+
+
+def get_weight_factors(uoms: set[str]) -> dict[str, float]:
+	"""Return the factor converting each weight UOM to kg."""
+	factors = {WEIGHT_UOM: 1}
+	for uom in uoms - {WEIGHT_UOM}:
+		factors[uom] = (
+			flt(
+				frappe.db.get_value("UOM Conversion Factor", {"from_uom": uom, "to_uom": WEIGHT_UOM}, "value")
+			)
+			or 1
+		)
+	return factors
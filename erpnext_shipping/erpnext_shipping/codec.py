@@ -0,0 +1,74 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""JSON encoding and decoding of provider payloads and responses.
+
+Uses orjson when it is installed and the standard library otherwise. Responses are decoded
+straight from their bytes, and large responses can be reduced to the fields that are
+actually used before they are cached or shared.
+"""
+
+import json
+from typing import Any
+
+import requests
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+
+def loads(data: bytes | str) -> Any:
+	if orjson:
+		return orjson.loads(data)
+	return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+	if orjson:
+		return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+	return json.dumps(obj, default=str, separators=(",", ":")).encode()
+
+
+def decode_response(response: requests.Response, fields: dict | None = None) -> Any:
+	"""Return the decoded body of a response, reduced to `fields` if given.
+
+	Raises `requests.exceptions.JSONDecodeError` like `response.json()` does.
+	"""
+	try:
+		data = loads(response.content)
+	except ValueError as e:
+		raise requests.exceptions.JSONDecodeError(str(e), response.text, 0, response=response) from e
+
+	return select_fields(data, fields) if fields else data
+
+
+def select_fields(data: Any, fields: dict | tuple | None) -> Any:
+	"""Reduce decoded JSON to the given fields.
+
+	`fields` maps a key to the fields to keep of its value, or to None to keep the value
+	as it is. A tuple keeps the listed keys as they are. Lists are reduced item by item.
+
+	>>> select_fields({"a": [{"b": 1, "c": 2}], "d": 3}, {"a": ("b",)})
+	{'a': [{'b': 1}]}
+	"""
+	if fields is None:
+		return data
+	if isinstance(data, list):
+		return [select_fields(item, fields) for item in data]
+	if not isinstance(data, dict):
+		return data
+	if isinstance(fields, dict):
+		return {
+			key: select_fields(data[key], sub_fields) for key, sub_fields in fields.items() if key in data
+		}
+	return {key: data[key] for key in fields if key in data}
+
+
+def encode_request(kwargs: dict) -> dict:
+	"""Replace the `json` argument of a `requests` call by an encoded body."""
+	payload = kwargs.pop("json", None)
+	if payload is not None:
+		kwargs["data"] = dumps(payload)
+		kwargs["headers"] = {**(kwargs.get("headers") or {}), "Content-Type": "application/json"}
+	return kwargs
@@ -0,0 +1,25 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_MAXSIZE = 16
+
+_sessions: dict[str, requests.Session] = {}
+
+
+def get_session(key: str) -> requests.Session:
+	"""Return a process-wide `requests.Session` for `key`.
+
+	Sessions keep their TCP and TLS connections alive between calls, so consecutive requests
+	to the same provider skip the handshake.
+	"""
+	session = _sessions.get(key)
+	if session is None:
+		session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+		session.mount("https://", adapter)
+		session.mount("http://", adapter)
+		_sessions[key] = session
+
+	return session
@@ -0,0 +1,238 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""Pick a shipping service without user interaction.
+
+Enabled rules are compiled once per site into plain Python predicates. The compiled rules
+are kept in process memory and rebuilt only after a rule has been saved or deleted, which
+is signalled through a version key in Redis.
+"""
+
+from typing import NamedTuple
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt
+
+from erpnext_shipping.erpnext_shipping.jobs import BULK, INTERACTIVE, enqueue_shipping_job
+
+RULES_VERSION_KEY = "erpnext_shipping:carrier_selection_rules_version"
+RULE_FIELDS = [
+	"name",
+	"destination_country",
+	"min_weight",
+	"max_weight",
+	"min_value_of_goods",
+	"max_value_of_goods",
+	"service_provider",
+	"carrier",
+	"preferred_only",
+	"max_price",
+]
+
+# site -> (version, compiled rules)
+_compiled_rules: dict[str, tuple[str, list["CompiledRule"]]] = {}
+
+
+class CarrierSelectionRule(Document):
+	def validate(self):
+		for min_field, max_field in (
+			("min_weight", "max_weight"),
+			("min_value_of_goods", "max_value_of_goods"),
+		):
+			if self.get(max_field) and flt(self.get(min_field)) > flt(self.get(max_field)):
+				frappe.throw(
+					_("{0} cannot be greater than {1}").format(
+						_(self.meta.get_label(min_field)), _(self.meta.get_label(max_field))
+					)
+				)
+
+	def on_update(self):
+		clear_compiled_rules()
+
+	def on_trash(self):
+		clear_compiled_rules()
+
+
+class CompiledRule(NamedTuple):
+	name: str
+	shipment_checks: tuple
+	service_checks: tuple
+
+	def applies_to(self, shipment: dict) -> bool:
+		return all(check(shipment) for check in self.shipment_checks)
+
+	def select_service(self, services: list[dict]) -> dict | None:
+		"""Return the cheapest service accepted by this rule."""
+		accepted = [service for service in services if all(check(service) for check in self.service_checks)]
+		return min(accepted, key=lambda service: flt(service["total_price"]), default=None)
+
+
+def compile_rule(rule: dict) -> CompiledRule:
+	"""Turn a rule into predicates, leaving out the conditions that are not set."""
+	shipment_checks, service_checks = [], []
+
+	if rule.get("destination_country"):
+		country = rule["destination_country"]
+		shipment_checks.append(lambda shipment: shipment["destination_country"] == country)
+	if rule.get("min_weight"):
+		min_weight = flt(rule["min_weight"])
+		shipment_checks.append(lambda shipment: shipment["weight"] >= min_weight)
+	if rule.get("max_weight"):
+		max_weight = flt(rule["max_weight"])
+		shipment_checks.append(lambda shipment: shipment["weight"] <= max_weight)
+	if rule.get("min_value_of_goods"):
+		min_value = flt(rule["min_value_of_goods"])
+		shipment_checks.append(lambda shipment: shipment["value_of_goods"] >= min_value)
+	if rule.get("max_value_of_goods"):
+		max_value = flt(rule["max_value_of_goods"])
+		shipment_checks.append(lambda shipment: shipment["value_of_goods"] <= max_value)
+
+	if rule.get("service_provider"):
+		provider = rule["service_provider"]
+		service_checks.append(lambda service: service["service_provider"] == provider)
+	if rule.get("carrier"):
+		carrier = rule["carrier"].casefold()
+		service_checks.append(lambda service: (service.get("carrier") or "").casefold() == carrier)
+	if rule.get("preferred_only"):
+		service_checks.append(lambda service: bool(service.get("is_preferred")))
+	if rule.get("max_price"):
+		max_price = flt(rule["max_price"])
+		service_checks.append(lambda service: flt(service["total_price"]) <= max_price)
+
+	return CompiledRule(rule["name"], tuple(shipment_checks), tuple(service_checks))
+
+
+def get_compiled_rules() -> list[CompiledRule]:
+	"""Return the enabled rules by descending priority, compiling them if they changed."""
+	cache = frappe.cache()
+	version = cache.get_value(RULES_VERSION_KEY)
+	if not version:
+		version = frappe.generate_hash(length=10)
+		cache.set_value(RULES_VERSION_KEY, version)
+
+	cached_version, rules = _compiled_rules.get(frappe.local.site, (None, None))
+	if cached_version != version:
+		rules = [
+			compile_rule(rule)
+			for rule in frappe.get_all(
+				"Carrier Selection Rule",
+				filters={"enabled": 1},
+				fields=RULE_FIELDS,
+				order_by="priority desc, creation asc",
+			)
+		]
+		_compiled_rules[frappe.local.site] = (version, rules)
+
+	return rules
+
+
+def clear_compiled_rules():
+	frappe.cache().delete_value(RULES_VERSION_KEY)
+
+
+def select_service(shipment: dict, services: list[dict], rules: list[CompiledRule] | None = None):
+	"""Return the name of the first rule that applies to the Shipment and yields a service,
+	and the service it selected.
+
+	`shipment` holds the `destination_country`, total `weight` and `value_of_goods`.
+	"""
+	if rules is None:
+		rules = get_compiled_rules()
+
+	for rule in rules:
+		if rule.applies_to(shipment):
+			service = rule.select_service(services)
+			if service:
+				return rule.name, service
+
+	return None, None
+
+
+def get_rule_context(shipment_doc) -> dict:
+	"""Return the properties of a Shipment that rules can check."""
+	return {
+		"destination_country": frappe.db.get_value("Address", shipment_doc.delivery_address_name, "country"),
+		"weight": sum(flt(parcel.weight) * (parcel.count or 1) for parcel in shipment_doc.shipment_parcel),
+		"value_of_goods": flt(shipment_doc.value_of_goods),
+	}
+
+
+def auto_book_shipment(doc, method=None):
+	"""Shipment `on_submit`: book the service selected by the rules in the background."""
+	if not frappe.db.get_single_value("Shipping Settings", "auto_book_on_submit"):
+		return
+
+	enqueue_shipping_job(
+		"erpnext_shipping.erpnext_shipping.doctype.carrier_selection_rule.carrier_selection_rule.book_shipments_by_rules",
+		INTERACTIVE,
+		shipments=[doc.name],
+		enqueue_after_commit=True,
+	)
+
+
+@frappe.whitelist()
+def enqueue_book_shipments_by_rules(shipments):
+	"""Book many submitted Shipments in the background, each with the service the rules select."""
+	shipments = frappe.parse_json(shipments)
+	for shipment in shipments:
+		frappe.has_permission("Shipment", "write", doc=shipment, throw=True)
+
+	enqueue_shipping_job(
+		"erpnext_shipping.erpnext_shipping.doctype.carrier_selection_rule.carrier_selection_rule.book_shipments_by_rules",
+		BULK,
+		shipments=shipments,
+	)
+
+
+def book_shipments_by_rules(shipments: list[str]) -> dict[str, str | None]:
+	"""Book each Shipment with the service selected by the rules.
+
+	Returns the rule used per Shipment, None where no rule applied or booking failed.
+	"""
+	from erpnext_shipping.erpnext_shipping.shipping import (
+		book_shipment,
+		fetch_shipping_rates,
+		get_shipment_rate_args,
+	)
+
+	rules = get_compiled_rules()
+	used_rules = {}
+	for shipment in shipments:
+		used_rules[shipment] = None
+		shipment_doc = frappe.get_doc("Shipment", shipment)
+		if shipment_doc.docstatus != 1 or shipment_doc.shipment_id:
+			continue
+
+		try:
+			services = fetch_shipping_rates(shipment=shipment, **get_shipment_rate_args(shipment_doc))
+			rule, service = select_service(get_rule_context(shipment_doc), services, rules)
+			booked = bool(service) and book_shipment(shipment_doc, service)
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(title="Shipping Error", reference_doctype="Shipment", reference_name=shipment)
+			continue
+
+		if booked:
+			# keep the record of the booking the provider made, whatever fails below
+			frappe.db.commit()
+			used_rules[shipment] = rule
+			comment = _("Booked {0} {1} as selected by Carrier Selection Rule {2}.").format(
+				service["carrier"], service["service_name"], rule
+			)
+		elif service:
+			# the provider error is in the Error Log
+			comment = _("Booking {0} {1} as selected by Carrier Selection Rule {2} failed.").format(
+				service["carrier"], service["service_name"], rule
+			)
+		else:
+			comment = _("No Carrier Selection Rule matched this Shipment.")
+
+		try:
+			shipment_doc.add_comment("Comment", comment)
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(title="Shipping Error", reference_doctype="Shipment", reference_name=shipment)
+
+	return used_rules
@@ -0,0 +1,53 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.doctype.carrier_selection_rule.carrier_selection_rule import (
+	compile_rule,
+	select_service,
+)
+
+SERVICES = [
+	{"service_provider": "SendCloud", "carrier": "DHL", "total_price": 6.5, "is_preferred": 0},
+	{"service_provider": "LetMeShip", "carrier": "DHL", "total_price": 7.2, "is_preferred": 1},
+	{"service_provider": "LetMeShip", "carrier": "UPS", "total_price": 12.0, "is_preferred": 1},
+]
+
+
+class TestCarrierSelectionRule(FrappeTestCase):
+	def get_rule(self, name, **conditions):
+		return compile_rule(frappe._dict(name=name, **conditions))
+
+	def test_first_applicable_rule_wins(self):
+		rules = [
+			self.get_rule("Heavy", min_weight=20, carrier="UPS"),
+			self.get_rule("Domestic", destination_country="Germany", preferred_only=1),
+			self.get_rule("Fallback"),
+		]
+		shipment = {"destination_country": "Germany", "weight": 2.0, "value_of_goods": 50.0}
+
+		rule, service = select_service(shipment, SERVICES, rules)
+		self.assertEqual(rule, "Domestic")
+		self.assertEqual(service["service_provider"], "LetMeShip")
+
+		rule, service = select_service({**shipment, "destination_country": "France"}, SERVICES, rules)
+		self.assertEqual(rule, "Fallback")
+		self.assertEqual(service["total_price"], 6.5)
+
+	def test_next_rule_when_no_service_qualifies(self):
+		rules = [
+			self.get_rule("Cheap UPS", carrier="ups", max_price=10),
+			self.get_rule("Any UPS", carrier="UPS"),
+		]
+		rule, service = select_service(
+			{"destination_country": "Germany", "weight": 1.0, "value_of_goods": 0.0}, SERVICES, rules
+		)
+		self.assertEqual(rule, "Any UPS")
+		self.assertEqual(service["total_price"], 12.0)
+
+	def test_no_rule_applies(self):
+		rules = [self.get_rule("Valuable", min_value_of_goods=500)]
+		shipment = {"destination_country": "Germany", "weight": 1.0, "value_of_goods": 50.0}
+		self.assertEqual(select_service(shipment, SERVICES, rules), (None, None))
@@ -0,0 +1,271 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""Local index of the parcel limits of providers, carriers and services.
+
+Limits are entered manually or seeded from the SendCloud catalog. Every service a provider
+quotes is added to the index together with the largest parcel it has quoted so far, as a
+reference for setting its limits. Providers whose limit the parcels exceed are not called,
+and services whose limit they exceed are dropped.
+"""
+
+from typing import NamedTuple
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt
+
+from erpnext_shipping.erpnext_shipping.write_buffer import flush_entries, push_entries
+
+LIMITS_CACHE_KEY = "erpnext_shipping:carrier_service_limits"
+OBSERVATIONS_KEY = "erpnext_shipping:service_limit_observations"
+CATALOG_LIMITS_KEY = "erpnext_shipping:sendcloud_catalog_limits"
+MAX_OBSERVATIONS = 10_000  # observations kept if the flush job doesn't run
+FLUSH_BATCH_SIZE = 1000
+OBSERVED_FIELDS = ("observed_weight", "observed_length", "observed_girth")
+LIMIT_FIELDS = [
+	"name",
+	"service_provider",
+	"carrier",
+	"service_name",
+	"source",
+	"max_weight",
+	"volumetric_divisor",
+	"max_length",
+	"max_girth",
+	"observed_weight",
+	"observed_length",
+	"observed_girth",
+]
+
+
+class CarrierServiceLimit(Document):
+	def validate(self):
+		if self.service_name and not self.carrier:
+			frappe.throw(_("Please set the Carrier of Service {0}").format(self.service_name))
+
+		duplicate = frappe.db.exists(
+			"Carrier Service Limit",
+			{
+				"service_provider": self.service_provider,
+				"carrier": self.carrier or ("is", "not set"),
+				"service_name": self.service_name or ("is", "not set"),
+				"name": ("!=", self.name),
+			},
+		)
+		if duplicate:
+			frappe.throw(_("Limits for this service already exist in {0}").format(duplicate))
+
+	def on_update(self):
+		clear_limits_cache()
+
+	def on_trash(self):
+		clear_limits_cache()
+
+
+class ParcelMeasures(NamedTuple):
+	"""Measures of all parcels of a Shipment, computed in one pass."""
+
+	weight: np.ndarray
+	volume: np.ndarray
+	length: float
+	girth: float
+
+
+def get_parcel_measures(parcels: list[dict]) -> ParcelMeasures:
+	dimensions = np.array(
+		[
+			[flt(parcel.get("length")), flt(parcel.get("width")), flt(parcel.get("height"))]
+			for parcel in parcels
+		]
+		or [[0.0, 0.0, 0.0]]
+	)
+	dimensions.sort(axis=1)
+	girth = dimensions[:, 2] + 2 * (dimensions[:, 0] + dimensions[:, 1])
+	return ParcelMeasures(
+		weight=np.array([flt(parcel.get("weight")) for parcel in parcels] or [0.0]),
+		volume=dimensions.prod(axis=1),
+		length=float(dimensions[:, 2].max()),
+		girth=float(girth.max()),
+	)
+
+
+def get_billable_weight(measures: ParcelMeasures, volumetric_divisor: int | None) -> float:
+	"""Return the billable weight of the heaviest parcel."""
+	if not volumetric_divisor:
+		return float(measures.weight.max())
+	return float(np.maximum(measures.weight, measures.volume / volumetric_divisor).max())
+
+
+def is_within_limit(limit: dict, measures: ParcelMeasures) -> bool:
+	if limit.max_weight and get_billable_weight(measures, limit.volumetric_divisor) > limit.max_weight:
+		return False
+	if limit.max_length and measures.length > limit.max_length:
+		return False
+	if limit.max_girth and measures.girth > limit.max_girth:
+		return False
+	return True
+
+
+def get_limit_key(service_provider: str, carrier: str | None = None, service_name: str | None = None):
+	return (service_provider, (carrier or "").casefold(), (service_name or "").casefold())
+
+
+def get_limits() -> dict[tuple, dict]:
+	"""Return all limits by (provider, carrier, service), loaded once until a limit changes."""
+	return frappe.cache().get_value(LIMITS_CACHE_KEY, generator=load_limits)
+
+
+def load_limits() -> dict[tuple, dict]:
+	return {
+		get_limit_key(limit.service_provider, limit.carrier, limit.service_name): limit
+		for limit in frappe.get_all("Carrier Service Limit", fields=LIMIT_FIELDS)
+	}
+
+
+def clear_limits_cache():
+	frappe.cache().delete_value(LIMITS_CACHE_KEY)
+
+
+def is_provider_eligible(service_provider: str, parcels: list[dict]) -> bool:
+	"""Whether the parcels are within the limit set for the provider as a whole."""
+	limit = get_limits().get(get_limit_key(service_provider))
+	return not limit or is_within_limit(limit, get_parcel_measures(parcels))
+
+
+def filter_services(services: list[dict], parcels: list[dict]) -> list[dict]:
+	"""Drop the services whose carrier or service limit the parcels exceed."""
+	limits = get_limits()
+	if not limits:
+		return services
+
+	measures = get_parcel_measures(parcels)
+	eligible = []
+	for service in services:
+		carrier_limit = limits.get(get_limit_key(service["service_provider"], service.get("carrier")))
+		service_limit = limits.get(
+			get_limit_key(service["service_provider"], service.get("carrier"), service.get("service_name"))
+		)
+		if all(is_within_limit(limit, measures) for limit in (carrier_limit, service_limit) if limit):
+			eligible.append(service)
+
+	return eligible
+
+
+def learn_service_limits(services: list[dict], parcels: list[dict]):
+	"""Record the largest parcel each service has quoted.
+
+	Services seen for the first time are added to the index. Only new services and services
+	quoting a larger parcel than before are recorded. Rate requests run concurrently, so the
+	observations are buffered and written by `flush_service_limits` alone.
+	"""
+	if not services:
+		return
+
+	limits = get_limits()
+	measures = get_parcel_measures(parcels)
+	observed = {
+		"observed_weight": float(measures.weight.max()),
+		"observed_length": measures.length,
+		"observed_girth": measures.girth,
+	}
+
+	observations = []
+	for service in services:
+		key = get_limit_key(service["service_provider"], service.get("carrier"), service.get("service_name"))
+		limit = limits.get(key)
+		if not limit or any(value > flt(limit[field]) for field, value in observed.items()):
+			observations.append(
+				{
+					"service_provider": service["service_provider"],
+					"carrier": service.get("carrier"),
+					"service_name": service.get("service_name"),
+					**observed,
+				}
+			)
+
+	push_entries(OBSERVATIONS_KEY, observations, MAX_OBSERVATIONS)
+
+
+def flush_service_limits():
+	"""Scheduled job: add the buffered observations and catalog limits to the index."""
+	flush_entries(OBSERVATIONS_KEY, FLUSH_BATCH_SIZE, write_observations)
+	flush_entries(CATALOG_LIMITS_KEY, FLUSH_BATCH_SIZE, write_catalog_limits)
+
+
+def write_observations(observations: list[dict]):
+	limits = load_limits()
+	for key, observation in merge_observations(observations).items():
+		limit = limits.get(key)
+		if not limit:
+			frappe.get_doc({"doctype": "Carrier Service Limit", "source": "Learned", **observation}).insert(
+				ignore_permissions=True
+			)
+			continue
+
+		values = {
+			field: observation[field] for field in OBSERVED_FIELDS if observation[field] > flt(limit[field])
+		}
+		if values:
+			frappe.db.set_value("Carrier Service Limit", limit.name, values)
+
+	clear_limits_cache()
+
+
+def merge_observations(observations: list[dict]) -> dict[tuple, dict]:
+	"""Merge the observations of the same service, keeping the largest value of each measure."""
+	merged = {}
+	for observation in observations:
+		key = get_limit_key(
+			observation["service_provider"], observation["carrier"], observation["service_name"]
+		)
+		if key not in merged:
+			merged[key] = dict(observation)
+			continue
+
+		for field in OBSERVED_FIELDS:
+			merged[key][field] = max(merged[key][field], observation[field])
+
+	return merged
+
+
+def seed_sendcloud_limits(methods: list[dict]):
+	"""Buffer the weight limits of the SendCloud shipping methods for `flush_service_limits`.
+
+	The catalog is fetched while rating, so the limits are not written right away.
+	"""
+	from erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud import SENDCLOUD_PROVIDER
+
+	push_entries(
+		CATALOG_LIMITS_KEY,
+		[
+			{
+				"service_provider": SENDCLOUD_PROVIDER,
+				"carrier": method.carrier,
+				"service_name": method.name,
+				"max_weight": method.max_weight,
+			}
+			for method in methods
+		],
+		MAX_OBSERVATIONS,
+	)
+
+
+def write_catalog_limits(catalog_limits: list[dict]):
+	limits = load_limits()
+	# the latest catalog wins
+	latest = {
+		get_limit_key(entry["service_provider"], entry["carrier"], entry["service_name"]): entry
+		for entry in catalog_limits
+	}
+	for key, entry in latest.items():
+		limit = limits.get(key)
+		if not limit:
+			frappe.get_doc(
+				{"doctype": "Carrier Service Limit", "source": "SendCloud Catalog", **entry}
+			).insert(ignore_permissions=True)
+		elif limit.source == "SendCloud Catalog" and flt(limit.max_weight) != flt(entry["max_weight"]):
+			frappe.db.set_value("Carrier Service Limit", limit.name, "max_weight", entry["max_weight"])
+
+	clear_limits_cache()
@@ -0,0 +1,85 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.doctype.carrier_service_limit import carrier_service_limit
+from erpnext_shipping.erpnext_shipping.doctype.carrier_service_limit.carrier_service_limit import (
+	flush_service_limits,
+	get_billable_weight,
+	get_parcel_measures,
+	is_within_limit,
+	merge_observations,
+	seed_sendcloud_limits,
+)
+
+PARCELS = [
+	{"length": 60, "width": 40, "height": 40, "weight": 8, "count": 1},
+	{"length": 20, "width": 100, "height": 10, "weight": 12, "count": 2},
+]
+
+
+class TestCarrierServiceLimit(FrappeTestCase):
+	def test_parcel_measures(self):
+		measures = get_parcel_measures(PARCELS)
+		self.assertEqual(measures.length, 100)
+		self.assertEqual(measures.girth, 220)  # 60 + 2 * (40 + 40)
+		self.assertEqual(get_billable_weight(measures, None), 12)
+		self.assertEqual(get_billable_weight(measures, 5000), 19.2)  # 60 * 40 * 40 / 5000
+
+	def test_limits(self):
+		measures = get_parcel_measures(PARCELS)
+		limit = frappe._dict(max_weight=15, volumetric_divisor=0, max_length=120, max_girth=0)
+		self.assertTrue(is_within_limit(limit, measures))
+
+		self.assertFalse(is_within_limit(frappe._dict(limit, volumetric_divisor=5000), measures))
+		self.assertFalse(is_within_limit(frappe._dict(limit, max_length=80), measures))
+		self.assertFalse(is_within_limit(frappe._dict(limit, max_girth=200), measures))
+
+	def test_merge_observations(self):
+		service = {"service_provider": "LetMeShip", "carrier": "DHL", "service_name": "Paket"}
+		merged = merge_observations(
+			[
+				{**service, "observed_weight": 5, "observed_length": 80, "observed_girth": 200},
+				{
+					**service,
+					"carrier": "dhl",
+					"observed_weight": 9,
+					"observed_length": 60,
+					"observed_girth": 150,
+				},
+				{
+					**service,
+					"service_name": "Express",
+					"observed_weight": 1,
+					"observed_length": 1,
+					"observed_girth": 1,
+				},
+			]
+		)
+		self.assertEqual(len(merged), 2)
+		paket = merged[("LetMeShip", "dhl", "paket")]
+		self.assertEqual(
+			(paket["observed_weight"], paket["observed_length"], paket["observed_girth"]), (9, 80, 200)
+		)
+
+	def test_catalog_limits_are_buffered(self):
+		methods = [
+			frappe._dict(carrier="dhl", name="DHL Paket 0-5kg", max_weight=5),
+			frappe._dict(carrier="dhl", name="DHL Paket 5-10kg", max_weight=10),
+		]
+		with patch.object(carrier_service_limit, "write_catalog_limits") as write_catalog_limits:
+			seed_sendcloud_limits(methods)
+			write_catalog_limits.assert_not_called()
+
+			with patch.object(carrier_service_limit, "write_observations"):
+				flush_service_limits()
+
+		(catalog_limits,) = write_catalog_limits.call_args.args
+		self.assertEqual(
+			[(limit["service_name"], limit["max_weight"]) for limit in catalog_limits],
+			[("DHL Paket 0-5kg", 5), ("DHL Paket 5-10kg", 10)],
+		)
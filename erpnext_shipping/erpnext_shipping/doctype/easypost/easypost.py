@@ -1,9 +1,565 @@
 # Copyright (c) 2024, Frappe and contributors
 # For license information, please see license.txt
 
-# import frappe
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import flt
+from frappe.utils.data import get_link_to_form
+
+from erpnext_shipping.erpnext_shipping.codec import decode_response, dumps
+from erpnext_shipping.erpnext_shipping.connection import get_session
+from erpnext_shipping.erpnext_shipping.doctype.shipping_api_log.shipping_api_log import get_api_logger
+from erpnext_shipping.erpnext_shipping.jobs import BULK, enqueue_shipping_job
+from erpnext_shipping.erpnext_shipping.singleflight import single_flight
+from erpnext_shipping.erpnext_shipping.utils import show_error_alert
+
+EASYPOST_PROVIDER = "EasyPost"
+BASE_URL = "https://api.easypost.com/v2"
+CM_PER_INCH = 2.54
+OUNCES_PER_KG = 35.27396
+RATE_CONCURRENCY = 8
+BATCH_POLL_INTERVAL = 2  # seconds
+BATCH_POLL_TIMEOUT = 300  # seconds
+HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
+# printer language: EasyPost file format and the label field with its URL
+RAW_LABEL_FORMATS = {"ZPL": ("ZPL", "label_zpl_url"), "EPL": ("EPL2", "label_epl2_url")}
+
+TRACKING_STATUS_MAP = {
+	"delivered": "Delivered",
+	"return_to_sender": "Returned",
+}
 
 
 class EasyPost(Document):
 	pass
+
+
+class EasyPostError(frappe.ValidationError):
+	pass
+
+
+class EasyPostUtils:
+	def __init__(
+		self, base_url: str, api_key: str, poll_interval: float = BATCH_POLL_INTERVAL, api_logger=None
+	):
+		self.base_url = base_url
+		self.api_key = api_key
+		self.poll_interval = poll_interval
+		self.api_logger = api_logger
+
+	def request(self, method: str, endpoint: str, json: dict | None = None, params: dict | None = None):
+		"""Make a request to EasyPost API.
+
+		Does not touch request-local state, so it is safe to call from worker threads.
+		"""
+		started = time.monotonic()
+		response = get_session(EASYPOST_PROVIDER).request(
+			method,
+			f"{self.base_url}/{endpoint}",
+			auth=(self.api_key, ""),
+			headers=HEADERS,
+			params=params,
+			data=dumps(json) if json is not None else None,
+		)
+		return self.handle_response(method, endpoint, started, response, json)
+
+	async def arequest(
+		self, client, method: str, endpoint: str, json: dict | None = None, params: dict | None = None
+	):
+		"""Make a request to EasyPost API with an `httpx.AsyncClient`, see `async_transport`."""
+		started = time.monotonic()
+		response = await client.request(
+			method,
+			f"{self.base_url}/{endpoint}",
+			auth=(self.api_key, ""),
+			headers=HEADERS,
+			params=params,
+			content=dumps(json) if json is not None else None,
+		)
+		return self.handle_response(method, endpoint, started, response, json)
+
+	def handle_response(self, method: str, endpoint: str, started: float, response, payload=None):
+		if self.api_logger:
+			self.api_logger.capture(method, endpoint, started, response, payload)
+
+		data = decode_response(response)
+		if "error" in data:
+			raise EasyPostError(f"EasyPost {endpoint}: {data['error'].get('message')}")
+
+		return data
+
+	def get_available_services(
+		self,
+		pickup_address,
+		delivery_address,
+		parcels: list[dict],
+		pickup_contact=None,
+		delivery_contact=None,
+		reference=None,
+	):
+		"""Rate all parcels at once through an EasyPost Order.
+
+		An Order holds one EasyPost shipment per parcel and returns rates summed over all of them.
+		"""
+		payload = {
+			"order": self.get_order_payload(
+				pickup_address, delivery_address, parcels, pickup_contact, delivery_contact, reference
+			)
+		}
+
+		try:
+			response_data = self.request("POST", "orders", json=payload)
+			return [
+				self.get_service_dict(rate, response_data["id"]) for rate in response_data.get("rates", [])
+			]
+		except Exception:
+			show_error_alert("fetching EasyPost prices", EASYPOST_PROVIDER, "orders")
+
+		return []
+
+	def get_batch_rates(self, orders: list[dict]) -> list[list[dict]]:
+		"""Rate many orders concurrently over the pooled connection.
+
+		`orders` are payloads as built by `get_order_payload`. The result has one list of
+		services per order, empty if that order could not be rated.
+		"""
+
+		def rate(order):
+			try:
+				response_data = self.request("POST", "orders", json={"order": order})
+			except Exception:
+				return []
+			return [
+				self.get_service_dict(rate, response_data["id"]) for rate in response_data.get("rates", [])
+			]
+
+		with ThreadPoolExecutor(max_workers=RATE_CONCURRENCY) as executor:
+			return list(executor.map(rate, orders))
+
+	def create_shipment(self, service_info):
+		"""Buy the selected rate of a previously rated Order."""
+		try:
+			response_data = self.request(
+				"POST",
+				f"orders/{service_info['order_id']}/buy",
+				json={"carrier": service_info["carrier_name"], "service": service_info["service_name"]},
+			)
+			shipments = response_data.get("shipments", [])
+			if not shipments:
+				frappe.throw(
+					_("EasyPost did not return any shipment for Order {0}").format(response_data["id"])
+				)
+
+			return self.get_shipment_info(shipments)
+		except Exception:
+			show_error_alert("creating EasyPost Shipment", EASYPOST_PROVIDER, "orders/buy")
+
+	def create_batch(self, shipments: list[dict]) -> dict:
+		"""Create many EasyPost shipments in one call and wait until they exist.
+
+		Every entry needs `carrier` and `service` set so the batch can be bought as a whole.
+		"""
+		batch = self.request("POST", "batches", json={"batch": {"shipments": shipments}})
+		batch = self.wait_for_batch(batch["id"], lambda b: b["state"] != "creating")
+		if batch["state"] == "creation_failed":
+			raise EasyPostError(f"EasyPost could not create batch {batch['id']}")
+		return batch
+
+	def buy_batch(self, batch_id: str) -> dict:
+		"""Purchase the labels of all shipments in a batch.
+
+		A batch in state `purchase_failed` may still have bought some shipments, check the
+		`batch_status` of each one.
+		"""
+		self.request("POST", f"batches/{batch_id}/buy")
+		batch = self.wait_for_batch(batch_id, lambda b: b["state"] in ("purchased", "purchase_failed"))
+		if not get_purchased_ids(batch):
+			raise EasyPostError(f"EasyPost could not buy any shipment of batch {batch_id}")
+		return batch
+
+	def get_batch_label(self, batch_id: str, file_format: str = "PDF") -> str:
+		"""Return the URL of one merged label file for all shipments in a batch."""
+		self.request("POST", f"batches/{batch_id}/label", json={"file_format": file_format})
+		batch = self.wait_for_batch(batch_id, lambda b: bool(b.get("label_url")))
+		return batch["label_url"]
+
+	def wait_for_batch(self, batch_id: str, is_ready) -> dict:
+		# Batches are processed asynchronously by EasyPost.
+		deadline = time.monotonic() + BATCH_POLL_TIMEOUT
+		while True:
+			batch = self.request("GET", f"batches/{batch_id}")
+			if is_ready(batch):
+				return batch
+			if time.monotonic() > deadline:
+				raise EasyPostError(f"EasyPost batch {batch_id} timed out in state {batch['state']}")
+			time.sleep(self.poll_interval)
+
+	def create_pickup(
+		self, shipment_ids: list[str], address, contact, carrier: str, start_at, end_at, reference=None
+	) -> dict | None:
+		"""Book one pickup of `carrier` for many EasyPost shipments.
+
+		Several shipments are put into a batch first, as a pickup is booked for one shipment
+		or one batch. The cheapest pickup rate of the carrier is bought.
+		"""
+		try:
+			if len(shipment_ids) == 1:
+				target = {"shipment": {"id": shipment_ids[0]}}
+			else:
+				batch = self.request(
+					"POST",
+					"batches",
+					json={"batch": {"shipments": [{"id": ship_id} for ship_id in shipment_ids]}},
+				)
+				batch = self.wait_for_batch(batch["id"], lambda b: b["state"] != "creating")
+				target = {"batch": {"id": batch["id"]}}
+
+			pickup = self.request(
+				"POST",
+				"pickups",
+				json={
+					"pickup": {
+						"reference": reference,
+						"address": self.get_address_dict(address, contact),
+						"min_datetime": start_at.isoformat(),
+						"max_datetime": end_at.isoformat(),
+						"is_account_address": False,
+						**target,
+					}
+				},
+			)
+			rates = [rate for rate in pickup.get("pickup_rates", []) if rate["carrier"] == carrier]
+			if not rates:
+				raise EasyPostError(f"EasyPost offers no pickup by {carrier}")
+
+			rate = min(rates, key=lambda rate: flt(rate["rate"]))
+			pickup = self.request(
+				"POST",
+				f"pickups/{pickup['id']}/buy",
+				json={"carrier": rate["carrier"], "service": rate["service"]},
+			)
+			return {
+				"pickup_id": pickup["id"],
+				"confirmation_number": pickup.get("confirmation"),
+				"pickup_amount": flt(rate["rate"]),
+			}
+		except Exception:
+			show_error_alert("booking EasyPost Pickup", EASYPOST_PROVIDER, "pickups")
+
+	def get_shipments(self, shipment_ids: list[str]) -> list[dict]:
+		"""Retrieve many EasyPost shipments concurrently."""
+		with ThreadPoolExecutor(max_workers=RATE_CONCURRENCY) as executor:
+			return list(
+				executor.map(lambda ship_id: self.request("GET", f"shipments/{ship_id}"), shipment_ids)
+			)
+
+	def get_label(self, shipment_id):
+		# Retrieve PDF label urls from EasyPost
+		try:
+			return [
+				self.request("GET", f"shipments/{ship_id}/label", params={"file_format": "PDF"})[
+					"postage_label"
+				]["label_pdf_url"]
+				for ship_id in shipment_id.split(", ")
+			]
+		except Exception:
+			show_error_alert("printing EasyPost Label", EASYPOST_PROVIDER, "shipments/label")
+
+	def get_raw_label(self, shipment_id, label_format: str) -> list[bytes] | None:
+		"""Return the labels of a shipment in a printer language, "ZPL" or "EPL"."""
+		file_format, url_field = RAW_LABEL_FORMATS[label_format]
+		try:
+			label_urls = [
+				self.request("GET", f"shipments/{ship_id}/label", params={"file_format": file_format})[
+					"postage_label"
+				][url_field]
+				for ship_id in shipment_id.split(", ")
+			]
+		except Exception:
+			show_error_alert("printing EasyPost Label", EASYPOST_PROVIDER, "shipments/label")
+			return
+
+		labels = [self.download_label(label_url) for label_url in label_urls]
+		if all(labels):
+			return labels
+
+	async def aget_label(self, client, shipment_id):
+		try:
+			responses = await asyncio.gather(
+				*(
+					self.arequest(client, "GET", f"shipments/{ship_id}/label", params={"file_format": "PDF"})
+					for ship_id in shipment_id.split(", ")
+				)
+			)
+			return [response["postage_label"]["label_pdf_url"] for response in responses]
+		except Exception:
+			show_error_alert("printing EasyPost Label", EASYPOST_PROVIDER, "shipments/label")
+
+	def download_label(self, label_url: str):
+		"""Download label from EasyPost."""
+		try:
+			resp = get_session(EASYPOST_PROVIDER).get(label_url)
+			resp.raise_for_status()
+			return resp.content
+		except Exception:
+			show_error_alert("downloading EasyPost Label", EASYPOST_PROVIDER, "label download")
+
+	async def adownload_label(self, client, label_url: str):
+		try:
+			resp = await client.get(label_url)
+			resp.raise_for_status()
+			return resp.content
+		except Exception:
+			show_error_alert("downloading EasyPost Label", EASYPOST_PROVIDER, "label download")
+
+	def get_tracking_data(self, shipment_id):
+		try:
+			# the daily job and users may refresh the same Shipment at the same time
+			trackers = [
+				single_flight(
+					EASYPOST_PROVIDER,
+					f"GET {self.base_url}/shipments/{ship_id}",
+					{"api_key": self.api_key},
+					lambda ship_id=ship_id: self.request("GET", f"shipments/{ship_id}"),
+				)["tracker"]
+				for ship_id in shipment_id.split(", ")
+			]
+			return self.get_tracking_dict(trackers)
+		except Exception:
+			show_error_alert("updating EasyPost Shipment", EASYPOST_PROVIDER, "shipments")
+
+	async def aget_tracking_data(self, client, shipment_id):
+		try:
+			responses = await asyncio.gather(
+				*(self.arequest(client, "GET", f"shipments/{ship_id}") for ship_id in shipment_id.split(", "))
+			)
+			return self.get_tracking_dict([response["tracker"] for response in responses])
+		except Exception:
+			show_error_alert("updating EasyPost Shipment", EASYPOST_PROVIDER, "shipments")
+
+	def get_tracking_dict(self, trackers: list[dict]) -> dict:
+		statuses = {TRACKING_STATUS_MAP.get(tracker["status"], "In Progress") for tracker in trackers}
+		return {
+			"awb_number": ", ".join(tracker["tracking_code"] for tracker in trackers),
+			"tracking_status": statuses.pop() if len(statuses) == 1 else "In Progress",
+			"tracking_status_info": ", ".join(tracker["status"] for tracker in trackers),
+			"tracking_url": ", ".join(tracker["public_url"] for tracker in trackers),
+		}
+
+	def get_shipment_info(self, shipments: list[dict]) -> dict:
+		rates = [shipment["selected_rate"] for shipment in shipments]
+		return {
+			"service_provider": EASYPOST_PROVIDER,
+			"shipment_id": ", ".join(shipment["id"] for shipment in shipments),
+			"carrier": rates[0]["carrier"],
+			"carrier_service": rates[0]["service"],
+			"shipment_amount": sum(flt(rate["rate"]) for rate in rates),
+			"awb_number": ", ".join(shipment["tracking_code"] for shipment in shipments),
+		}
+
+	def get_order_payload(
+		self, pickup_address, delivery_address, parcels, pickup_contact, delivery_contact, reference=None
+	) -> dict:
+		return {
+			"reference": reference,
+			"from_address": self.get_address_dict(pickup_address, pickup_contact),
+			"to_address": self.get_address_dict(delivery_address, delivery_contact),
+			"shipments": [{"parcel": parcel} for parcel in self.get_parcel_list(parcels)],
+		}
+
+	def get_service_dict(self, rate, order_id):
+		"""Returns a dictionary with service info."""
+		available_service = frappe._dict()
+		available_service.service_provider = EASYPOST_PROVIDER
+		available_service.id = rate["id"]
+		available_service.order_id = order_id
+		available_service.carrier = rate["carrier"]
+		available_service.carrier_name = rate["carrier"]
+		available_service.service_name = rate["service"]
+		available_service.is_preferred = 0
+		available_service.total_price = flt(rate["rate"])
+		available_service.currency = rate.get("currency")
+		return available_service
+
+	def get_parcel_list(self, parcels: list[dict]) -> list[dict]:
+		"""Convert parcels to EasyPost's units (inches, ounces), one entry per physical parcel."""
+		parcel_list = []
+		for parcel in parcels:
+			formatted_parcel = {
+				"length": flt(flt(parcel.get("length")) / CM_PER_INCH, 1),
+				"width": flt(flt(parcel.get("width")) / CM_PER_INCH, 1),
+				"height": flt(flt(parcel.get("height")) / CM_PER_INCH, 1),
+				"weight": flt(flt(parcel.get("weight")) * OUNCES_PER_KG, 1),
+			}
+			parcel_list.extend([formatted_parcel] * (parcel.get("count") or 1))
+		return parcel_list
+
+	def get_address_dict(self, address, contact=None, company_name=None):
+		address_dict = {
+			"company": company_name or address.address_title,
+			"street1": address.address_line1,
+			"street2": address.address_line2 or "",
+			"city": address.city,
+			"state": address.state or "",
+			"zip": address.pincode,
+			"country": address.country_code.upper(),
+		}
+		if contact:
+			address_dict["name"] = f"{contact.first_name or ''} {contact.last_name or ''}".strip()
+			address_dict["phone"] = contact.phone
+			address_dict["email"] = contact.email_id
+		return address_dict
+
+
+def get_easypost_utils() -> EasyPostUtils:
+	settings = frappe.get_single("EasyPost")
+	if not settings.enabled:
+		link = get_link_to_form("EasyPost", "EasyPost", frappe.bold("EasyPost Settings"))
+		frappe.throw(_("Please enable EasyPost Integration in {0}").format(link), title=_("Mandatory"))
+
+	return EasyPostUtils(
+		base_url=frappe.conf.get("easypost_base_url") or BASE_URL,
+		api_key=settings.test_key if settings.use_test_environment else settings.production_key,
+		api_logger=get_api_logger(EASYPOST_PROVIDER, settings),
+	)
+
+
+@frappe.whitelist()
+def book_shipments_in_batch(shipments: str | list[str], carrier: str, service: str):
+	"""Book many submitted Shipments with one EasyPost service in a background batch."""
+	shipments = frappe.parse_json(shipments)
+	for shipment in shipments:
+		frappe.has_permission("Shipment", "write", doc=shipment, throw=True)
+
+	enqueue_shipping_job(
+		"erpnext_shipping.erpnext_shipping.doctype.easypost.easypost.process_shipment_batch",
+		BULK,
+		shipments=shipments,
+		carrier=carrier,
+		service=service,
+	)
+
+
+def process_shipment_batch(shipments: list[str], carrier: str, service: str):
+	"""Create and buy one EasyPost batch, mark the Shipments as booked, then fetch the label.
+
+	Shipments that are not submitted or already booked are left out. Purchases are committed
+	before the label is fetched, so that postage that was paid for is never lost. The merged
+	label of the whole batch is stored as a single private File; if it cannot be fetched, each
+	Shipment fetches its own label and queues a retry when that fails too.
+	"""
+	from erpnext_shipping.erpnext_shipping.shipping import get_shipment_parties, print_shipping_label
+
+	easypost = get_easypost_utils()
+	docs = [frappe.get_doc("Shipment", name) for name in shipments]
+	docs = [doc for doc in docs if doc.docstatus == 1 and not doc.shipment_id]
+	if not docs:
+		return
+
+	batch_shipments = []
+	for doc in docs:
+		pickup_address, delivery_address, pickup_contact, delivery_contact = get_shipment_parties(doc)
+		order = easypost.get_order_payload(
+			pickup_address,
+			delivery_address,
+			[parcel.as_dict() for parcel in doc.shipment_parcel],
+			pickup_contact,
+			delivery_contact,
+		)
+		for parcel in order["shipments"]:
+			batch_shipments.append(
+				{
+					"reference": doc.name,
+					"from_address": order["from_address"],
+					"to_address": order["to_address"],
+					"parcel": parcel["parcel"],
+					"carrier": carrier,
+					"service": service,
+				}
+			)
+
+	try:
+		batch = easypost.create_batch(batch_shipments)
+		batch = easypost.buy_batch(batch["id"])
+	except Exception:
+		show_error_alert("booking EasyPost batch", EASYPOST_PROVIDER, "batches")
+		return
+
+	booked = record_batch_purchases(easypost, batch, docs)
+	if not booked:
+		return
+
+	try:
+		content = easypost.download_label(easypost.get_batch_label(batch["id"]))
+	except Exception:
+		show_error_alert("fetching EasyPost batch label", EASYPOST_PROVIDER, "batches/label")
+		content = None
+
+	if not content:
+		for name in booked:
+			print_shipping_label(name, save_as_attachment=True)
+			frappe.db.commit()
+		return
+
+	label = frappe.new_doc("File")
+	label.file_name = f"labels_{batch['id']}.pdf"
+	label.content = content
+	label.folder = "Home/Attachments"
+	label.is_private = 1
+	label.save()
+
+	return label.file_url
+
+
+def record_batch_purchases(easypost: EasyPostUtils, batch: dict, docs: list) -> list[str]:
+	"""Mark the Shipments whose postage was bought in `batch` as booked and commit.
+
+	Returns the names of the booked Shipments. Shipments that could not be bought are logged.
+	"""
+	from erpnext_shipping.erpnext_shipping.shipping import update_booked_shipment
+
+	failed = [s for s in batch["shipments"] if s.get("batch_status") != "postage_purchased"]
+	if failed:
+		frappe.log_error(
+			title="Shipping Error",
+			message="\n".join(
+				f"EasyPost batch {batch['id']} could not buy {s.get('reference')}: {s.get('batch_message')}"
+				for s in failed
+			),
+		)
+
+	purchased = get_purchased_ids(batch)
+	booked = []
+	try:
+		by_reference = {}
+		for shipment in easypost.get_shipments(purchased):
+			by_reference.setdefault(shipment["reference"], []).append(shipment)
+
+		for doc in docs:
+			if doc.name in by_reference:
+				update_booked_shipment(
+					doc,
+					easypost.get_shipment_info(by_reference[doc.name]),
+					[row.delivery_note for row in doc.shipment_delivery_note],
+				)
+				booked.append(doc.name)
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(
+			title="Shipping Error",
+			message=f"EasyPost batch {batch['id']} bought postage for {', '.join(purchased)}, "
+			"but the Shipments could not be updated.",
+		)
+		return []
+
+	frappe.db.commit()
+	return booked
+
+
+def get_purchased_ids(batch: dict) -> list[str]:
+	return [s["id"] for s in batch["shipments"] if s.get("batch_status") == "postage_purchased"]
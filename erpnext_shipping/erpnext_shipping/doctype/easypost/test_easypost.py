@@ -1,9 +1,193 @@
 # Copyright (c) 2024, Frappe and Contributors
 # See license.txt
 
-# import frappe
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from erpnext_shipping.erpnext_shipping.doctype.easypost.easypost import (
+	EasyPostError,
+	EasyPostUtils,
+	get_purchased_ids,
+	record_batch_purchases,
+)
+
+
+class StandInEasyPost(BaseHTTPRequestHandler):
+	"""Minimal local replacement for the EasyPost API endpoints used by `EasyPostUtils`."""
+
+	batch_state = {}
+
+	def do_GET(self):
+		if self.path.startswith("/v2/batches/"):
+			batch = self.batch_state[self.path.split("/")[3]]
+			self.reply(batch)
+			# The first poll of a batch still sees it being created.
+			if batch["state"] == "creating":
+				batch["state"] = "creation_failed" if batch.get("invalid") else "created"
+			return
+		if self.path.startswith("/v2/shipments/"):
+			return self.reply(
+				{
+					"id": self.path.split("/")[3],
+					"reference": "SHIP-0001",
+					"tracking_code": "EZ1000000001",
+					"selected_rate": {"carrier": "USPS", "service": "Priority", "rate": "7.50"},
+					"tracker": {
+						"tracking_code": "EZ1000000001",
+						"status": "delivered",
+						"public_url": "https://track.easypost.com/EZ1000000001",
+					},
+				}
+			)
+		self.reply({"error": {"message": "Not Found"}})
+
+	def do_POST(self):
+		body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+		if self.path == "/v2/orders":
+			return self.reply(
+				{
+					"id": "order_1",
+					"shipments": body["order"]["shipments"],
+					"rates": [
+						{"id": "rate_1", "carrier": "USPS", "service": "Priority", "rate": "15.00"},
+						{"id": "rate_2", "carrier": "UPS", "service": "Ground", "rate": "12.30"},
+					],
+				}
+			)
+		if self.path == "/v2/batches":
+			shipments = [
+				{"id": f"shp_{i}", "reference": s["reference"], "batch_status": "postage_purchased"}
+				for i, s in enumerate(body["batch"]["shipments"])
+			]
+			batch_id = f"batch_{len(self.batch_state) + 1}"
+			self.batch_state[batch_id] = {
+				"id": batch_id,
+				"state": "creating",
+				"shipments": shipments,
+				"invalid": any(not s.get("service") for s in body["batch"]["shipments"]),
+			}
+			return self.reply(self.batch_state[batch_id])
+		if self.path.startswith("/v2/batches/"):
+			batch_id, action = self.path.split("/")[3:5]
+			batch = self.batch_state[batch_id]
+			if action == "buy":
+				for shipment in batch["shipments"]:
+					if shipment["reference"].startswith("FAIL"):
+						shipment["batch_status"] = "postage_purchase_failed"
+						shipment["batch_message"] = "Insufficient funds"
+				failed = any(s["batch_status"] != "postage_purchased" for s in batch["shipments"])
+				batch["state"] = "purchase_failed" if failed else "purchased"
+			if action == "label":
+				batch["label_url"] = f"http://labels.invalid/{batch_id}.pdf"
+			return self.reply(batch)
+		self.reply({"error": {"message": "Not Found"}})
+
+	def reply(self, data):
+		payload = json.dumps(data).encode()
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def log_message(self, *args):
+		pass
+
 
 class TestEasyPost(FrappeTestCase):
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInEasyPost)
+		threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+		cls.easypost = EasyPostUtils(
+			base_url=f"http://127.0.0.1:{cls.server.server_port}/v2", api_key="test", poll_interval=0
+		)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+		super().tearDownClass()
+
+	def get_address(self):
+		return frappe._dict(
+			address_title="Test",
+			address_line1="Street 1",
+			city="Springfield",
+			state="IL",
+			pincode="62701",
+			country_code="us",
+		)
+
+	def test_rates_one_entry_per_parcel(self):
+		order = self.easypost.get_order_payload(
+			self.get_address(),
+			self.get_address(),
+			[{"length": 25.4, "width": 25.4, "height": 2.54, "weight": 1, "count": 3}],
+			None,
+			None,
+		)
+		self.assertEqual(len(order["shipments"]), 3)
+		self.assertEqual(order["shipments"][0]["parcel"]["length"], 10)
+		self.assertEqual(order["shipments"][0]["parcel"]["weight"], 35.3)
+
+		(services,) = self.easypost.get_batch_rates([order])
+		self.assertEqual([s.total_price for s in services], [15.0, 12.3])
+		self.assertEqual(services[0].order_id, "order_1")
+
+	def test_batch_booking(self):
+		batch = self.easypost.create_batch(
+			[{"reference": "SHIP-0001", "parcel": {}, "carrier": "USPS", "service": "Priority"}] * 2
+		)
+		self.assertEqual(batch["state"], "created")
+		self.assertEqual(self.easypost.buy_batch(batch["id"])["state"], "purchased")
+		self.assertEqual(
+			self.easypost.get_batch_label(batch["id"]), f"http://labels.invalid/{batch['id']}.pdf"
+		)
+
+		shipments = self.easypost.get_shipments([s["id"] for s in batch["shipments"]])
+		shipment_info = self.easypost.get_shipment_info(shipments)
+		self.assertEqual(shipment_info["shipment_id"], "shp_0, shp_1")
+		self.assertEqual(shipment_info["shipment_amount"], 15.0)
+
+	def test_failed_batch(self):
+		with self.assertRaises(EasyPostError):
+			self.easypost.create_batch([{"reference": "SHIP-0002", "parcel": {}, "carrier": "USPS"}])
+
+	def test_partly_bought_batch(self):
+		batch = self.easypost.create_batch(
+			[
+				{"reference": "SHIP-0001", "parcel": {}, "carrier": "USPS", "service": "Priority"},
+				{"reference": "FAIL-0001", "parcel": {}, "carrier": "USPS", "service": "Priority"},
+			]
+		)
+		batch = self.easypost.buy_batch(batch["id"])
+		self.assertEqual(batch["state"], "purchase_failed")
+		self.assertEqual(get_purchased_ids(batch), ["shp_0"])
+
+		docs = [frappe._dict(name="SHIP-0001", shipment_delivery_note=[])]
+		with (
+			patch("erpnext_shipping.erpnext_shipping.shipping.update_booked_shipment") as update,
+			patch.object(frappe.db, "commit"),
+			patch("frappe.log_error") as log_error,
+		):
+			self.assertEqual(record_batch_purchases(self.easypost, batch, docs), ["SHIP-0001"])
+		self.assertEqual(update.call_args.args[1]["shipment_id"], "shp_0")
+		self.assertIn("FAIL-0001", log_error.call_args.kwargs["message"])
+
+	def test_unbought_batch(self):
+		batch = self.easypost.create_batch(
+			[{"reference": "FAIL-0002", "parcel": {}, "carrier": "USPS", "service": "Priority"}]
+		)
+		with self.assertRaises(EasyPostError):
+			self.easypost.buy_batch(batch["id"])
+
+	def test_tracking(self):
+		tracking_data = self.easypost.get_tracking_data("shp_0")
+		self.assertEqual(tracking_data["tracking_status"], "Delivered")
+		self.assertEqual(tracking_data["awb_number"], "EZ1000000001")
@@ -3,47 +3,124 @@
 
 import json
 import re
+import time
 from json import dumps as json_dumps
 
 import frappe
-import requests
 from frappe import _
 from frappe.model.document import Document
 from frappe.utils.data import get_link_to_form
 
+from erpnext_shipping.erpnext_shipping.accounts import (
+	DEFAULT_ACCOUNT,
+	ProviderAccount,
+	account_slot,
+	count_request,
+	get_account,
+	get_accounts,
+	validate_accounts,
+)
+from erpnext_shipping.erpnext_shipping.codec import decode_response, dumps
+from erpnext_shipping.erpnext_shipping.connection import get_session
+from erpnext_shipping.erpnext_shipping.doctype.shipping_api_log.shipping_api_log import get_api_logger
+from erpnext_shipping.erpnext_shipping.hedging import hedged_call
+from erpnext_shipping.erpnext_shipping.singleflight import single_flight
 from erpnext_shipping.erpnext_shipping.utils import show_error_alert
 
 LETMESHIP_PROVIDER = "LetMeShip"
+LETMESHIP_CURRENCY = "EUR"  # the currency of all prices quoted by the API
 PROD_BASE_URL = "https://api.letmeship.com/v1"
 TEST_BASE_URL = "https://api.test.letmeship.com/v1"
+# POST endpoints that only compute an answer
+READ_ONLY_ENDPOINTS = ("available",)
+HEADERS = {
+	"Content-Type": "application/json",
+	"Accept": "application/json",
+	"Access-Control-Allow-Origin": "string",
+}
 
 
 class LetMeShip(Document):
-	pass
+	def validate(self):
+		validate_accounts(self)
 
 
 class LetMeShipUtils:
-	def __init__(self, base_url: str, api_id: str, api_password: str):
+	def __init__(
+		self,
+		base_url: str,
+		api_id: str,
+		api_password: str,
+		api_logger=None,
+		account: ProviderAccount | None = None,
+	):
 		self.base_url = base_url
 		self.api_password = api_password
 		self.api_id = api_id
+		self.api_logger = api_logger
+		self.account = account
+		self.session = get_session(f"{LETMESHIP_PROVIDER}:{account.name if account else DEFAULT_ACCOUNT}")
 
 	def request(self, method: str, endpoint: str, json: dict | None = None, params: dict | None = None):
-		"""Make a request to LetMeShip API."""
-		response = requests.request(
-			method,
-			f"{self.base_url}/{endpoint}",
-			auth=(self.api_id, self.api_password),
-			headers={
-				"Content-Type": "application/json",
-				"Accept": "application/json",
-				"Access-Control-Allow-Origin": "string",
-			},
-			params=params,
-			json=json,
-		)
+		"""Make a request to LetMeShip API.
+
+		Identical read-only requests made at the same time share one upstream call.
+		"""
+		if method == "GET" or endpoint in READ_ONLY_ENDPOINTS:
+			return single_flight(
+				LETMESHIP_PROVIDER,
+				f"{method} {self.base_url}/{endpoint}",
+				{"api_id": self.api_id, "json": json, "params": params},
+				lambda: self._request(method, endpoint, json=json, params=params),
+			)
+
+		return self._request(method, endpoint, json=json, params=params)
+
+	def _request(self, method: str, endpoint: str, json: dict | None = None, params: dict | None = None):
+		def send():
+			return self.session.request(
+				method,
+				f"{self.base_url}/{endpoint}",
+				auth=(self.api_id, self.api_password),
+				headers=HEADERS,
+				params=params,
+				data=dumps(json) if json is not None else None,
+			)
+
+		with account_slot(self.account):
+			started = time.monotonic()
+			if endpoint in READ_ONLY_ENDPOINTS:
+				response = hedged_call(
+					LETMESHIP_PROVIDER,
+					f"{method} {endpoint}",
+					send,
+					on_hedge=lambda: count_request(self.account),
+				)
+			else:
+				response = send()
+		return self.handle_response(method, endpoint, started, response, json)
+
+	async def arequest(
+		self, client, method: str, endpoint: str, json: dict | None = None, params: dict | None = None
+	):
+		"""Make a request to LetMeShip API with an `httpx.AsyncClient`, see `async_transport`."""
+		with account_slot(self.account):
+			started = time.monotonic()
+			response = await client.request(
+				method,
+				f"{self.base_url}/{endpoint}",
+				auth=(self.api_id, self.api_password),
+				headers=HEADERS,
+				params=params,
+				content=dumps(json) if json is not None else None,
+			)
+		return self.handle_response(method, endpoint, started, response, json)
+
+	def handle_response(self, method: str, endpoint: str, started: float, response, payload=None):
+		if self.api_logger:
+			self.api_logger.capture(method, endpoint, started, response, payload)
 
-		data = response.json()
+		data = decode_response(response)
 		if "status" in data and data["status"]["code"] != "0":
 			frappe.throw(
 				_("An Error occurred while fetching LetMeShip {0}:\n{1}").format(
@@ -90,7 +167,7 @@ class LetMeShipUtils:
 
 				return available_services
 		except Exception:
-			show_error_alert("fetching LetMeShip prices")
+			show_error_alert("fetching LetMeShip prices", LETMESHIP_PROVIDER, "available")
 
 		return []
 
@@ -106,6 +183,7 @@ class LetMeShipUtils:
 		service_info,
 		pickup_contact=None,
 		delivery_contact=None,
+		pickup_order=False,
 	):
 		self.set_letmeship_specific_fields(pickup_contact, delivery_contact)
 		pickup_address.address_title = self.first_30_chars(pickup_address.address_title)
@@ -124,12 +202,19 @@ class LetMeShipUtils:
 			parcel_list=parcel_list,
 			pickup_date=pickup_date,
 			service_info=service_info,
+			pickup_order=pickup_order,
 		)
 		try:
 			response_data = self.request("POST", "shipments", json=payload)
 			if "shipmentId" in response_data:
 				shipment_amount = response_data["service"]["baseServiceDetails"]["priceInfo"]["totalPrice"]
 				shipment_id = response_data["shipmentId"]
+				try:
+					awb_number = self.get_awb_number(shipment_id)
+				except Exception:
+					# the shipment is booked, its AWB number comes with the tracking data
+					frappe.log_error(title="Shipping Error")
+					awb_number = ""
 
 				return {
 					"service_provider": LETMESHIP_PROVIDER,
@@ -137,10 +222,11 @@ class LetMeShipUtils:
 					"carrier": response_data["service"]["baseServiceDetails"]["carrier"],
 					"carrier_service": response_data["service"]["baseServiceDetails"]["name"],
 					"shipment_amount": shipment_amount,
-					"awb_number": self.get_awb_number(shipment_id),
+					"awb_number": awb_number,
+					"account": self.account and self.account.name,
 				}
 		except Exception:
-			show_error_alert("creating LetMeShip Shipment")
+			show_error_alert("creating LetMeShip Shipment", LETMESHIP_PROVIDER, "shipments")
 
 	def get_awb_number(self, shipment_id: str):
 		shipment_data = self.request("GET", f"shipments/{shipment_id}")
@@ -151,51 +237,70 @@ class LetMeShipUtils:
 
 	def get_label(self, shipment_id):
 		try:
-			shipment_label_response_data = self.request(
-				"GET", f"shipments/{shipment_id}/documents", params={"types": "LABEL"}
+			return self.get_label_data(
+				self.request("GET", f"shipments/{shipment_id}/documents", params={"types": "LABEL"})
 			)
-			if "documents" in shipment_label_response_data:
-				for label in shipment_label_response_data["documents"]:
-					if "data" in label:
-						return json.dumps(label["data"])
-			else:
-				frappe.throw(
-					_("Error occurred while printing Shipment: {0}").format(
-						shipment_label_response_data["message"]
-					)
+		except Exception:
+			show_error_alert("printing LetMeShip Label", LETMESHIP_PROVIDER, "shipments/documents")
+
+	async def aget_label(self, client, shipment_id):
+		try:
+			return self.get_label_data(
+				await self.arequest(
+					client, "GET", f"shipments/{shipment_id}/documents", params={"types": "LABEL"}
 				)
+			)
 		except Exception:
-			show_error_alert("printing LetMeShip Label")
+			show_error_alert("printing LetMeShip Label", LETMESHIP_PROVIDER, "shipments/documents")
+
+	def get_label_data(self, shipment_label_response_data: dict):
+		if "documents" in shipment_label_response_data:
+			for label in shipment_label_response_data["documents"]:
+				if "data" in label:
+					return json.dumps(label["data"])
+		else:
+			frappe.throw(
+				_("Error occurred while printing Shipment: {0}").format(
+					shipment_label_response_data["message"]
+				)
+			)
 
 	def get_tracking_data(self, shipment_id):
-		from erpnext_shipping.erpnext_shipping.utils import get_tracking_url
+		try:
+			return self.get_tracking_dict(self.request("GET", "tracking", params={"shipmentid": shipment_id}))
+		except Exception:
+			show_error_alert("updating LetMeShip Shipment", LETMESHIP_PROVIDER, "tracking")
 
+	async def aget_tracking_data(self, client, shipment_id):
 		try:
-			tracking_data = self.request("GET", "tracking", params={"shipmentid": shipment_id})
-
-			if "awbNumber" in tracking_data:
-				tracking_status = "In Progress"
-				if tracking_data["lmsTrackingStatus"].startswith("DELIVERED"):
-					tracking_status = "Delivered"
-				if tracking_data["lmsTrackingStatus"] == "RETURNED":
-					tracking_status = "Returned"
-				if tracking_data["lmsTrackingStatus"] == "LOST":
-					tracking_status = "Lost"
-				tracking_url = get_tracking_url(
-					carrier=tracking_data["carrier"], tracking_number=tracking_data["awbNumber"]
-				)
-				return {
-					"awb_number": tracking_data["awbNumber"],
-					"tracking_status": tracking_status,
-					"tracking_status_info": tracking_data["lmsTrackingStatus"],
-					"tracking_url": tracking_url,
-				}
-			elif "message" in tracking_data:
-				frappe.throw(
-					_("Error occurred while updating Shipment: {0}").format(tracking_data["message"])
-				)
+			return self.get_tracking_dict(
+				await self.arequest(client, "GET", "tracking", params={"shipmentid": shipment_id})
+			)
 		except Exception:
-			show_error_alert("updating LetMeShip Shipment")
+			show_error_alert("updating LetMeShip Shipment", LETMESHIP_PROVIDER, "tracking")
+
+	def get_tracking_dict(self, tracking_data: dict):
+		from erpnext_shipping.erpnext_shipping.utils import get_tracking_url
+
+		if "awbNumber" in tracking_data:
+			tracking_status = "In Progress"
+			if tracking_data["lmsTrackingStatus"].startswith("DELIVERED"):
+				tracking_status = "Delivered"
+			if tracking_data["lmsTrackingStatus"] == "RETURNED":
+				tracking_status = "Returned"
+			if tracking_data["lmsTrackingStatus"] == "LOST":
+				tracking_status = "Lost"
+			tracking_url = get_tracking_url(
+				carrier=tracking_data["carrier"], tracking_number=tracking_data["awbNumber"]
+			)
+			return {
+				"awb_number": tracking_data["awbNumber"],
+				"tracking_status": tracking_status,
+				"tracking_status_info": tracking_data["lmsTrackingStatus"],
+				"tracking_url": tracking_url,
+			}
+		elif "message" in tracking_data:
+			frappe.throw(_("Error occurred while updating Shipment: {0}").format(tracking_data["message"]))
 
 	def generate_payload(
 		self,
@@ -208,6 +313,7 @@ class LetMeShipUtils:
 		parcel_list,
 		pickup_date,
 		service_info=None,
+		pickup_order=False,
 	):
 		payload = {
 			"pickupInfo": self.get_pickup_delivery_info(pickup_address, pickup_contact),
@@ -219,7 +325,7 @@ class LetMeShipUtils:
 					"saturdayDelivery": False,
 					"ddp": False,
 					"insurance": False,
-					"pickupOrder": False,
+					"pickupOrder": pickup_order,
 					"pickupTailLift": False,
 					"deliveryTailLift": False,
 					"holidayDelivery": False,
@@ -272,7 +378,9 @@ class LetMeShipUtils:
 		available_service.is_preferred = 0
 		available_service.real_weight = price_info["realWeight"]
 		available_service.total_price = price_info["netPrice"]
+		available_service.currency = LETMESHIP_CURRENCY
 		available_service.price_info = price_info
+		available_service.account = self.account and self.account.name
 		return available_service
 
 	def set_letmeship_specific_fields(self, pickup_contact, delivery_contact):
@@ -324,14 +432,21 @@ class LetMeShipUtils:
 		}
 
 
-def get_letmeship_utils() -> "LetMeShipUtils":
+def get_letmeship_utils(account_name: str | None = None, company: str | None = None) -> "LetMeShipUtils":
+	"""Return a client for the account `account_name`, or for an account picked for `company`."""
 	settings = frappe.get_single("LetMeShip")
 	if not settings.enabled:
 		link = get_link_to_form("LetMeShip", "LetMeShip", frappe.bold("LetMeShip Settings"))
 		frappe.throw(_(f"Please enable LetMeShip Integration in {link}"), title=_("Mandatory"))
 
+	accounts = get_accounts(
+		LETMESHIP_PROVIDER, settings, settings.api_id, settings.get_password("api_password")
+	)
+	account = get_account(accounts, account_name, company)
 	return LetMeShipUtils(
 		base_url=TEST_BASE_URL if settings.use_test_environment else PROD_BASE_URL,
-		api_id=settings.api_id,
-		api_password=settings.get_password("api_password"),
+		api_id=account.api_key,
+		api_password=account.api_secret,
+		api_logger=get_api_logger(LETMESHIP_PROVIDER, settings),
+		account=account,
 	)
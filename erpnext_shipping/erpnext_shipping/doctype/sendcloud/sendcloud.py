@@ -1,38 +1,139 @@
 # Copyright (c) 2020, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
+import asyncio
+import hashlib
 import json
+import time
 
 import frappe
-import requests
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import flt
+from frappe.utils import cint, flt
 from frappe.utils.data import get_link_to_form
 from requests.exceptions import HTTPError
 
+from erpnext_shipping.erpnext_shipping.accounts import (
+	account_slot,
+	count_request,
+	get_account,
+	get_accounts,
+	validate_accounts,
+)
+from erpnext_shipping.erpnext_shipping.codec import decode_response, dumps, encode_request
+from erpnext_shipping.erpnext_shipping.connection import get_session
+from erpnext_shipping.erpnext_shipping.doctype.carrier_service_limit.carrier_service_limit import (
+	seed_sendcloud_limits,
+)
+from erpnext_shipping.erpnext_shipping.doctype.shipping_api_log.shipping_api_log import get_api_logger
+from erpnext_shipping.erpnext_shipping.hedging import hedged_call
+from erpnext_shipping.erpnext_shipping.singleflight import single_flight
 from erpnext_shipping.erpnext_shipping.utils import show_error_alert
 
 SENDCLOUD_PROVIDER = "SendCloud"
+SENDCLOUD_CURRENCY = "EUR"  # the currency of all prices quoted by the API
+BASE_URL = "https://panel.sendcloud.sc/api/v2"
 WEIGHT_DECIMALS = 3
 CURRENCY_DECIMALS = 2
+CATALOG_CACHE_TTL = 6 * 60 * 60  # seconds
+RAW_LABEL_MEDIA_TYPES = {"ZPL": "application/zpl"}
+RAW_LABEL_DPI = 203  # most thermal label printers
+# read-only requests made while fetching rates
+HEDGED_ENDPOINTS = ("shipping_methods",)
+# the catalog lists every country of every method, keep only what rating reads
+SHIPPING_METHOD_FIELDS = {
+	"error": None,
+	"shipping_methods": {
+		"id": None,
+		"carrier": None,
+		"name": None,
+		"min_weight": None,
+		"max_weight": None,
+		"countries": ("iso_2", "price", "price_breakdown"),
+	},
+}
 
 
 class SendCloud(Document):
-	pass
+	def validate(self):
+		validate_accounts(self)
 
 
 class SendCloudUtils:
-	def __init__(self):
+	def __init__(self, account_name: str | None = None, company: str | None = None):
+		"""Create a client for the account `account_name`, or for an account picked for `company`."""
 		settings = frappe.get_single("SendCloud")
-		self.api_key = settings.api_key
-		self.api_secret = settings.get_password("api_secret")
 		self.enabled = settings.enabled
+		self.api_logger = get_api_logger(SENDCLOUD_PROVIDER, settings)
 
 		if not self.enabled:
 			link = get_link_to_form("SendCloud", "SendCloud", _("SendCloud Settings"))
 			frappe.throw(_("Please enable SendCloud Integration in {0}").format(link))
 
+		accounts = get_accounts(
+			SENDCLOUD_PROVIDER, settings, settings.api_key, settings.get_password("api_secret")
+		)
+		self.account = get_account(accounts, account_name, company)
+		self.api_key = self.account.api_key
+		self.api_secret = self.account.api_secret
+		self.session = get_session(f"{SENDCLOUD_PROVIDER}:{self.account.name}")
+
+	def request(self, method: str, endpoint: str, fields: dict | None = None, **kwargs) -> dict:
+		"""Make a request to SendCloud API and return the decoded response, reduced to
+		`fields` if given.
+
+		Identical GET requests made at the same time share one upstream call.
+		"""
+		if method == "GET":
+			return single_flight(
+				SENDCLOUD_PROVIDER,
+				f"{method} {endpoint}",
+				{"api_key": self.api_key, "fields": fields, **kwargs},
+				lambda: self._request(method, endpoint, fields, **kwargs),
+			)
+
+		return self._request(method, endpoint, fields, **kwargs)
+
+	def _request(self, method: str, endpoint: str, fields: dict | None = None, **kwargs) -> dict:
+		payload = kwargs.get("json")
+		kwargs = encode_request(kwargs)
+
+		def send():
+			return self.session.request(
+				method, f"{BASE_URL}/{endpoint}", auth=(self.api_key, self.api_secret), **kwargs
+			)
+
+		with account_slot(self.account):
+			started = time.monotonic()
+			if method == "GET" and endpoint in HEDGED_ENDPOINTS:
+				response = hedged_call(
+					SENDCLOUD_PROVIDER,
+					f"{method} {endpoint}",
+					send,
+					on_hedge=lambda: count_request(self.account),
+				)
+			else:
+				response = send()
+		self.api_logger.capture(method, endpoint, started, response, payload)
+		return decode_response(response, fields)
+
+	async def arequest(
+		self, client, method: str, endpoint: str, params: dict | None = None, json: dict | None = None
+	) -> dict:
+		"""Make a request to SendCloud API with an `httpx.AsyncClient`, see `async_transport`."""
+		with account_slot(self.account):
+			started = time.monotonic()
+			response = await client.request(
+				method,
+				f"{BASE_URL}/{endpoint}",
+				auth=(self.api_key, self.api_secret),
+				headers={"Content-Type": "application/json"},
+				params=params,
+				content=dumps(json) if json is not None else None,
+			)
+		self.api_logger.capture(method, endpoint, started, response, json)
+		return decode_response(response)
+
 	def get_available_services(self, delivery_address, parcels: list[dict]):
 		# Retrieve rates at SendCloud from specification stated.
 		if not self.enabled or not self.api_key or not self.api_secret:
@@ -41,30 +142,60 @@ class SendCloudUtils:
 		to_country = delivery_address.country_code.upper()
 
 		try:
-			response = requests.get(
-				"https://panel.sendcloud.sc/api/v2/shipping_methods",
-				params={
-					"to_country": to_country,
-				},
-				auth=(self.api_key, self.api_secret),
+			methods = self.get_shipping_methods(to_country)
+		except Exception:
+			show_error_alert("fetching SendCloud prices", SENDCLOUD_PROVIDER, "shipping_methods")
+			return
+
+		return [self.get_service_dict(quote) for quote in get_quotes(methods, parcels)]
+
+	def get_shipping_methods(self, to_country: str) -> list[dict]:
+		"""Return the shipping methods to a country from the cached catalog.
+
+		The catalog is fetched from SendCloud at most once per `CATALOG_CACHE_TTL`.
+		"""
+		account_key = hashlib.sha256(self.api_key.encode()).hexdigest()
+		cache_key = f"erpnext_shipping:sendcloud_methods:{account_key}:{to_country}"
+		methods = frappe.cache().get_value(cache_key)
+		if methods is None:
+			methods = self.fetch_shipping_methods(to_country)
+			frappe.cache().set_value(cache_key, methods, expires_in_sec=CATALOG_CACHE_TTL)
+			seed_sendcloud_limits(methods)
+
+		return methods
+
+	def fetch_shipping_methods(self, to_country: str) -> list[dict]:
+		"""Fetch the shipping methods to a country, reduced to what rating needs."""
+		responses_dict = self.request(
+			"GET", "shipping_methods", fields=SHIPPING_METHOD_FIELDS, params={"to_country": to_country}
+		)
+
+		if "error" in responses_dict:
+			error_message = responses_dict["error"]["message"]
+			frappe.throw(error_message, title=_("SendCloud"))
+
+		methods = []
+		for service in responses_dict.get("shipping_methods", []):
+			countries = [country for country in service["countries"] if country["iso_2"] == to_country]
+			if not countries:
+				continue
+
+			country = countries[0]
+			methods.append(
+				frappe._dict(
+					id=service["id"],
+					carrier=self.get_carrier(service["carrier"], post_or_get="get"),
+					name=service["name"],
+					min_weight=float(service["min_weight"]),
+					max_weight=float(service["max_weight"]),
+					price=flt(
+						country["price"]
+						or sum(price_part["value"] for price_part in country["price_breakdown"])
+					),
+				)
 			)
-			responses_dict = response.json()
-
-			if "error" in responses_dict:
-				error_message = responses_dict["error"]["message"]
-				frappe.throw(error_message, title=_("SendCloud"))
 
-			available_services = []
-			for service in responses_dict.get("shipping_methods", []):
-				countries = [country for country in service["countries"] if country["iso_2"] == to_country]
-
-				if countries and check_weight(service, parcels):
-					available_service = self.get_service_dict(service, countries[0], parcels)
-					available_services.append(available_service)
-
-			return available_services
-		except Exception:
-			show_error_alert("fetching SendCloud prices")
+		return methods
 
 	def create_shipment(
 		self,
@@ -97,12 +228,9 @@ class SendCloudUtils:
 			parcels.append(parcel_data)
 
 		try:
-			response = requests.post(
-				"https://panel.sendcloud.sc/api/v2/parcels?errors=verbose",
-				json={"parcels": parcels},
-				auth=(self.api_key, self.api_secret),
+			response_data = self.request(
+				"POST", "parcels", params={"errors": "verbose"}, json={"parcels": parcels}
 			)
-			response_data = response.json()
 			if "failed_parcels" in response_data:
 				error = response_data["failed_parcels"][0]["errors"]
 				frappe.msgprint(
@@ -120,37 +248,116 @@ class SendCloudUtils:
 					"carrier_service": service_info["service_name"],
 					"shipment_amount": service_info["total_price"],
 					"awb_number": awb_number,
+					"account": self.account.name,
 				}
 		except Exception:
-			show_error_alert("creating SendCloud Shipment")
+			show_error_alert("creating SendCloud Shipment", SENDCLOUD_PROVIDER, "parcels")
+
+	def create_pickup(
+		self,
+		carrier: str,
+		address,
+		contact,
+		parcels: int,
+		total_weight: float,
+		start_at,
+		end_at,
+		reference=None,
+	) -> dict | None:
+		"""Book one pickup of `carrier` for all parcels picked up at `address`."""
+		try:
+			response_data = self.request(
+				"POST",
+				"pickups",
+				json={
+					"carrier": self.get_carrier(carrier, post_or_get="post"),
+					"address": {
+						"name": f"{contact.first_name or ''} {contact.last_name or ''}".strip(),
+						"company_name": address.address_title,
+						"address_line_1": address.address_line1,
+						"address_line_2": address.address_line2 or "",
+						"postal_code": address.pincode,
+						"city": address.city,
+						"country_code": address.country_code.upper(),
+						"phone_number": contact.phone,
+						"email": contact.email_id,
+					},
+					"time_slots": [{"start_at": start_at.isoformat(), "end_at": end_at.isoformat()}],
+					"items": [
+						{
+							"quantity": parcels,
+							"container_type": "parcel",
+							"total_weight": str(flt(total_weight, WEIGHT_DECIMALS)),
+						}
+					],
+					"reference": reference,
+				},
+			)
+			if "error" in response_data:
+				frappe.throw(response_data["error"]["message"], title=_("SendCloud"))
+
+			return {"pickup_id": str(response_data["id"])}
+		except Exception:
+			show_error_alert("booking SendCloud Pickup", SENDCLOUD_PROVIDER, "pickups")
 
 	def get_label(self, shipment_id):
 		# Retrieve shipment label from SendCloud
-		shipment_id_list = shipment_id.split(", ")
-		label_urls = []
-
 		try:
-			for ship_id in shipment_id_list:
-				shipment_label_response = requests.get(
-					f"https://panel.sendcloud.sc/api/v2/labels/{ship_id}",
-					auth=(self.api_key, self.api_secret),
-				)
-				shipment_label = json.loads(shipment_label_response.text)
-				label_urls.append(shipment_label["label"]["label_printer"])
-			if len(label_urls):
-				return label_urls
-			else:
-				message = _(
-					"Please make sure Shipment (ID: {0}), exists and is a complete Shipment on SendCloud."
-				).format(shipment_id)
-				frappe.msgprint(msg=_(message), title=_("Label Not Found"))
+			labels = [self.request("GET", f"labels/{ship_id}") for ship_id in shipment_id.split(", ")]
+			return self.get_label_urls(shipment_id, labels)
 		except Exception:
-			show_error_alert("printing SendCloud Label")
+			show_error_alert("printing SendCloud Label", SENDCLOUD_PROVIDER, "labels")
+
+	def get_raw_label(self, shipment_id, label_format: str) -> list[bytes] | None:
+		"""Return the labels of a shipment in a printer language. SendCloud only offers ZPL."""
+		if label_format not in RAW_LABEL_MEDIA_TYPES:
+			frappe.throw(_("SendCloud does not offer labels in {0}.").format(label_format))
+
+		labels = []
+		for ship_id in shipment_id.split(", "):
+			endpoint = f"parcels/{ship_id}/documents/label"
+			try:
+				with account_slot(self.account):
+					started = time.monotonic()
+					response = self.session.get(
+						f"{BASE_URL}/{endpoint}",
+						auth=(self.api_key, self.api_secret),
+						headers={"Accept": RAW_LABEL_MEDIA_TYPES[label_format]},
+						params={"dpi": RAW_LABEL_DPI},
+					)
+				self.api_logger.capture("GET", endpoint, started, response)
+				response.raise_for_status()
+			except Exception:
+				show_error_alert("printing SendCloud Label", SENDCLOUD_PROVIDER, "parcels/documents")
+				return
+
+			labels.append(response.content)
+
+		return labels
+
+	async def aget_label(self, client, shipment_id):
+		try:
+			labels = await asyncio.gather(
+				*(self.arequest(client, "GET", f"labels/{ship_id}") for ship_id in shipment_id.split(", "))
+			)
+			return self.get_label_urls(shipment_id, labels)
+		except Exception:
+			show_error_alert("printing SendCloud Label", SENDCLOUD_PROVIDER, "labels")
+
+	def get_label_urls(self, shipment_id, labels: list[dict]):
+		label_urls = [shipment_label["label"]["label_printer"] for shipment_label in labels]
+		if len(label_urls):
+			return label_urls
+		else:
+			message = _(
+				"Please make sure Shipment (ID: {0}), exists and is a complete Shipment on SendCloud."
+			).format(shipment_id)
+			frappe.msgprint(msg=_(message), title=_("Label Not Found"))
 
 	def download_label(self, label_url: str):
 		"""Download label from SendCloud."""
 		try:
-			resp = requests.get(label_url, auth=(self.api_key, self.api_secret))
+			resp = self.session.get(label_url, auth=(self.api_key, self.api_secret))
 			resp.raise_for_status()
 			return resp.content
 		except HTTPError:
@@ -158,39 +365,50 @@ class SendCloudUtils:
 				_("An error occurred while downloading label from SendCloud"), indicator="orange", alert=True
 			)
 
+	async def adownload_label(self, client, label_url: str):
+		try:
+			resp = await client.get(label_url, auth=(self.api_key, self.api_secret))
+			resp.raise_for_status()
+			return resp.content
+		except Exception:
+			frappe.msgprint(
+				_("An error occurred while downloading label from SendCloud"), indicator="orange", alert=True
+			)
+
 	def get_tracking_data(self, shipment_id):
 		# return SendCloud tracking data
 		try:
-			shipment_id_list = shipment_id.split(", ")
-			awb_number, tracking_status, tracking_status_info, tracking_urls = [], [], [], []
+			parcels = [
+				self.request("GET", f"parcels/{ship_id}")["parcel"] for ship_id in shipment_id.split(", ")
+			]
+			return self.get_tracking_dict(parcels)
+		except Exception:
+			show_error_alert("updating SendCloud Shipment", SENDCLOUD_PROVIDER, "parcels/tracking")
 
-			for ship_id in shipment_id_list:
-				tracking_data_response = requests.get(
-					f"https://panel.sendcloud.sc/api/v2/parcels/{ship_id}",
-					auth=(self.api_key, self.api_secret),
-				)
-				tracking_data = json.loads(tracking_data_response.text)
-				tracking_data_parcel = tracking_data["parcel"]
-				tracking_data_parcel_status = tracking_data_parcel["status"]["message"]
-
-				tracking_urls.append(tracking_data_parcel["tracking_url"])
-				awb_number.append(tracking_data_parcel["tracking_number"])
-				tracking_status.append(tracking_data_parcel_status)
-				tracking_status_info.append(tracking_data_parcel_status)
-			return {
-				"awb_number": ", ".join(awb_number),
-				"tracking_status": ", ".join(tracking_status),
-				"tracking_status_info": ", ".join(tracking_status_info),
-				"tracking_url": ", ".join(tracking_urls),
-			}
+	async def aget_tracking_data(self, client, shipment_id):
+		try:
+			responses = await asyncio.gather(
+				*(self.arequest(client, "GET", f"parcels/{ship_id}") for ship_id in shipment_id.split(", "))
+			)
+			return self.get_tracking_dict([response["parcel"] for response in responses])
 		except Exception:
-			show_error_alert("updating SendCloud Shipment")
+			show_error_alert("updating SendCloud Shipment", SENDCLOUD_PROVIDER, "parcels/tracking")
 
-	def total_parcel_price(self, parcel_price, parcels: list[dict]):
-		count = 0
-		for parcel in parcels:
-			count += parcel.get("count")
-		return flt(parcel_price) * count
+	def get_tracking_dict(self, parcels: list[dict]) -> dict:
+		awb_number, tracking_status, tracking_status_info, tracking_urls = [], [], [], []
+		for tracking_data_parcel in parcels:
+			tracking_data_parcel_status = tracking_data_parcel["status"]["message"]
+
+			tracking_urls.append(tracking_data_parcel["tracking_url"])
+			awb_number.append(tracking_data_parcel["tracking_number"])
+			tracking_status.append(tracking_data_parcel_status)
+			tracking_status_info.append(tracking_data_parcel_status)
+		return {
+			"awb_number": ", ".join(awb_number),
+			"tracking_status": ", ".join(tracking_status),
+			"tracking_status_info": ", ".join(tracking_status_info),
+			"tracking_url": ", ".join(tracking_urls),
+		}
 
 	def get_parcel_items(self, parcel, description_of_content, value_of_goods):
 		parcel_list = []
@@ -202,17 +420,18 @@ class SendCloudUtils:
 		parcel_list.append(formatted_parcel)
 		return parcel_list
 
-	def get_service_dict(self, service, country, parcels: list[dict]):
+	def get_service_dict(self, quote):
 		"""Returns a dictionary with service info."""
 		available_service = frappe._dict()
 		available_service.service_provider = "SendCloud"
-		available_service.carrier = self.get_carrier(service["carrier"], post_or_get="get")
-		available_service.service_name = service["name"]
-
-		price = country["price"] or sum(price_part["value"] for price_part in country["price_breakdown"])
-		available_service.total_price = self.total_parcel_price(price, parcels)
-
-		available_service.service_id = service["id"]
+		available_service.carrier = quote.carrier
+		available_service.service_name = quote.service_name
+		available_service.total_price = quote.total_price
+		available_service.currency = SENDCLOUD_CURRENCY
+		available_service.service_id = quote.parcel_service_ids[0]
+		if len(set(quote.parcel_service_ids)) > 1:
+			available_service.parcel_service_ids = quote.parcel_service_ids
+		available_service.account = self.account.name
 
 		return available_service
 
@@ -248,7 +467,7 @@ class SendCloudUtils:
 			"email": delivery_contact.email_id,
 			"data": [],
 			"country": delivery_address.country_code.upper(),
-			"shipment": {"id": service_info["service_id"]},
+			"shipment": {"id": get_parcel_service_id(service_info, index)},
 			"order_number": f"{shipment}-{index}",
 			"external_reference": f"{shipment}-{index}",
 			"weight": flt(parcel.get("weight"), WEIGHT_DECIMALS),
@@ -256,10 +475,66 @@ class SendCloudUtils:
 		}
 
 
-def check_weight(service: dict, parcels: list[dict]) -> bool:
-	"""Check if the weight of any parcel is within the range of the service."""
-	max_weight_kg = float(service["max_weight"])
-	min_weight_kg = float(service["min_weight"])
-	return any(
-		max_weight_kg > parcel.get("weight") and min_weight_kg <= parcel.get("weight") for parcel in parcels
-	)
+def get_quotes(methods: list[dict], parcels: list[dict]) -> list[dict]:
+	"""Price parcels against cached shipping methods, without network access.
+
+	A method qualifies only if every parcel lies within its weight band, and each parcel is
+	priced on its own. For carriers where no single method takes all parcels, a combined quote
+	gives every parcel the cheapest method of that carrier it fits into.
+	"""
+	weights = [flt(parcel.get("weight")) for parcel in parcels]
+	counts = [cint(parcel.get("count")) for parcel in parcels]
+
+	quotes = []
+	methods_by_carrier = {}
+	for method in methods:
+		methods_by_carrier.setdefault(method.carrier, []).append(method)
+		if all(fits_weight(method, weight) for weight in weights):
+			quotes.append(
+				frappe._dict(
+					carrier=method.carrier,
+					service_name=method.name,
+					total_price=method.price * sum(counts),
+					parcel_service_ids=[method.id] * len(parcels),
+				)
+			)
+
+	carriers_with_quote = {quote.carrier for quote in quotes}
+	for carrier, carrier_methods in methods_by_carrier.items():
+		if carrier in carriers_with_quote:
+			continue
+
+		parcel_methods = []
+		for weight in weights:
+			fitting = [method for method in carrier_methods if fits_weight(method, weight)]
+			if not fitting:
+				break
+			parcel_methods.append(min(fitting, key=lambda method: method.price))
+		else:
+			if parcel_methods:
+				quotes.append(
+					frappe._dict(
+						carrier=carrier,
+						service_name=" + ".join(dict.fromkeys(method.name for method in parcel_methods)),
+						total_price=sum(
+							method.price * count for method, count in zip(parcel_methods, counts)
+						),
+						parcel_service_ids=[method.id for method in parcel_methods],
+					)
+				)
+
+	return quotes
+
+
+def fits_weight(method: dict, weight: float) -> bool:
+	"""Check if a weight is within the range of a shipping method."""
+	return method.min_weight <= weight < method.max_weight
+
+
+def get_parcel_service_id(service_info: dict, index: int):
+	"""Return the shipping method for the parcel at (1-based) `index` of a booking."""
+	parcel_service_ids = service_info.get("parcel_service_ids")
+	if parcel_service_ids:
+		return parcel_service_ids[index - 1]
+
+	return service_info["service_id"]
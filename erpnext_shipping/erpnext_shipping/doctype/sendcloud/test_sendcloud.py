@@ -1,9 +1,44 @@
 # Copyright (c) 2020, Frappe and Contributors
 # See license.txt
 
-# import frappe
 import unittest
 
+import frappe
+
+from erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud import get_parcel_service_id, get_quotes
+
+
+def method(id, carrier, min_weight, max_weight, price):
+	return frappe._dict(
+		id=id,
+		carrier=carrier,
+		name=f"{carrier} {id}",
+		min_weight=min_weight,
+		max_weight=max_weight,
+		price=price,
+	)
+
+
+METHODS = [
+	method(1, "DHL", 0, 2, 4.0),
+	method(2, "DHL", 2, 10, 7.0),
+	method(3, "DPD", 0, 31.5, 9.0),
+]
+
 
 class TestSendCloud(unittest.TestCase):
-	pass
+	def test_every_parcel_must_fit(self):
+		quotes = get_quotes(METHODS, [{"weight": 1, "count": 2}])
+		self.assertEqual({q.service_name: q.total_price for q in quotes}, {"DHL 1": 8.0, "DPD 3": 18.0})
+
+	def test_mixed_parcels_are_priced_individually(self):
+		quotes = get_quotes(METHODS, [{"weight": 1, "count": 1}, {"weight": 5, "count": 2}])
+		by_carrier = {q.carrier: q for q in quotes}
+
+		self.assertEqual(by_carrier["DPD"].total_price, 27.0)
+		self.assertEqual(by_carrier["DHL"].total_price, 18.0)
+		self.assertEqual(by_carrier["DHL"].parcel_service_ids, [1, 2])
+		self.assertEqual(get_parcel_service_id(by_carrier["DHL"], 2), 2)
+
+	def test_no_quote_if_a_parcel_fits_nowhere(self):
+		self.assertEqual(get_quotes(METHODS, [{"weight": 1, "count": 1}, {"weight": 40, "count": 1}]), [])
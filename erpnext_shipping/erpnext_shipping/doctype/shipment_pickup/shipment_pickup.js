@@ -0,0 +1,12 @@
+// Copyright (c) 2026, Frappe and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Shipment Pickup", {
+	refresh(frm) {
+		if (frm.doc.status !== "Booked" && frm.doc.service_provider !== "LetMeShip") {
+			frm.add_custom_button(__("Book Pickup"), () => {
+				frm.call("book").then(() => frm.reload_doc());
+			});
+		}
+	},
+});
@@ -0,0 +1,297 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""One carrier pickup for many Shipments.
+
+Booked Shipments that are picked up at the same address, by the same carrier, with the same
+provider account and on the same date form a group, and one pickup is booked per group.
+EasyPost and SendCloud pickups are booked for a whole date by `book_pickups` in a single
+background job. LetMeShip orders pickups together with a shipment, so with "Order One
+LetMeShip Pickup per Group" enabled only the first booking of a group orders one and the
+later ones are added to it.
+"""
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import cint, flt, get_datetime, get_time, getdate
+
+from erpnext_shipping.erpnext_shipping.accounts import get_booking_account
+from erpnext_shipping.erpnext_shipping.doctype.easypost.easypost import EASYPOST_PROVIDER, get_easypost_utils
+from erpnext_shipping.erpnext_shipping.doctype.letmeship.letmeship import LETMESHIP_PROVIDER
+from erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud import SENDCLOUD_PROVIDER, SendCloudUtils
+from erpnext_shipping.erpnext_shipping.jobs import BULK, enqueue_shipping_job
+
+# providers with a pickup API of their own
+PICKUP_PROVIDERS = (EASYPOST_PROVIDER, SENDCLOUD_PROVIDER)
+GROUP_FIELDS = ("service_provider", "shipping_account", "carrier", "pickup_address_name", "pickup_date")
+
+
+class ShipmentPickup(Document):
+	def validate(self):
+		self.total_parcels = sum(cint(row.parcels) for row in self.shipments)
+		self.total_weight = sum(flt(row.weight) for row in self.shipments)
+
+	@frappe.whitelist()
+	def book(self):
+		self.check_permission("write")
+		if self.status == "Booked" or self.service_provider not in PICKUP_PROVIDERS:
+			return
+
+		book_pickup(self)
+
+
+@frappe.whitelist()
+def enqueue_pickup_booking(pickup_date: str | None = None):
+	"""Book the pickups of all Shipments picked up on `pickup_date` in a background job.
+
+	Returns False if a job for that date is queued or running already.
+	"""
+	frappe.has_permission("Shipment Pickup", "create", throw=True)
+	pickup_date = getdate(pickup_date)
+	return bool(
+		enqueue_shipping_job(
+			"erpnext_shipping.erpnext_shipping.doctype.shipment_pickup.shipment_pickup.book_pickups",
+			BULK,
+			pickup_date=pickup_date,
+			# one job per date at a time
+			job_id=f"erpnext_shipping:book_pickups:{pickup_date}",
+			deduplicate=True,
+		)
+	)
+
+
+def book_pickups(pickup_date):
+	"""Background job: group the Shipments of `pickup_date` and book one pickup per group.
+
+	Pickups of that date that could not be booked before are tried again.
+	"""
+	create_pickups(pickup_date)
+	frappe.db.commit()
+
+	pickups = frappe.get_all(
+		"Shipment Pickup",
+		filters={
+			"pickup_date": pickup_date,
+			"service_provider": ("in", PICKUP_PROVIDERS),
+			"status": ("!=", "Booked"),
+		},
+		pluck="name",
+	)
+	for name in pickups:
+		book_pickup(frappe.get_doc("Shipment Pickup", name))
+		frappe.db.commit()
+
+
+def create_pickups(pickup_date) -> list[str]:
+	"""Add the booked Shipments of `pickup_date` without a pickup to one Shipment Pickup per group."""
+	shipments = frappe.get_all(
+		"Shipment",
+		filters={
+			"docstatus": 1,
+			"status": "Booked",
+			"pickup_type": "Pickup",
+			"pickup_date": pickup_date,
+			"service_provider": ("in", PICKUP_PROVIDERS),
+			"shipment_pickup": ("is", "not set"),
+		},
+		fields=["name", *GROUP_FIELDS, "pickup_from", "pickup_to", "awb_number", "total_weight"],
+		order_by="name",
+	)
+	parcels = get_parcel_counts([shipment.name for shipment in shipments])
+
+	pickups = []
+	for key, group in group_shipments(shipments).items():
+		# a pickup that was not booked yet takes more Shipments
+		pickup = get_pickup(key, ("Pending", "Failed")) or get_new_pickup(key)
+		for shipment in group:
+			add_shipment(pickup, shipment, parcels.get(shipment.name, 0))
+		pickup.save(ignore_permissions=True)
+
+		for shipment in group:
+			frappe.db.set_value("Shipment", shipment.name, "shipment_pickup", pickup.name)
+		pickups.append(pickup.name)
+
+	return pickups
+
+
+def group_shipments(shipments: list[dict]) -> dict[tuple, list[dict]]:
+	"""Group Shipments by their values of `GROUP_FIELDS`, in the order they come."""
+	groups = {}
+	for shipment in shipments:
+		groups.setdefault(get_group_key(shipment), []).append(shipment)
+	return groups
+
+
+def get_group_key(shipment) -> tuple:
+	return tuple(shipment.get(field) or None for field in GROUP_FIELDS)
+
+
+def get_pickup(key: tuple, statuses: tuple[str, ...]) -> "ShipmentPickup | None":
+	filters = {
+		field: value if value is not None else ("is", "not set")
+		for field, value in zip(GROUP_FIELDS, key, strict=True)
+	}
+	name = frappe.db.get_value("Shipment Pickup", {**filters, "status": ("in", statuses)})
+	return frappe.get_doc("Shipment Pickup", name) if name else None
+
+
+def get_new_pickup(key: tuple) -> "ShipmentPickup":
+	pickup = frappe.new_doc("Shipment Pickup")
+	pickup.update(dict(zip(GROUP_FIELDS, key, strict=True)))
+	return pickup
+
+
+def add_shipment(pickup: "ShipmentPickup", shipment, parcels: int):
+	pickup.append(
+		"shipments",
+		{
+			"shipment": shipment.name,
+			"awb_number": shipment.awb_number,
+			"parcels": parcels,
+			"weight": shipment.total_weight,
+		},
+	)
+	# the carrier comes once, between the earliest start and the latest end
+	if shipment.pickup_from:
+		pickup_from = get_time(shipment.pickup_from)
+		pickup.pickup_from = (
+			min(get_time(pickup.pickup_from), pickup_from) if pickup.pickup_from else pickup_from
+		)
+	if shipment.pickup_to:
+		pickup_to = get_time(shipment.pickup_to)
+		pickup.pickup_to = max(get_time(pickup.pickup_to), pickup_to) if pickup.pickup_to else pickup_to
+
+
+def get_parcel_counts(shipments: list[str]) -> dict[str, int]:
+	if not shipments:
+		return {}
+
+	parcels = frappe.get_all(
+		"Shipment Parcel",
+		filters={"parenttype": "Shipment", "parent": ("in", shipments)},
+		fields=["parent", "count"],
+	)
+	counts = {}
+	for parcel in parcels:
+		counts[parcel.parent] = counts.get(parcel.parent, 0) + (cint(parcel.count) or 1)
+	return counts
+
+
+def book_pickup(pickup: "ShipmentPickup"):
+	"""Book one pickup with the provider for all Shipments of `pickup`."""
+	from erpnext_shipping.erpnext_shipping.shipping import get_shipment_parties
+
+	# the row lock makes a concurrent booking of the same pickup wait, and then find it booked
+	if frappe.db.get_value("Shipment Pickup", pickup.name, "status", for_update=True) == "Booked":
+		return
+	pickup.reload()
+
+	# the Shipments of a group share their pickup address, take the contact of the first one
+	first_shipment = frappe.get_doc("Shipment", pickup.shipments[0].shipment)
+	pickup_address, _delivery_address, pickup_contact, _delivery_contact = get_shipment_parties(
+		first_shipment
+	)
+	start_at, end_at = get_pickup_window(pickup)
+
+	frappe.flags.shipping_exception = None
+	pickup_info = None
+	if pickup.service_provider == EASYPOST_PROVIDER:
+		shipment_ids = frappe.get_all(
+			"Shipment",
+			filters={"name": ("in", [row.shipment for row in pickup.shipments])},
+			pluck="shipment_id",
+		)
+		pickup_info = get_easypost_utils().create_pickup(
+			shipment_ids=[ship_id for shipment_id in shipment_ids for ship_id in shipment_id.split(", ")],
+			address=pickup_address,
+			contact=pickup_contact,
+			carrier=pickup.carrier,
+			start_at=start_at,
+			end_at=end_at,
+			reference=pickup.name,
+		)
+
+	if pickup.service_provider == SENDCLOUD_PROVIDER:
+		pickup_info = SendCloudUtils(get_booking_account(pickup.shipping_account)).create_pickup(
+			carrier=pickup.carrier,
+			address=pickup_address,
+			contact=pickup_contact,
+			parcels=pickup.total_parcels,
+			total_weight=pickup.total_weight,
+			start_at=start_at,
+			end_at=end_at,
+			reference=pickup.name,
+		)
+
+	if pickup_info:
+		pickup.db_set({"status": "Booked", "last_error": None, **pickup_info})
+	else:
+		error = frappe.flags.shipping_exception
+		pickup.db_set(
+			{
+				"status": "Failed",
+				"last_error": repr(error) if error else _("The provider returned no result."),
+			}
+		)
+
+
+def get_pickup_window(pickup: "ShipmentPickup"):
+	date = getdate(pickup.pickup_date)
+	return (
+		get_datetime(f"{date} {get_time(pickup.pickup_from or '09:00')}"),
+		get_datetime(f"{date} {get_time(pickup.pickup_to or '17:00')}"),
+	)
+
+
+def orders_letmeship_pickup(shipment: str, account: str | None, carrier: str) -> bool:
+	"""Return whether booking a LetMeShip Shipment should order a carrier pickup.
+
+	Only the first Shipment of a group orders one, the others are picked up with it.
+	"""
+	if not frappe.db.get_single_value("Shipping Settings", "order_letmeship_pickups"):
+		return False
+
+	shipment_doc = frappe.get_doc("Shipment", shipment)
+	if shipment_doc.pickup_type != "Pickup":
+		return False
+
+	key = get_group_key(
+		{
+			"service_provider": LETMESHIP_PROVIDER,
+			"shipping_account": account,
+			"carrier": carrier,
+			"pickup_address_name": shipment_doc.pickup_address_name,
+			"pickup_date": shipment_doc.pickup_date,
+		}
+	)
+	return not get_pickup(key, ("Booked",))
+
+
+def add_to_letmeship_pickup(shipment: str, ordered: bool):
+	"""Record a booked LetMeShip Shipment with the pickup of its group.
+
+	`ordered` tells whether its booking ordered the pickup, else it joins the one of an
+	earlier Shipment.
+	"""
+	if not frappe.db.get_single_value("Shipping Settings", "order_letmeship_pickups"):
+		return
+
+	shipment_doc = frappe.get_doc("Shipment", shipment)
+	if shipment_doc.pickup_type != "Pickup":
+		return
+
+	key = get_group_key(shipment_doc)
+	if ordered:
+		pickup = get_new_pickup(key)
+		pickup.status = "Booked"
+		pickup.pickup_id = shipment_doc.shipment_id
+	else:
+		pickup = get_pickup(key, ("Booked",))
+		if not pickup:
+			return
+
+	add_shipment(
+		pickup, shipment_doc, sum(cint(parcel.count) or 1 for parcel in shipment_doc.shipment_parcel)
+	)
+	pickup.save(ignore_permissions=True)
+	shipment_doc.db_set("shipment_pickup", pickup.name)
@@ -0,0 +1,48 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.doctype.shipment_pickup import shipment_pickup
+from erpnext_shipping.erpnext_shipping.doctype.shipment_pickup.shipment_pickup import (
+	enqueue_pickup_booking,
+	group_shipments,
+)
+
+
+class TestShipmentPickup(FrappeTestCase):
+	def test_group_shipments(self):
+		def shipment(name, address, carrier="DHL", account=None):
+			return {
+				"name": name,
+				"service_provider": "SendCloud",
+				"shipping_account": account,
+				"carrier": carrier,
+				"pickup_address_name": address,
+				"pickup_date": "2026-10-20",
+			}
+
+		groups = group_shipments(
+			[
+				shipment("SHIP-1", "Warehouse"),
+				shipment("SHIP-2", "Store"),
+				shipment("SHIP-3", "Warehouse"),
+				shipment("SHIP-4", "Warehouse", carrier="DPD"),
+				shipment("SHIP-5", "Warehouse", account="Second"),
+			]
+		)
+		self.assertEqual(
+			[[row["name"] for row in group] for group in groups.values()],
+			[["SHIP-1", "SHIP-3"], ["SHIP-2"], ["SHIP-4"], ["SHIP-5"]],
+		)
+
+	def test_one_booking_job_per_date(self):
+		with patch.object(shipment_pickup, "enqueue_shipping_job", return_value=None) as enqueue:
+			# a job of that date is queued already
+			self.assertFalse(enqueue_pickup_booking("2026-10-20"))
+
+		kwargs = enqueue.call_args.kwargs
+		self.assertEqual(kwargs["job_id"], "erpnext_shipping:book_pickups:2026-10-20")
+		self.assertTrue(kwargs["deduplicate"])
@@ -0,0 +1,113 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+import json
+import re
+
+import frappe
+from frappe.model.document import Document
+
+REFERENCE_DOCTYPE = "Shipment Tracking Reference"
+TRACKING_NUMBER = "Tracking Number"
+PROVIDER_ID = "Provider ID"
+
+
+class ShipmentTrackingReference(Document):
+	pass
+
+
+def normalize_reference(reference: str) -> str:
+	"""Return the canonical form of a tracking number or provider id.
+
+	Scanners and carrier webhooks differ in case and whitespace, so both are removed.
+	"""
+	return re.sub(r"\s+", "", str(reference)).upper()
+
+
+def split_references(value: str | None) -> list[str]:
+	"""Split a comma-joined `awb_number` or `shipment_id` into normalized references."""
+	if not value:
+		return []
+
+	references = (normalize_reference(reference) for reference in str(value).split(","))
+	return [reference for reference in references if reference]
+
+
+def sync_tracking_references(shipment: str, service_provider: str, shipment_id: str, awb_number: str):
+	"""Replace the reference rows of a Shipment with its current ids and tracking numbers."""
+	rows = {(reference, PROVIDER_ID) for reference in split_references(shipment_id)}
+	rows |= {(reference, TRACKING_NUMBER) for reference in split_references(awb_number)}
+
+	frappe.db.delete(REFERENCE_DOCTYPE, {"shipment": shipment})
+	if not rows:
+		return
+
+	now = frappe.utils.now()
+	user = frappe.session.user
+	frappe.db.bulk_insert(
+		REFERENCE_DOCTYPE,
+		fields=[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"reference",
+			"reference_type",
+			"shipment",
+			"service_provider",
+		],
+		values=[
+			(
+				frappe.generate_hash(length=10),
+				now,
+				now,
+				user,
+				user,
+				reference,
+				reference_type,
+				shipment,
+				service_provider,
+			)
+			for reference, reference_type in sorted(rows)
+		],
+	)
+
+
+@frappe.whitelist()
+def get_shipments_by_reference(references: str | list[str]) -> dict[str, list[dict]]:
+	"""Return the Shipments and Delivery Notes for many tracking numbers or provider ids.
+
+	Accepts a list, a JSON list or a comma-separated string. The result is keyed by the
+	normalized reference; references without a match map to an empty list.
+	"""
+	frappe.has_permission("Shipment", "read", throw=True)
+
+	if isinstance(references, str):
+		references = json.loads(references) if references.startswith("[") else references.split(",")
+
+	normalized = list(dict.fromkeys(filter(None, (normalize_reference(r) for r in references))))
+	result = {reference: [] for reference in normalized}
+	if not normalized:
+		return result
+
+	matches = frappe.get_all(
+		REFERENCE_DOCTYPE,
+		filters={"reference": ("in", normalized)},
+		fields=["reference", "reference_type", "shipment", "service_provider"],
+	)
+
+	delivery_notes = {}
+	if matches:
+		for row in frappe.get_all(
+			"Shipment Delivery Note",
+			filters={"parenttype": "Shipment", "parent": ("in", {m.shipment for m in matches})},
+			fields=["parent", "delivery_note"],
+		):
+			delivery_notes.setdefault(row.parent, []).append(row.delivery_note)
+
+	for match in matches:
+		match.delivery_notes = delivery_notes.get(match.shipment, [])
+		result[match.reference].append(match)
+
+	return result
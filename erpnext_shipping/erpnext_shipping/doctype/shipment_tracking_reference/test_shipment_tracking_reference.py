@@ -0,0 +1,19 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.doctype.shipment_tracking_reference.shipment_tracking_reference import (
+	normalize_reference,
+	split_references,
+)
+
+
+class TestShipmentTrackingReference(FrappeTestCase):
+	def test_split_references(self):
+		self.assertEqual(split_references("123, 456,789"), ["123", "456", "789"])
+		self.assertEqual(split_references(" jd01 4600 "), ["JD014600"])
+		self.assertEqual(split_references(None), [])
+
+	def test_normalize_reference(self):
+		self.assertEqual(normalize_reference(" 1z 999\tAA1 "), "1Z999AA1")
@@ -0,0 +1,13 @@
+// Copyright (c) 2026, Frappe and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Shipping API Log", {
+	refresh(frm) {
+		const payloads = frm.doc.__onload || {};
+		["request", "response"].forEach((field) => {
+			frm.get_field(`${field}_html`).$wrapper.html(
+				$("<pre>").text(payloads[field] || __("Not recorded"))
+			);
+		});
+	},
+});
@@ -0,0 +1,146 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""Sampled log of the requests sent to shipping providers.
+
+A sample of the requests and every failed one are pushed to a Redis list and written to
+the database in batches by a scheduled job (see `write_buffer`), so the request itself
+only pays for one Redis round trip. Payloads are stored zlib compressed. Old entries are
+removed through Log Settings.
+"""
+
+import base64
+import json
+import pickle
+import random
+import time
+import zlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Interval
+from frappe.query_builder.functions import Now
+from frappe.utils import flt, now_datetime
+
+from erpnext_shipping.erpnext_shipping.codec import dumps
+from erpnext_shipping.erpnext_shipping.profiling import get_active_profile
+from erpnext_shipping.erpnext_shipping.write_buffer import flush_entries
+
+BUFFER_KEY = "erpnext_shipping:api_log_buffer"
+MAX_BUFFER_SIZE = 10_000  # entries kept if the flush job doesn't run
+FLUSH_BATCH_SIZE = 500
+LOG_FIELDS = (
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"service_provider",
+	"method",
+	"endpoint",
+	"status_code",
+	"latency",
+	"request",
+	"response",
+)
+
+
+class ShippingAPILog(Document):
+	def onload(self):
+		self.set_onload("request", decompress(self.request))
+		self.set_onload("response", decompress(self.response))
+
+	@staticmethod
+	def clear_old_logs(days=7):
+		table = frappe.qb.DocType("Shipping API Log")
+		frappe.db.delete(table, filters=(table.creation < (Now() - Interval(days=days))))
+
+
+class APILogger:
+	"""Capture a sample of a provider's requests, and time all of them for a profiled call.
+
+	Create it in the request context; `capture` may then be called from worker threads.
+	"""
+
+	def __init__(self, service_provider: str, sample_rate: float):
+		self.service_provider = service_provider
+		self.sample_rate = flt(sample_rate) / 100
+		self.cache = frappe.cache()
+		self.key = self.cache.make_key(BUFFER_KEY)
+		self.user = frappe.session.user
+		self.profile = get_active_profile()
+
+	def capture(self, method: str, endpoint: str, started: float, response, payload=None):
+		"""Buffer the request if it is sampled. Failed requests are always captured.
+
+		`response` is a `requests` or `httpx` response, `started` the `time.monotonic()`
+		before the request was sent.
+		"""
+		latency = time.monotonic() - started
+		if self.profile:
+			self.profile.add_http(latency)
+		if response.status_code < 400 and random.random() >= self.sample_rate:
+			return
+
+		entry = {
+			"service_provider": self.service_provider,
+			"method": method,
+			"endpoint": endpoint,
+			"status_code": response.status_code,
+			"latency": latency * 1000,
+			"request": dumps(payload).decode() if payload is not None else None,
+			"response": response.text,
+			"owner": self.user,
+			"creation": now_datetime(),
+		}
+		pipeline = self.cache.pipeline(transaction=False)
+		pipeline.rpush(self.key, pickle.dumps(entry))
+		pipeline.ltrim(self.key, -MAX_BUFFER_SIZE, -1)
+		pipeline.execute()
+
+
+def get_api_logger(service_provider: str, settings) -> APILogger:
+	return APILogger(service_provider, settings.get("api_log_sample_rate"))
+
+
+def flush_api_logs():
+	"""Scheduled job: write the buffered requests to the database."""
+	flush_entries(BUFFER_KEY, FLUSH_BATCH_SIZE, write_api_logs)
+
+
+def write_api_logs(entries: list[dict]):
+	values = []
+	for entry in entries:
+		values.append(
+			(
+				frappe.generate_hash(length=20),
+				entry["creation"],
+				entry["creation"],
+				entry["owner"],
+				entry["owner"],
+				entry["service_provider"],
+				entry["method"],
+				entry["endpoint"],
+				entry["status_code"],
+				entry["latency"],
+				compress(entry["request"]),
+				compress(entry["response"]),
+			)
+		)
+
+	frappe.db.bulk_insert("Shipping API Log", LOG_FIELDS, values)
+
+
+def compress(text: str | None) -> str | None:
+	if text is None:
+		return None
+	return base64.b64encode(zlib.compress(text.encode())).decode()
+
+
+def decompress(data: str | None) -> str | None:
+	if not data:
+		return None
+	text = zlib.decompress(base64.b64decode(data)).decode()
+	try:
+		return json.dumps(json.loads(text), indent=2)
+	except ValueError:
+		return text
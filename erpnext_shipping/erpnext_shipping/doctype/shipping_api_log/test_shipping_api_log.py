@@ -0,0 +1,39 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+import time
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.doctype.shipping_api_log import shipping_api_log
+from erpnext_shipping.erpnext_shipping.doctype.shipping_api_log.shipping_api_log import (
+	APILogger,
+	compress,
+	decompress,
+)
+from erpnext_shipping.erpnext_shipping.write_buffer import flush_entries
+
+
+class TestShippingAPILog(FrappeTestCase):
+	def test_payload_compression(self):
+		self.assertEqual(
+			decompress(compress('{"parcels":[{"weight":1}]}')),
+			'{\n  "parcels": [\n    {\n      "weight": 1\n    }\n  ]\n}',
+		)
+		self.assertEqual(decompress(compress("<html>Bad Gateway</html>")), "<html>Bad Gateway</html>")
+		self.assertIsNone(compress(None))
+
+	def test_failed_requests_are_always_captured(self):
+		buffer_key = f"erpnext_shipping:test_api_log:{frappe.generate_hash(length=10)}"
+		with patch.object(shipping_api_log, "BUFFER_KEY", buffer_key):
+			logger = APILogger("LetMeShip", sample_rate=0)
+		for status_code in (200, 503, 201, 422):
+			logger.capture(
+				"POST", "shipments", time.monotonic(), frappe._dict(status_code=status_code, text="")
+			)
+
+		captured = []
+		flush_entries(buffer_key, 100, captured.extend)
+		self.assertEqual([entry["status_code"] for entry in captured], [503, 422])
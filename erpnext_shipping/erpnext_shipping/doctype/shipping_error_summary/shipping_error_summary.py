@@ -0,0 +1,106 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""Aggregate provider failures, so that an outage doesn't flood the Error Log.
+
+Failures are fingerprinted by provider, endpoint and exception type. Each fingerprint gets
+one record per hour with a counter and the last message. A full traceback goes to the Error
+Log only for the 1st, 2nd, 4th, 8th … failure of the hour.
+"""
+
+import hashlib
+import sys
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Interval
+from frappe.query_builder.functions import Now
+from frappe.utils import now_datetime
+
+SAVEPOINT = "shipping_error_summary"
+
+
+class ShippingErrorSummary(Document):
+	@staticmethod
+	def clear_old_logs(days=30):
+		table = frappe.qb.DocType("Shipping Error Summary")
+		frappe.db.delete(table, filters=(table.modified < (Now() - Interval(days=days))))
+
+
+def log_provider_error(
+	action: str, service_provider: str | None = None, endpoint: str | None = None
+) -> tuple[str, str]:
+	"""Count the exception being handled and return the doctype and name of the record to
+	look at: the Error Log if its traceback was logged, else the Shipping Error Summary.
+	"""
+	exception = sys.exc_info()[1]
+	exception_type = type(exception).__name__ if exception else "Error"
+	fingerprint = get_fingerprint(service_provider, endpoint, exception_type)
+
+	now = now_datetime()
+	window_start, name = get_window(fingerprint, now)
+	values = {
+		"last_seen": now,
+		"last_action": action,
+		"last_message": str(exception)[:1000] if exception else None,
+	}
+
+	count = increment_count(name, values)
+	if not count:
+		# on Postgres a failed insert aborts the transaction, so it gets a savepoint to return to
+		frappe.db.savepoint(SAVEPOINT)
+		try:
+			frappe.get_doc(
+				{
+					"doctype": "Shipping Error Summary",
+					"fingerprint": fingerprint,
+					"service_provider": service_provider,
+					"endpoint": endpoint,
+					"exception_type": exception_type,
+					"window_start": window_start,
+					"count": 1,
+					**values,
+				}
+			).insert(ignore_permissions=True, set_name=name)
+			count = 1
+		except frappe.DuplicateEntryError:
+			# another worker opened the window first
+			frappe.db.rollback(save_point=SAVEPOINT)
+			count = increment_count(name, values)
+		else:
+			frappe.db.release_savepoint(SAVEPOINT)
+
+	if not is_sampled(count):
+		return "Shipping Error Summary", name
+
+	error_log = frappe.log_error(
+		title="Shipping Error", reference_doctype="Shipping Error Summary", reference_name=name
+	)
+	frappe.db.set_value(
+		"Shipping Error Summary", name, "last_error_log", error_log.name, update_modified=False
+	)
+	return "Error Log", error_log.name
+
+
+def increment_count(name: str, values: dict) -> int:
+	"""Count one more failure in a window and return the new count, 0 if the window is new."""
+	table = frappe.qb.DocType("Shipping Error Summary")
+	query = frappe.qb.update(table).set(table["count"], table["count"] + 1).where(table.name == name)
+	for field, value in values.items():
+		query = query.set(table[field], value)
+	query.run()
+	return frappe.db.get_value("Shipping Error Summary", name, "count") or 0
+
+
+def get_fingerprint(service_provider: str | None, endpoint: str | None, exception_type: str) -> str:
+	return hashlib.sha1(f"{service_provider}|{endpoint}|{exception_type}".encode()).hexdigest()[:16]
+
+
+def get_window(fingerprint: str, now) -> tuple:
+	"""Return the start of the hour of `now` and the name of the fingerprint's record for it."""
+	window_start = now.replace(minute=0, second=0, microsecond=0)
+	return window_start, f"{fingerprint}-{window_start:%Y%m%d%H}"
+
+
+def is_sampled(count: int) -> bool:
+	"""Whether the traceback of the `count`th failure of a window is logged: 1, 2, 4, 8 …"""
+	return count > 0 and not count & (count - 1)
@@ -0,0 +1,56 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from datetime import datetime
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.doctype.shipping_error_summary.shipping_error_summary import (
+	get_fingerprint,
+	get_window,
+	increment_count,
+	is_sampled,
+	log_provider_error,
+)
+
+
+class TestShippingErrorSummary(FrappeTestCase):
+	def test_hourly_window(self):
+		fingerprint = get_fingerprint("LetMeShip", "POST shipments/available", "ConnectionError")
+		start, name = get_window(fingerprint, datetime(2026, 10, 19, 14, 5, 30))
+		self.assertEqual(start, datetime(2026, 10, 19, 14))
+		self.assertEqual(name, f"{fingerprint}-2026101914")
+
+		self.assertEqual(get_window(fingerprint, datetime(2026, 10, 19, 14, 59, 59))[1], name)
+		self.assertNotEqual(get_window(fingerprint, datetime(2026, 10, 19, 15))[1], name)
+		self.assertNotEqual(
+			get_fingerprint("LetMeShip", "POST shipments/available", "ReadTimeout"), fingerprint
+		)
+
+	def test_traceback_sampling(self):
+		sampled = [count for count in range(1, 70) if is_sampled(count)]
+		self.assertEqual(sampled, [1, 2, 4, 8, 16, 32, 64])
+		self.assertFalse(is_sampled(0))
+
+	def test_increment_count(self):
+		self.assertEqual(increment_count("no-such-window", {}), 0)
+
+		provider = f"Test {frappe.generate_hash(length=6)}"
+		logged = []
+		for _failure in range(5):
+			try:
+				raise ConnectionError("provider down")
+			except ConnectionError:
+				logged.append(log_provider_error("fetching rates", provider, "rates")[0])
+
+		self.assertEqual(
+			logged,
+			["Error Log", "Error Log", "Shipping Error Summary", "Error Log", "Shipping Error Summary"],
+		)
+		summary = frappe.get_all(
+			"Shipping Error Summary", filters={"service_provider": provider}, fields=["count", "last_message"]
+		)
+		self.assertEqual(len(summary), 1)
+		self.assertEqual(summary[0].count, 5)
+		self.assertEqual(summary[0].last_message, "provider down")
@@ -0,0 +1,12 @@
+// Copyright (c) 2026, Frappe and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Shipping Label", {
+	refresh(frm) {
+		if (frm.doc.status === "Archived") {
+			frm.add_custom_button(__("Restore"), () => {
+				frm.call("restore").then(() => frm.reload_doc());
+			});
+		}
+	},
+});
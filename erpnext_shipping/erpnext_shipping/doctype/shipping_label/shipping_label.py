@@ -0,0 +1,302 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""Storage of shipping labels.
+
+Every label is stored once, identified by the SHA-256 of its content: fetching the same
+label again returns the File of the first copy. A daily job moves labels older than
+"Archive Labels After (Days)" out of the File list into one compressed zip per month,
+and deletes the archives of months older than "Delete Labels After (Days)". An archived
+label is restored as a File when it is fetched again or restored from its Shipping Label.
+
+Label Files from before this existed are indexed by the daily job, and their copies are
+removed.
+"""
+
+import calendar
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, cint, getdate, today
+
+ARCHIVE_FOLDER = "shipping_label_archive"  # in the private files of the site
+BATCH_SIZE = 500
+
+
+class ShippingLabel(Document):
+	@frappe.whitelist()
+	def restore(self):
+		frappe.has_permission("Shipment", "read", doc=self.shipment, throw=True)
+		if self.status == "Archived":
+			restore_label(self)
+
+
+def store_label(shipment: str, content: bytes, file_extension: str = "pdf") -> str:
+	"""Attach a label to its Shipment, unless it is stored already, and return its file URL."""
+	content_hash = hashlib.sha256(content).hexdigest()
+	name = frappe.db.get_value("Shipping Label", {"content_hash": content_hash})
+	if name:
+		label = frappe.get_doc("Shipping Label", name)
+		label.db_set("times_stored", cint(label.times_stored) + 1)
+		if label.status == "Archived":
+			# the fetched content is the same, no need to read the archive
+			file = attach_label(shipment, content, file_extension)
+			set_restored(label, file)
+			return file.file_url
+
+		file_url = frappe.db.get_value("File", label.file, "file_url")
+		if file_url:
+			return file_url
+
+		# the File was deleted by hand, store it again
+		file = attach_label(shipment, content, file_extension)
+		label.db_set("file", file.name)
+		return file.file_url
+
+	file = attach_label(shipment, content, file_extension)
+	frappe.get_doc(
+		{
+			"doctype": "Shipping Label",
+			"shipment": shipment,
+			"label_date": today(),
+			"file_size": len(content),
+			"status": "Active",
+			"file": file.name,
+			"content_hash": content_hash,
+			"file_extension": file_extension,
+		}
+	).insert(ignore_permissions=True)
+	return file.file_url
+
+
+def attach_label(shipment: str, content: bytes, file_extension: str):
+	attachment = frappe.new_doc("File")
+	attachment.file_name = f"label_{shipment}.{file_extension}"
+	attachment.content = content
+	attachment.folder = "Home/Attachments"
+	attachment.attached_to_doctype = "Shipment"
+	attachment.attached_to_name = shipment
+	attachment.is_private = 1
+	attachment.save(ignore_permissions=True)
+	return attachment
+
+
+def restore_label(label: ShippingLabel) -> str:
+	"""Attach an archived label to its Shipment again and return its file URL."""
+	content = read_from_archive(get_archive_path(label.archive), get_member_name(label))
+	file = attach_label(label.shipment, content, label.file_extension)
+	set_restored(label, file)
+	return file.file_url
+
+
+def set_restored(label: ShippingLabel, file):
+	# restored labels count as new, so they are not archived again right away
+	label.db_set({"status": "Active", "file": file.name, "label_date": today(), "archived_on": None})
+
+
+def compact_label_storage():
+	"""Daily job: index label Files, archive old labels and delete expired ones."""
+	settings = frappe.get_cached_doc("Shipping Settings")
+	index_label_files()
+
+	if cint(settings.label_archive_after_days):
+		archive_labels(add_days(today(), -cint(settings.label_archive_after_days)))
+
+	if cint(settings.label_retention_days):
+		prune_labels(add_days(today(), -cint(settings.label_retention_days)))
+
+
+def index_label_files():
+	"""Add label Files stored before labels were indexed, deleting their copies."""
+	file = frappe.qb.DocType("File")
+	label = frappe.qb.DocType("Shipping Label")
+	files = (
+		frappe.qb.from_(file)
+		.left_join(label)
+		.on(label.file == file.name)
+		.select(file.name)
+		.where(
+			(file.attached_to_doctype == "Shipment")
+			& (file.file_name.like("label\\_%"))
+			& (file.is_folder == 0)
+			& label.name.isnull()
+		)
+		.orderby(file.creation)
+		.limit(BATCH_SIZE)
+		.run(pluck=True)
+	)
+
+	for name in files:
+		file_doc = frappe.get_doc("File", name)
+		try:
+			content = file_doc.get_content()
+		except OSError:
+			# missing on disk, nothing to keep
+			continue
+
+		content = content.encode() if isinstance(content, str) else content
+		content_hash = hashlib.sha256(content).hexdigest()
+		existing = frappe.db.get_value(
+			"Shipping Label", {"content_hash": content_hash}, ["name", "times_stored"]
+		)
+		if existing:
+			frappe.db.set_value("Shipping Label", existing[0], "times_stored", cint(existing[1]) + 1)
+			frappe.delete_doc("File", name, ignore_permissions=True)
+		else:
+			frappe.get_doc(
+				{
+					"doctype": "Shipping Label",
+					"shipment": file_doc.attached_to_name,
+					"label_date": getdate(file_doc.creation),
+					"file_size": len(content),
+					"status": "Active",
+					"file": name,
+					"content_hash": content_hash,
+					"file_extension": os.path.splitext(file_doc.file_name)[1].lstrip(".") or "pdf",
+				}
+			).insert(ignore_permissions=True)
+		frappe.db.commit()
+
+
+def archive_labels(before):
+	"""Move the labels stored before `before` from their Files into the archive of their month."""
+	labels = frappe.get_all(
+		"Shipping Label",
+		filters={"status": "Active", "label_date": ("<", before)},
+		fields=["name", "file", "label_date", "content_hash", "file_extension"],
+		order_by="label_date",
+		limit=BATCH_SIZE,
+	)
+
+	by_archive = {}
+	for label in labels:
+		by_archive.setdefault(get_archive_name(label.label_date), []).append(label)
+
+	for archive, archive_labels in by_archive.items():
+		members, archived = {}, []
+		for label in archive_labels:
+			content = get_file_content(label.file)
+			if content is None:
+				# the File was deleted, there is nothing to archive; the label is stored
+				# again when it is fetched again
+				frappe.delete_doc("Shipping Label", label.name, ignore_permissions=True)
+				continue
+
+			members[get_member_name(label)] = content
+			archived.append(label)
+
+		if members:
+			add_to_archive(get_archive_path(archive), members)
+
+		for label in archived:
+			frappe.db.set_value(
+				"Shipping Label",
+				label.name,
+				{"status": "Archived", "file": None, "archive": archive, "archived_on": today()},
+			)
+			frappe.delete_doc("File", label.file, ignore_permissions=True)
+		frappe.db.commit()
+
+
+def get_file_content(file: str | None) -> bytes | None:
+	"""Return the content of a label File, or None if it was deleted."""
+	if not file or not frappe.db.exists("File", file):
+		return None
+
+	try:
+		content = frappe.get_doc("File", file).get_content()
+	except OSError:
+		# missing on disk
+		return None
+
+	return content.encode() if isinstance(content, str) else content
+
+
+def prune_labels(before):
+	"""Delete the labels of all months that ended before `before`, with their archives."""
+	archives = frappe.get_all(
+		"Shipping Label", filters={"status": "Archived"}, pluck="archive", distinct=True
+	)
+	for archive in archives:
+		if get_archive_end(archive) >= getdate(before):
+			continue
+
+		frappe.db.delete("Shipping Label", {"archive": archive, "status": "Archived"})
+		path = get_archive_path(archive)
+		if os.path.exists(path):
+			os.remove(path)
+		frappe.db.commit()
+
+	# labels that were never archived
+	labels = frappe.get_all(
+		"Shipping Label",
+		filters={"status": "Active", "label_date": ("<", before)},
+		fields=["name", "file"],
+		limit=BATCH_SIZE,
+	)
+	for label in labels:
+		if label.file and frappe.db.exists("File", label.file):
+			frappe.delete_doc("File", label.file, ignore_permissions=True)
+		frappe.delete_doc("Shipping Label", label.name, ignore_permissions=True)
+	frappe.db.commit()
+
+
+def get_archive_name(label_date) -> str:
+	"""Return the archive of the month of `label_date`.
+
+	>>> get_archive_name("2026-03-14")
+	'labels-2026-03.zip'
+	"""
+	return f"labels-{getdate(label_date):%Y-%m}.zip"
+
+
+def get_archive_end(archive: str):
+	"""Return the last day of the month of an archive."""
+	year, month = (int(part) for part in archive.removeprefix("labels-").removesuffix(".zip").split("-"))
+	return getdate(f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]}")
+
+
+def get_archive_path(archive: str) -> str:
+	return frappe.get_site_path("private", "files", ARCHIVE_FOLDER, archive)
+
+
+def get_member_name(label) -> str:
+	return f"{label.content_hash}.{label.file_extension or 'pdf'}"
+
+
+def add_to_archive(path: str, members: dict[str, bytes]):
+	"""Add the `members` that are not in the zip archive at `path` yet.
+
+	The members are added to a copy of the archive which then replaces it, so that a crash
+	while writing doesn't corrupt the labels archived before.
+	"""
+	directory = os.path.dirname(path)
+	os.makedirs(directory, exist_ok=True)
+	fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".zip")
+	os.close(fd)
+	try:
+		if os.path.exists(path):
+			shutil.copyfile(path, temp_path)
+			mode = "a"
+		else:
+			mode = "w"
+
+		with zipfile.ZipFile(temp_path, mode, compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+			archived = set(archive.namelist())
+			for member, content in members.items():
+				if member not in archived:
+					archive.writestr(member, content)
+
+		os.replace(temp_path, path)
+	finally:
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+
+
+def read_from_archive(path: str, member: str) -> bytes:
+	with zipfile.ZipFile(path) as archive:
+		return archive.read(member)
@@ -0,0 +1,75 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+import hashlib
+import os
+import tempfile
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, today
+
+from erpnext_shipping.erpnext_shipping.doctype.shipping_label.shipping_label import (
+	add_to_archive,
+	archive_labels,
+	get_archive_end,
+	get_archive_name,
+	read_from_archive,
+	store_label,
+)
+
+
+class TestShippingLabel(FrappeTestCase):
+	def test_archive_month(self):
+		self.assertEqual(get_archive_name("2024-02-14"), "labels-2024-02.zip")
+		self.assertEqual(str(get_archive_end("labels-2024-02.zip")), "2024-02-29")
+		self.assertEqual(str(get_archive_end("labels-2026-12.zip")), "2026-12-31")
+
+	def test_archive_round_trip(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "archive", "labels-2026-10.zip")
+			add_to_archive(path, {"a.pdf": b"%PDF-1.4 first"})
+			add_to_archive(path, {"b.pdf": b"%PDF-1.4 second", "c.pdf": b"%PDF-1.4 third"})
+			# adding a label again keeps the first copy
+			add_to_archive(path, {"a.pdf": b"%PDF-1.4 changed"})
+
+			self.assertEqual(read_from_archive(path, "a.pdf"), b"%PDF-1.4 first")
+			self.assertEqual(read_from_archive(path, "b.pdf"), b"%PDF-1.4 second")
+			self.assertEqual(read_from_archive(path, "c.pdf"), b"%PDF-1.4 third")
+			# no temporary copies are left behind
+			self.assertEqual(os.listdir(os.path.dirname(path)), ["labels-2026-10.zip"])
+
+	def test_label_without_file_is_not_archived(self):
+		label = frappe.get_doc(
+			{
+				"doctype": "Shipping Label",
+				"label_date": "2000-01-01",
+				"status": "Active",
+				"file": None,
+				"content_hash": hashlib.sha256(b"%PDF-1.4 gone").hexdigest(),
+				"file_extension": "pdf",
+			}
+		).insert(ignore_permissions=True)
+
+		# only archive labels before any real one
+		archive_labels("2000-01-02")
+		self.assertFalse(frappe.db.exists("Shipping Label", label.name))
+
+	def test_archived_label_is_stored_from_content(self):
+		content = b"%PDF-1.4 archived"
+		label = frappe.get_doc(
+			{
+				"doctype": "Shipping Label",
+				"label_date": add_days(today(), -10),
+				"status": "Archived",
+				# no archive on disk, the fetched content has to be used
+				"archive": "labels-2000-01.zip",
+				"content_hash": hashlib.sha256(content).hexdigest(),
+				"file_extension": "pdf",
+			}
+		).insert(ignore_permissions=True)
+
+		file_url = store_label("SHIP-0001", content)
+		label.reload()
+		self.assertEqual(label.status, "Active")
+		self.assertEqual(frappe.db.get_value("File", label.file, "file_url"), file_url)
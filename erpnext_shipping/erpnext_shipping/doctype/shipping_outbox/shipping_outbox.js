@@ -0,0 +1,12 @@
+// Copyright (c) 2026, Frappe and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Shipping Outbox", {
+	refresh(frm) {
+		if (["Pending", "Dead"].includes(frm.doc.status)) {
+			frm.add_custom_button(__("Retry Now"), () => {
+				frm.call("retry").then(() => frm.reload_doc());
+			});
+		}
+	},
+});
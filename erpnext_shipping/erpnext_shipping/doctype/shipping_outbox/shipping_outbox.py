@@ -0,0 +1,240 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""Retry provider operations that failed for a transient reason.
+
+An operation that fails because a provider could not be reached is stored here and
+replayed by a scheduled job, with exponential backoff and jitter between attempts. After
+`max_retry_attempts` it is marked Dead and left for someone to look at.
+
+A booking is only retried if the provider certainly did not receive it, i.e. if no
+connection could be made. After any other failure, such as a read timeout, a dropped
+connection or an unreadable answer, the provider may have booked the shipment already,
+and booking again would ship and charge it twice.
+"""
+
+import json
+import random
+
+import frappe
+import requests
+import urllib3
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import add_to_date, cint, now_datetime
+
+BACKOFF_BASE = 60  # seconds
+BACKOFF_CAP = 6 * 60 * 60  # seconds
+DEFAULT_MAX_ATTEMPTS = 8
+REPLAY_BATCH_SIZE = 100
+STALE_AFTER = 60 * 60  # seconds an entry may stay Processing before its worker is assumed dead
+OPEN_STATUSES = ("Pending", "Processing")
+TRANSIENT_ERRORS = (
+	requests.exceptions.ConnectionError,
+	requests.exceptions.Timeout,
+	# gateways answer with an HTML error page while a provider is down
+	requests.exceptions.JSONDecodeError,
+)
+# operations that must not reach the provider twice
+NON_IDEMPOTENT_OPERATIONS = ("Create Shipment",)
+
+
+class ShippingOutbox(Document):
+	@frappe.whitelist()
+	def retry(self):
+		frappe.only_for("System Manager")
+		if self.status not in ("Pending", "Dead"):
+			return
+
+		self.db_set({"status": "Pending", "next_attempt_at": now_datetime()})
+		if not process_entry(self):
+			frappe.msgprint(_("This entry is being processed already."))
+
+
+def is_retryable(operation: str, error: Exception | None) -> bool:
+	"""Whether `operation` may be sent again after failing with `error`."""
+	if not isinstance(error, TRANSIENT_ERRORS):
+		return False
+	return operation not in NON_IDEMPOTENT_OPERATIONS or not may_have_been_received(error)
+
+
+def may_have_been_received(error: Exception) -> bool:
+	"""Whether the provider may have received the request that failed with `error`.
+
+	Only a connection that could not be made, e.g. one that was refused or timed out, rules
+	out that the request was sent.
+	"""
+	if isinstance(error, requests.exceptions.ConnectTimeout):
+		return False
+	if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+		return not isinstance(getattr(error.args[0], "reason", None), urllib3.exceptions.NewConnectionError)
+	return True
+
+
+def get_transient_error(operation: str) -> Exception | None:
+	"""Return the exception last reported by `show_error_alert`, if retrying may help."""
+	exception = frappe.flags.shipping_exception
+	return exception if is_retryable(operation, exception) else None
+
+
+def queue_for_retry(operation: str, shipment: str, service_provider: str, payload: dict):
+	"""Queue a failed operation for retry if it failed for a transient reason.
+
+	Nothing is queued if the same operation of the Shipment is already waiting.
+	"""
+	error = get_transient_error(operation)
+	if not error:
+		exception = frappe.flags.shipping_exception
+		if (
+			operation in NON_IDEMPOTENT_OPERATIONS
+			and isinstance(exception, TRANSIENT_ERRORS)
+			and may_have_been_received(exception)
+		):
+			message = _(
+				"{0} did not answer in time. Please check whether it booked {1} before booking again."
+			)
+			frappe.msgprint(message.format(service_provider, shipment), indicator="orange")
+		return
+
+	if not frappe.db.get_single_value("Shipping Settings", "retry_failed_operations"):
+		return
+
+	idempotency_key = get_idempotency_key(operation, shipment)
+	if frappe.db.exists(
+		"Shipping Outbox", {"idempotency_key": idempotency_key, "status": ("in", OPEN_STATUSES)}
+	):
+		return
+
+	entry = frappe.get_doc(
+		{
+			"doctype": "Shipping Outbox",
+			"operation": operation,
+			"shipment": shipment,
+			"service_provider": service_provider,
+			"idempotency_key": idempotency_key,
+			"payload": frappe.as_json(payload),
+			"last_error": repr(error),
+			"next_attempt_at": add_to_date(now_datetime(), seconds=get_backoff(0)),
+		}
+	).insert(ignore_permissions=True)
+	frappe.msgprint(
+		_("{0} could not reach {1}. It will be retried automatically.").format(
+			_(operation), service_provider
+		),
+		indicator="orange",
+		alert=True,
+	)
+	return entry.name
+
+
+def get_idempotency_key(operation: str, shipment: str) -> str:
+	# one open entry per Shipment and operation, so a booking can't be queued twice
+	return f"{frappe.scrub(operation)}:{shipment}"
+
+
+def get_backoff(attempts: int) -> float:
+	"""Return seconds to wait before the next attempt, doubling with every attempt."""
+	return random.uniform(BACKOFF_BASE, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempts))
+
+
+def replay_outbox():
+	"""Scheduled job: release stale entries, then replay the entries that are due."""
+	release_stale_entries()
+	entries = frappe.get_all(
+		"Shipping Outbox",
+		filters={"status": "Pending", "next_attempt_at": ("<=", now_datetime())},
+		order_by="next_attempt_at asc",
+		limit=REPLAY_BATCH_SIZE,
+		pluck="name",
+	)
+	for name in entries:
+		process_entry(frappe.get_doc("Shipping Outbox", name))
+		frappe.db.commit()
+
+
+def process_entry(entry: ShippingOutbox) -> bool:
+	"""Replay an entry, unless another worker has claimed it. Return whether it was replayed."""
+	if not claim_entry(entry.name):
+		return False
+
+	frappe.flags.shipping_exception = None
+	try:
+		result = run_operation(entry.operation, entry.shipment, json.loads(entry.payload or "{}"))
+		error = None if result else frappe.flags.shipping_exception
+	except Exception as e:
+		result, error = None, e
+		frappe.db.rollback()
+
+	max_attempts = (
+		cint(frappe.db.get_single_value("Shipping Settings", "max_retry_attempts")) or DEFAULT_MAX_ATTEMPTS
+	)
+	entry.db_set(get_outcome(entry, result, error, max_attempts))
+	return True
+
+
+def claim_entry(name: str) -> bool:
+	"""Mark a Pending entry as Processing and commit, so that no one else replays it."""
+	# the lock makes other workers wait here until the status is committed
+	claimed = frappe.db.get_value("Shipping Outbox", name, "status", for_update=True) == "Pending"
+	if claimed:
+		frappe.db.set_value("Shipping Outbox", name, "status", "Processing")
+	frappe.db.commit()
+	return claimed
+
+
+def get_outcome(entry: ShippingOutbox, result, error: Exception | None, max_attempts: int) -> dict:
+	"""Return the values to set on an entry after replaying it."""
+	attempts = cint(entry.attempts) + 1
+	if result:
+		return {"status": "Done", "attempts": attempts, "last_error": None}
+
+	retry = is_retryable(entry.operation, error) and attempts < max_attempts
+	return {
+		"status": "Pending" if retry else "Dead",
+		"attempts": attempts,
+		"last_error": repr(error) if error else _("The provider returned no result."),
+		"next_attempt_at": add_to_date(now_datetime(), seconds=get_backoff(attempts)),
+	}
+
+
+def release_stale_entries():
+	"""Hand back the entries of workers that died while replaying them.
+
+	A booking that was interrupted may have reached the provider, so it is marked Dead.
+	"""
+	stale = frappe.get_all(
+		"Shipping Outbox",
+		filters={
+			"status": "Processing",
+			"modified": ("<", add_to_date(now_datetime(), seconds=-STALE_AFTER)),
+		},
+		fields=["name", "operation"],
+	)
+	for entry in stale:
+		frappe.db.set_value(
+			"Shipping Outbox",
+			entry.name,
+			"status",
+			"Dead" if entry.operation in NON_IDEMPOTENT_OPERATIONS else "Pending",
+		)
+	frappe.db.commit()
+
+
+def run_operation(operation: str, shipment: str, payload: dict):
+	from erpnext_shipping.erpnext_shipping.shipping import (
+		create_shipment,
+		print_shipping_label,
+		update_tracking,
+	)
+
+	if operation == "Create Shipment":
+		shipment_id = frappe.db.get_value("Shipment", shipment, "shipment_id")
+		if shipment_id:
+			# booked in the meantime, booking again would ship twice
+			return shipment_id
+		return create_shipment(**payload)
+
+	if operation == "Update Tracking":
+		return update_tracking(**payload)
+
+	if operation == "Fetch Shipping Label":
+		return print_shipping_label(shipment, save_as_attachment=True)
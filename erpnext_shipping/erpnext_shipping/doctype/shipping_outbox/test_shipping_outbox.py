@@ -0,0 +1,105 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from http.client import RemoteDisconnected
+from unittest.mock import patch
+
+import frappe
+import requests
+import urllib3
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.doctype.shipping_outbox import shipping_outbox
+from erpnext_shipping.erpnext_shipping.doctype.shipping_outbox.shipping_outbox import (
+	BACKOFF_BASE,
+	BACKOFF_CAP,
+	get_backoff,
+	get_outcome,
+	is_retryable,
+	process_entry,
+)
+
+GATEWAY_PAGE = requests.exceptions.JSONDecodeError("Expecting value", "<html>Bad Gateway</html>", 0)
+# as raised by requests when no connection could be made
+REFUSED = requests.exceptions.ConnectionError(
+	urllib3.exceptions.MaxRetryError(
+		None, "/shipments", urllib3.exceptions.NewConnectionError(None, "Connection refused")
+	)
+)
+# as raised by requests when the provider closed the connection after the request was sent
+DISCONNECTED = requests.exceptions.ConnectionError(
+	urllib3.exceptions.ProtocolError("Connection aborted.", RemoteDisconnected("Remote end closed"))
+)
+
+
+class OutboxEntry(frappe._dict):
+	def db_set(self, values):
+		self.update(values)
+
+
+class TestShippingOutbox(FrappeTestCase):
+	def test_backoff(self):
+		for attempts in range(1, 20):
+			delay = get_backoff(attempts)
+			self.assertGreaterEqual(delay, BACKOFF_BASE)
+			self.assertLessEqual(delay, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempts))
+
+	def test_transient_errors(self):
+		for operation in ("Create Shipment", "Update Tracking", "Fetch Shipping Label"):
+			self.assertTrue(is_retryable(operation, REFUSED))
+			self.assertTrue(is_retryable(operation, requests.exceptions.ConnectTimeout()))
+			self.assertFalse(is_retryable(operation, requests.exceptions.HTTPError()))
+			self.assertFalse(is_retryable(operation, frappe.ValidationError()))
+			self.assertFalse(is_retryable(operation, None))
+
+	def test_booking_is_not_sent_twice(self):
+		# the provider may have booked the shipment before the answer got lost
+		self.assertFalse(is_retryable("Create Shipment", requests.exceptions.ReadTimeout()))
+		self.assertFalse(is_retryable("Create Shipment", GATEWAY_PAGE))
+		self.assertFalse(is_retryable("Create Shipment", DISCONNECTED))
+		self.assertFalse(is_retryable("Create Shipment", requests.exceptions.ConnectionError()))
+
+		self.assertTrue(is_retryable("Update Tracking", requests.exceptions.ReadTimeout()))
+		self.assertTrue(is_retryable("Fetch Shipping Label", GATEWAY_PAGE))
+		self.assertTrue(is_retryable("Update Tracking", DISCONNECTED))
+
+	def test_outcome(self):
+		entry = frappe._dict(operation="Update Tracking", attempts=2)
+		self.assertEqual(get_outcome(entry, {"awb_number": "1"}, None, 8)["status"], "Done")
+		self.assertEqual(
+			get_outcome(entry, None, requests.exceptions.ConnectionError(), 8)["status"], "Pending"
+		)
+		self.assertEqual(get_outcome(entry, None, requests.exceptions.ConnectionError(), 3)["status"], "Dead")
+		self.assertEqual(get_outcome(entry, None, requests.exceptions.HTTPError(), 8)["status"], "Dead")
+		self.assertEqual(get_outcome(entry, None, None, 8)["status"], "Dead")
+
+		booking = frappe._dict(operation="Create Shipment", attempts=0)
+		self.assertEqual(get_outcome(booking, None, requests.exceptions.ReadTimeout(), 8)["status"], "Dead")
+		self.assertEqual(get_outcome(booking, None, DISCONNECTED, 8)["status"], "Dead")
+		self.assertEqual(get_outcome(booking, None, REFUSED, 8)["status"], "Pending")
+
+	def test_replay(self):
+		entry = OutboxEntry(name="OUTBOX-1", operation="Update Tracking", shipment="SHIP-1", attempts=0)
+		with (
+			patch.object(shipping_outbox, "claim_entry", return_value=True),
+			patch.object(shipping_outbox, "run_operation", side_effect=requests.exceptions.ConnectionError()),
+		):
+			self.assertTrue(process_entry(entry))
+		self.assertEqual((entry.status, entry.attempts), ("Pending", 1))
+
+		with (
+			patch.object(shipping_outbox, "claim_entry", return_value=True),
+			patch.object(shipping_outbox, "run_operation", return_value={"awb_number": "1"}),
+		):
+			self.assertTrue(process_entry(entry))
+		self.assertEqual((entry.status, entry.attempts), ("Done", 2))
+
+	def test_claimed_entry_is_not_replayed(self):
+		entry = OutboxEntry(name="OUTBOX-1", operation="Create Shipment", shipment="SHIP-1", attempts=0)
+		with (
+			patch.object(shipping_outbox, "claim_entry", return_value=False),
+			patch.object(shipping_outbox, "run_operation") as run_operation,
+		):
+			self.assertFalse(process_entry(entry))
+		run_operation.assert_not_called()
+		self.assertIsNone(entry.status)
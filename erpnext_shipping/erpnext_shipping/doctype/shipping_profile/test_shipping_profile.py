@@ -0,0 +1,79 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping import profiling
+from erpnext_shipping.erpnext_shipping.profiling import (
+	CallProfile,
+	get_active_profile,
+	profiled,
+	save_profile,
+)
+
+
+@profiled
+def query_twice():
+	frappe.db.sql("select 1")
+	frappe.db.sql("select 2")
+	return "done"
+
+
+@profiled
+def query_and_fail():
+	frappe.db.sql("select 1")
+	raise ValueError
+
+
+@profiled
+def query_nested():
+	frappe.db.sql("select 1")
+	return query_twice()
+
+
+class TestShippingProfile(FrappeTestCase):
+	def setUp(self):
+		patcher = patch.object(profiling, "is_profiling_enabled", return_value=True)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_sql_is_counted(self):
+		with patch.object(profiling, "save_profile") as save:
+			self.assertEqual(query_twice(), "done")
+
+		method, profile, wall_time, cpu_time, _profiler = save.call_args.args
+		self.assertTrue(method.endswith("query_twice"))
+		self.assertEqual(profile.sql_count, 2)
+		self.assertGreater(profile.sql_time, 0)
+		self.assertGreaterEqual(wall_time, profile.sql_time)
+		self.assertGreaterEqual(cpu_time, 0)
+		self.assertIsNone(get_active_profile())
+
+	def test_nested_calls_are_one_profile(self):
+		with patch.object(profiling, "save_profile") as save:
+			query_nested()
+
+		save.assert_called_once()
+		self.assertEqual(save.call_args.args[1].sql_count, 3)
+
+	def test_sql_is_restored_after_exception(self):
+		with patch.object(profiling, "save_profile") as save, self.assertRaises(ValueError):
+			query_and_fail()
+
+		self.assertNotIn("sql", vars(frappe.db))
+		self.assertIsNone(get_active_profile())
+		self.assertEqual(save.call_args.args[1].sql_count, 1)
+
+	def test_save_profile(self):
+		profile = CallProfile()
+		profile.sql_count, profile.sql_time = 4, 0.1
+		profile.add_http(0.25)
+		save_profile("test_shipping_profile.method", profile, 0.5, 0.05)
+
+		saved = frappe.get_last_doc("Shipping Profile", filters={"method": "test_shipping_profile.method"})
+		self.assertEqual(saved.sql_count, 4)
+		self.assertEqual(saved.http_count, 1)
+		self.assertAlmostEqual(saved.other_time, 150, places=3)
@@ -0,0 +1,172 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""History of the rates quoted by shipping providers.
+
+Every quote shown for a rate request is kept with its route, weight band, carrier, service
+and price, so that carrier prices can be compared without asking the providers again.
+Quotes are buffered in Redis and written in batches by a scheduled job, like the
+Shipping API Log (see `write_buffer`). The table is narrow and indexed for the groupings of
+`get_quote_statistics`.
+"""
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder.functions import Avg, Count, Max, Min
+from frappe.utils import add_days, cint, flt, get_datetime, getdate, now_datetime
+
+from erpnext_shipping.erpnext_shipping.write_buffer import flush_entries, push_entries
+
+BUFFER_KEY = "erpnext_shipping:rate_quote_buffer"
+MAX_BUFFER_SIZE = 100_000  # quotes kept if the flush job doesn't run
+FLUSH_BATCH_SIZE = 1000
+# upper limits in kg
+WEIGHT_BANDS = (1, 2, 5, 10, 20, 31.5, 50)
+QUOTE_FIELDS = (
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"service_provider",
+	"carrier",
+	"service_name",
+	"from_country",
+	"to_country",
+	"weight_band",
+	"weight",
+	"parcels",
+	"price",
+	"currency",
+)
+GROUP_BY_FIELDS = {
+	"Carrier": ("service_provider", "carrier"),
+	"Service": ("service_provider", "carrier", "service_name"),
+	"Route": ("from_country", "to_country"),
+	"Weight Band": ("weight_band",),
+	"Route and Carrier": ("from_country", "to_country", "service_provider", "carrier"),
+}
+
+
+class ShippingRateQuote(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Shipping Rate Quote", ["from_country", "to_country", "weight_band"])
+	frappe.db.add_index("Shipping Rate Quote", ["carrier", "service_name"])
+	frappe.db.add_index("Shipping Rate Quote", ["creation"])
+
+
+def record_quotes(prices: list[dict], pickup_address, delivery_address, parcels: list[dict]):
+	"""Buffer the quotes of one provider for a rate request."""
+	if not prices or not frappe.db.get_single_value("Shipping Settings", "record_rate_quotes"):
+		return
+
+	weight = sum(flt(parcel.get("weight")) * (cint(parcel.get("count")) or 1) for parcel in parcels)
+	quote = {
+		"creation": now_datetime(),
+		"owner": frappe.session.user,
+		"from_country": (pickup_address.country_code or "").upper(),
+		"to_country": (delivery_address.country_code or "").upper(),
+		"weight_band": get_weight_band(weight),
+		"weight": weight,
+		"parcels": sum(cint(parcel.get("count")) or 1 for parcel in parcels),
+	}
+
+	push_entries(
+		BUFFER_KEY,
+		[
+			{
+				**quote,
+				"service_provider": price.get("service_provider"),
+				"carrier": price.get("carrier"),
+				"service_name": price.get("service_name"),
+				"price": flt(price.get("total_price")),
+				"currency": price.get("currency"),
+			}
+			for price in prices
+		],
+		MAX_BUFFER_SIZE,
+	)
+
+
+def flush_rate_quotes():
+	"""Scheduled job: write the buffered quotes to the database."""
+	flush_entries(BUFFER_KEY, FLUSH_BATCH_SIZE, write_rate_quotes)
+
+
+def write_rate_quotes(quotes: list[dict]):
+	values = []
+	for quote in quotes:
+		values.append(
+			(
+				frappe.generate_hash(length=20),
+				quote["creation"],
+				quote["creation"],
+				quote["owner"],
+				quote["owner"],
+				quote["service_provider"],
+				quote["carrier"],
+				quote["service_name"],
+				quote["from_country"],
+				quote["to_country"],
+				quote["weight_band"],
+				quote["weight"],
+				quote["parcels"],
+				quote["price"],
+				quote["currency"],
+			)
+		)
+
+	frappe.db.bulk_insert("Shipping Rate Quote", QUOTE_FIELDS, values)
+
+
+def get_weight_band(weight: float) -> str:
+	"""Return the weight band of a weight in kg.
+
+	>>> get_weight_band(3.2)
+	'2-5'
+	"""
+	lower = 0
+	for upper in WEIGHT_BANDS:
+		if weight <= upper:
+			return f"{lower:g}-{upper:g}"
+		lower = upper
+
+	return f"{lower:g}+"
+
+
+def get_quote_statistics(filters: dict | None = None, group_by: str = "Carrier") -> list[dict]:
+	"""Return the number of quotes and their lowest, average and highest price per group.
+
+	`filters` may contain `from_date` and `to_date` and values for any of the fields
+	`service_provider`, `carrier`, `service_name`, `from_country`, `to_country` and
+	`weight_band`. Groups are split by currency, as prices of different currencies can't
+	be compared.
+	"""
+	filters = frappe._dict(filters or {})
+	quote = frappe.qb.DocType("Shipping Rate Quote")
+	group_fields = [quote[field] for field in GROUP_BY_FIELDS[group_by]] + [quote.currency]
+
+	query = (
+		frappe.qb.from_(quote)
+		.select(
+			*group_fields,
+			Count("*").as_("quotes"),
+			Min(quote.price).as_("min_price"),
+			Avg(quote.price).as_("avg_price"),
+			Max(quote.price).as_("max_price"),
+		)
+		.groupby(*group_fields)
+		.orderby(Count("*"), order=frappe.qb.desc)
+	)
+
+	if filters.from_date:
+		query = query.where(quote.creation >= get_datetime(filters.from_date))
+	if filters.to_date:
+		query = query.where(quote.creation < add_days(getdate(filters.to_date), 1))
+	for field in ("service_provider", "carrier", "service_name", "from_country", "to_country", "weight_band"):
+		if filters.get(field):
+			query = query.where(quote[field] == filters.get(field))
+
+	return query.run(as_dict=True)
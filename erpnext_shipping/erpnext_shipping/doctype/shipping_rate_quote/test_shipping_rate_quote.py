@@ -0,0 +1,47 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.doctype.shipping_rate_quote import shipping_rate_quote
+from erpnext_shipping.erpnext_shipping.doctype.shipping_rate_quote.shipping_rate_quote import (
+	flush_rate_quotes,
+	get_weight_band,
+	record_quotes,
+)
+
+
+class TestShippingRateQuote(FrappeTestCase):
+	def test_weight_band(self):
+		self.assertEqual(get_weight_band(0.4), "0-1")
+		self.assertEqual(get_weight_band(2), "1-2")
+		self.assertEqual(get_weight_band(31.5), "20-31.5")
+		self.assertEqual(get_weight_band(31.6), "31.5-50")
+		self.assertEqual(get_weight_band(120), "50+")
+
+	def test_quotes_are_written_in_batches(self):
+		prices = [
+			{"service_provider": "EasyPost", "carrier": "UPS", "service_name": "Ground", "total_price": 9.5},
+			{"service_provider": "EasyPost", "carrier": "USPS", "service_name": "Priority", "total_price": 7},
+		]
+		with patch.object(frappe.db, "get_single_value", return_value=1):
+			record_quotes(
+				prices,
+				frappe._dict(country_code="de"),
+				frappe._dict(country_code="fr"),
+				[{"weight": 1.5, "count": 2}],
+			)
+
+		with patch.object(shipping_rate_quote, "write_rate_quotes") as write_rate_quotes:
+			flush_rate_quotes()
+
+		(quotes,) = write_rate_quotes.call_args.args
+		self.assertEqual([quote["carrier"] for quote in quotes], ["UPS", "USPS"])
+		self.assertEqual(
+			{(quote["from_country"], quote["to_country"], quote["weight_band"]) for quote in quotes},
+			{("DE", "FR", "2-5")},
+		)
+		self.assertEqual(quotes[0]["parcels"], 2)
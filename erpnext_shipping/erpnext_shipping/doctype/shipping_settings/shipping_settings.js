@@ -0,0 +1,48 @@
+// Copyright (c) 2026, Frappe and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Shipping Settings", {
+	refresh(frm) {
+		if (frm.doc.hedge_rate_requests) {
+			frm.add_custom_button(__("Hedging Statistics"), () => frm.events.show_hedging_stats(frm));
+		}
+	},
+
+	show_hedging_stats(frm) {
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.hedging.get_hedging_stats",
+			callback: function (r) {
+				if (!r.message || !r.message.length) {
+					frappe.msgprint(__("No rate requests have been made since hedging was enabled."));
+					return;
+				}
+
+				const rows = r.message
+					.map(
+						(row) => `<tr>
+							<td>${frappe.utils.escape_html(row.call)}</td>
+							<td class="text-right">${row.calls}</td>
+							<td class="text-right">${row.hedged}</td>
+							<td class="text-right">${row.hedge_won}</td>
+							<td class="text-right">${row.threshold === null ? "" : row.threshold}</td>
+						</tr>`
+					)
+					.join("");
+				frappe.msgprint({
+					title: __("Hedging Statistics"),
+					wide: true,
+					message: `<table class="table table-bordered">
+						<thead><tr>
+							<th>${__("Request")}</th>
+							<th class="text-right">${__("Requests")}</th>
+							<th class="text-right">${__("Sent Twice")}</th>
+							<th class="text-right">${__("Second Answered First")}</th>
+							<th class="text-right">${__("Threshold (ms)")}</th>
+						</tr></thead>
+						<tbody>${rows}</tbody>
+					</table>`,
+				});
+			},
+		});
+	},
+});
@@ -0,0 +1,151 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Hedged requests for read-only provider calls.
+
+If a call has not answered after a percentile of its recent latencies, the same request
+is sent a second time and whichever answers first is used. Hedges are limited to a share
+of the calls per minute, so a slow provider does not get twice the traffic.
+
+Only use this for calls without side effects. `send` runs in a worker thread and must not
+touch request-local state; `on_hedge` is called in the calling thread when the second
+request is sent, e.g. to count it against a request budget.
+"""
+
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TypeVar
+
+import frappe
+import numpy as np
+from frappe.utils import cint, flt
+
+T = TypeVar("T")
+
+LATENCY_WINDOW = 200  # latencies kept per call
+MIN_SAMPLES = 20  # latencies needed before hedging
+BUDGET_WINDOW = 60  # seconds
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_MAX_HEDGE_RATE = 10  # percent of calls
+STATS_KEY = "erpnext_shipping:hedging_stats"
+
+
+def hedged_call(
+	provider: str, endpoint: str, send: Callable[[], T], on_hedge: Callable[[], None] | None = None
+) -> T:
+	"""Return the result of `send`, hedged if hedging is enabled in Shipping Settings."""
+	if not frappe.db.get_single_value("Shipping Settings", "hedge_rate_requests"):
+		return send()
+
+	key = f"{provider} {endpoint}"
+	threshold = get_hedge_threshold(key)
+	started = time.monotonic()
+	hedged = hedge_won = False
+
+	executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="shipping-hedge")
+	try:
+		first = executor.submit(send)
+		try:
+			result = first.result(timeout=threshold)
+		except FutureTimeoutError:
+			if take_hedge(key):
+				hedged = True
+				if on_hedge:
+					on_hedge()
+				winner = get_first_successful(first, executor.submit(send))
+				hedge_won = winner is not first
+				result = winner.result()
+			else:
+				result = first.result()
+	finally:
+		# the slower attempt finishes in the background, its answer is dropped
+		executor.shutdown(wait=False)
+
+	record_call(key, time.monotonic() - started, hedged, hedge_won)
+	return result
+
+
+def get_first_successful(*futures: Future) -> Future:
+	"""Return the first of `futures` to succeed, or the first one if all fail."""
+	pending = set(futures)
+	while pending:
+		done, pending = wait(pending, return_when=FIRST_COMPLETED)
+		for future in done:
+			if future.exception() is None:
+				return future
+
+	return futures[0]
+
+
+def get_hedge_threshold(key: str) -> float | None:
+	"""Return the seconds after which a call is hedged, None while too few were seen."""
+	cache = frappe.cache()
+	pipeline = cache.pipeline(transaction=False)
+	pipeline.lrange(cache.make_key(f"{STATS_KEY}:latency:{key}"), 0, -1)
+	(latencies,) = pipeline.execute()
+	if len(latencies) < MIN_SAMPLES:
+		return None
+
+	percentile = (
+		flt(frappe.db.get_single_value("Shipping Settings", "hedge_percentile")) or DEFAULT_HEDGE_PERCENTILE
+	)
+	return float(np.percentile(np.array(latencies, dtype=float), percentile))
+
+
+def take_hedge(key: str) -> bool:
+	"""Count a hedge if the budget of the current minute allows another one."""
+	max_rate = (
+		flt(frappe.db.get_single_value("Shipping Settings", "max_hedge_rate")) or DEFAULT_MAX_HEDGE_RATE
+	) / 100
+	cache = frappe.cache()
+	budget_key = cache.make_key(f"{STATS_KEY}:budget:{key}:{int(time.time() // BUDGET_WINDOW)}")
+	pipeline = cache.pipeline()
+	pipeline.hget(budget_key, "calls")
+	pipeline.hincrby(budget_key, "hedges", 1)
+	pipeline.expire(budget_key, BUDGET_WINDOW)
+	calls, hedges, _expire = pipeline.execute()
+	if hedges > max_rate * (cint(calls) + 1):  # including the current call
+		pipeline.hincrby(budget_key, "hedges", -1)
+		pipeline.execute()
+		return False
+
+	return True
+
+
+def record_call(key: str, latency: float, hedged: bool, hedge_won: bool):
+	cache = frappe.cache()
+	latency_key = cache.make_key(f"{STATS_KEY}:latency:{key}")
+	budget_key = cache.make_key(f"{STATS_KEY}:budget:{key}:{int(time.time() // BUDGET_WINDOW)}")
+	stats_key = cache.make_key(STATS_KEY)
+
+	pipeline = cache.pipeline(transaction=False)
+	pipeline.lpush(latency_key, latency)
+	pipeline.ltrim(latency_key, 0, LATENCY_WINDOW - 1)
+	pipeline.hincrby(budget_key, "calls", 1)
+	pipeline.expire(budget_key, BUDGET_WINDOW)
+	pipeline.hincrby(stats_key, f"{key}|calls", 1)
+	pipeline.hincrby(stats_key, f"{key}|hedged", cint(hedged))
+	pipeline.hincrby(stats_key, f"{key}|hedge_won", cint(hedge_won))
+	pipeline.execute()
+
+
+@frappe.whitelist()
+def get_hedging_stats() -> list[dict]:
+	"""Return per call how often it was hedged and how often the hedge answered first."""
+	frappe.only_for("System Manager")
+	cache = frappe.cache()
+	pipeline = cache.pipeline(transaction=False)
+	pipeline.hgetall(cache.make_key(STATS_KEY))
+	(counters,) = pipeline.execute()
+
+	stats = {}
+	for field, value in counters.items():
+		key, counter = frappe.safe_decode(field).rsplit("|", 1)
+		stats.setdefault(key, {"call": key, "calls": 0, "hedged": 0, "hedge_won": 0})[counter] = cint(value)
+
+	for row in stats.values():
+		threshold = get_hedge_threshold(row["call"])
+		row["threshold"] = round(threshold * 1000) if threshold is not None else None
+
+	return sorted(stats.values(), key=lambda row: row["call"])
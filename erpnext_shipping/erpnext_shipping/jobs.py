@@ -0,0 +1,34 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Background jobs of the shipping integration, sorted into lanes.
+
+The lanes and their queues are set by `shipping_job_lanes` in hooks.py. A job goes to
+its lane's own queue if a worker for that queue is configured (`workers` in
+common_site_config.json), and to the lane's standard Frappe queue otherwise.
+"""
+
+import frappe
+from frappe.utils.background_jobs import get_queues_timeout
+
+INTERACTIVE = "interactive"  # started by a user for one document, someone is waiting
+BULK = "bulk"  # started by a user for many documents
+BACKGROUND = "background"  # scheduled maintenance, e.g. refreshing tracking info
+
+
+def enqueue_shipping_job(method: str, lane: str, **kwargs):
+	"""Enqueue `method` on the queue of `lane`. Other arguments are passed to `frappe.enqueue`."""
+	return frappe.enqueue(method, queue=get_lane_queue(lane), **kwargs)
+
+
+def get_lane_queue(lane: str) -> str:
+	config = frappe.get_hooks("shipping_job_lanes").get(lane)
+	if not config:
+		frappe.throw(f"Unknown shipping job lane: {lane}")
+
+	# hooks of later apps override earlier ones
+	queue, fallback = get_hook_value(config["queue"]), get_hook_value(config["fallback"])
+	return queue if queue in get_queues_timeout() else fallback
+
+
+def get_hook_value(value):
+	return value[-1] if isinstance(value, list) else value
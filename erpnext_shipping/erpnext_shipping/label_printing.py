@@ -0,0 +1,152 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Labels in printer languages, printed without a browser.
+
+EasyPost labels can be fetched as ZPL or EPL, SendCloud labels as ZPL. They are sent as
+they are to a thermal printer, either over a raw TCP connection (port 9100, understood by
+most label printers and print servers) or by writing them to a spool directory that a
+print server watches. LetMeShip only offers PDF labels.
+
+The printer is set up in Shipping Settings under "Label Printing".
+"""
+
+import os
+import socket
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from erpnext_shipping.erpnext_shipping.accounts import get_booking_account
+from erpnext_shipping.erpnext_shipping.doctype.easypost.easypost import EASYPOST_PROVIDER, get_easypost_utils
+from erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud import SENDCLOUD_PROVIDER, SendCloudUtils
+from erpnext_shipping.erpnext_shipping.jobs import BULK, enqueue_shipping_job
+
+NETWORK_PRINTER = "Network Printer"
+SPOOL_DIRECTORY = "Spool Directory"
+DEFAULT_PRINTER_PORT = 9100
+PRINTER_TIMEOUT = 10  # seconds
+FILE_EXTENSIONS = {"ZPL": "zpl", "EPL": "epl"}
+RAW_LABEL_FORMATS = {EASYPOST_PROVIDER: ("ZPL", "EPL"), SENDCLOUD_PROVIDER: ("ZPL",)}
+
+
+@frappe.whitelist()
+def print_raw_label(shipment: str) -> int:
+	"""Send the labels of a Shipment to the label printer and return how many were sent."""
+	frappe.has_permission("Shipment", "print", doc=shipment, throw=True)
+	labels = get_raw_labels(shipment)
+	if not labels:
+		frappe.throw(_("No label could be fetched for Shipment {0}.").format(shipment))
+
+	send_to_printer(labels)
+	return len(labels)
+
+
+@frappe.whitelist()
+def enqueue_print_raw_labels(shipments: str | list[str]):
+	"""Send the labels of many Shipments to the label printer in a background job."""
+	shipments = frappe.parse_json(shipments)
+	for shipment in shipments:
+		frappe.has_permission("Shipment", "print", doc=shipment, throw=True)
+
+	enqueue_shipping_job(
+		"erpnext_shipping.erpnext_shipping.label_printing.print_raw_labels", BULK, shipments=shipments
+	)
+
+
+def print_raw_labels(shipments: list[str]):
+	"""Fetch the labels of all Shipments first, then print them over one connection.
+
+	Shipments whose labels can't be fetched in the printer language are skipped and logged,
+	so that they don't hold up the others.
+	"""
+	label_format = get_raw_label_format()
+	labels, skipped = [], []
+	for shipment in shipments:
+		service_provider = frappe.db.get_value("Shipment", shipment, "service_provider")
+		if not supports_raw_label(service_provider, label_format):
+			skipped.append(shipment)
+			continue
+
+		try:
+			labels.extend(get_raw_labels(shipment) or [])
+		except Exception:
+			frappe.log_error(title="Shipping Error", reference_doctype="Shipment", reference_name=shipment)
+
+	if skipped:
+		frappe.log_error(
+			title="Shipping Error",
+			message=_("No labels in {0} are offered for Shipments {1}.").format(
+				label_format, ", ".join(skipped)
+			),
+		)
+
+	if labels:
+		send_to_printer(labels)
+
+	return labels, skipped
+
+
+def get_raw_labels(shipment: str) -> list[bytes] | None:
+	"""Return the labels of a Shipment in the printer language set in Shipping Settings."""
+	service_provider, shipment_id, account_name = frappe.db.get_value(
+		"Shipment", shipment, ["service_provider", "shipment_id", "shipping_account"]
+	)
+	label_format = get_raw_label_format()
+	if not supports_raw_label(service_provider, label_format):
+		frappe.throw(_("{0} does not offer labels in {1}.").format(service_provider, label_format))
+
+	if service_provider == EASYPOST_PROVIDER:
+		return get_easypost_utils().get_raw_label(shipment_id, label_format)
+
+	return SendCloudUtils(get_booking_account(account_name)).get_raw_label(shipment_id, label_format)
+
+
+def supports_raw_label(service_provider: str | None, label_format: str) -> bool:
+	return label_format in RAW_LABEL_FORMATS.get(service_provider, ())
+
+
+def get_raw_label_format() -> str:
+	return frappe.db.get_single_value("Shipping Settings", "raw_label_format") or "ZPL"
+
+
+def send_to_printer(labels: list[bytes]):
+	"""Send labels to the printer or spool directory set in Shipping Settings."""
+	settings = frappe.get_cached_doc("Shipping Settings")
+	if settings.raw_print_target == SPOOL_DIRECTORY:
+		if not settings.label_spool_directory:
+			frappe.throw(_("Please set a Spool Directory in Shipping Settings."))
+		write_to_spool(settings.label_spool_directory, labels, FILE_EXTENSIONS[get_raw_label_format()])
+	else:
+		if not settings.label_printer_host:
+			frappe.throw(_("Please set a Label Printer Host in Shipping Settings."))
+		send_to_network_printer(
+			settings.label_printer_host, cint(settings.label_printer_port) or DEFAULT_PRINTER_PORT, labels
+		)
+
+
+def send_to_network_printer(host: str, port: int, labels: list[bytes]):
+	"""Stream labels over a single raw TCP connection, one after the other."""
+	with socket.create_connection((host, port), timeout=PRINTER_TIMEOUT) as connection:
+		for label in labels:
+			connection.sendall(label)
+
+
+def write_to_spool(directory: str, labels: list[bytes], extension: str) -> list[str]:
+	"""Write every label to its own file in `directory` and return the paths.
+
+	Files are written under a temporary name and renamed when complete, so that a print
+	server watching the directory never picks up half a label.
+	"""
+	os.makedirs(directory, exist_ok=True)
+	prefix = f"{time.time_ns()}-{frappe.generate_hash(length=6)}"
+	paths = []
+	for index, label in enumerate(labels):
+		path = os.path.join(directory, f"{prefix}-{index:04d}.{extension}")
+		with open(f"{path}.tmp", "wb") as f:
+			f.write(label)
+		os.replace(f"{path}.tmp", path)
+		paths.append(path)
+
+	return paths
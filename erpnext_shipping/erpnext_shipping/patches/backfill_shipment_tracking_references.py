@@ -0,0 +1,20 @@
+import frappe
+
+from erpnext_shipping.erpnext_shipping.doctype.shipment_tracking_reference.shipment_tracking_reference import (
+	sync_tracking_references,
+)
+
+
+def execute():
+	"""Index the provider ids and tracking numbers of already booked Shipments."""
+	frappe.reload_doc("erpnext_shipping", "doctype", "shipment_tracking_reference")
+
+	shipments = frappe.get_all(
+		"Shipment",
+		filters={"shipment_id": ("is", "set")},
+		fields=["name", "service_provider", "shipment_id", "awb_number"],
+	)
+	for shipment in shipments:
+		sync_tracking_references(
+			shipment.name, shipment.service_provider, shipment.shipment_id, shipment.awb_number
+		)
@@ -0,0 +1,123 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Opt-in profiling of the shipping endpoints.
+
+Enabled for everyone by "Profile Shipping Calls" in Shipping Settings, or for a single
+request of a System Manager by the `X-Shipping-Profile` header. Each profiled call is
+recorded as a Shipping Profile with its SQL, provider HTTP and CPU time. A share of the
+calls also gets a cProfile dump.
+"""
+
+import cProfile
+import functools
+import io
+import pstats
+import random
+import threading
+import time
+
+import frappe
+from frappe.utils import cint, flt
+
+PROFILE_HEADER = "X-Shipping-Profile"
+PROFILE_STATS_LINES = 60
+
+
+class CallProfile:
+	def __init__(self):
+		self.sql_count = 0
+		self.sql_time = 0.0
+		self.http_count = 0
+		self.http_time = 0.0
+		self._lock = threading.Lock()
+
+	def add_http(self, seconds: float):
+		# provider requests may run in worker threads
+		with self._lock:
+			self.http_count += 1
+			self.http_time += seconds
+
+
+def get_active_profile() -> CallProfile | None:
+	return getattr(frappe.local, "shipping_profile", None)
+
+
+def is_profiling_enabled() -> bool:
+	if frappe.db.get_single_value("Shipping Settings", "enable_profiling"):
+		return True
+	return bool(
+		getattr(frappe.local, "request", None)
+		and cint(frappe.get_request_header(PROFILE_HEADER))
+		and "System Manager" in frappe.get_roles()
+	)
+
+
+def profiled(fn):
+	"""Profile calls of `fn` when profiling is enabled. Nested profiled calls are part of the
+	outermost one."""
+
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		if get_active_profile() or not is_profiling_enabled():
+			return fn(*args, **kwargs)
+		return run_profiled(fn, args, kwargs)
+
+	return wrapper
+
+
+def run_profiled(fn, args, kwargs):
+	profile = frappe.local.shipping_profile = CallProfile()
+	db = frappe.db
+	sql = db.sql
+
+	def timed_sql(*sql_args, **sql_kwargs):
+		started = time.perf_counter()
+		try:
+			return sql(*sql_args, **sql_kwargs)
+		finally:
+			profile.sql_count += 1
+			profile.sql_time += time.perf_counter() - started
+
+	sample_rate = flt(frappe.db.get_single_value("Shipping Settings", "profiler_sample_rate")) / 100
+	profiler = cProfile.Profile() if random.random() < sample_rate else None
+
+	db.sql = timed_sql
+	wall_started, cpu_started = time.perf_counter(), time.process_time()
+	try:
+		if profiler:
+			profiler.enable()
+		return fn(*args, **kwargs)
+	finally:
+		if profiler:
+			profiler.disable()
+		wall_time = time.perf_counter() - wall_started
+		cpu_time = time.process_time() - cpu_started
+		del db.sql
+		frappe.local.shipping_profile = None
+		save_profile(f"{fn.__module__}.{fn.__qualname__}", profile, wall_time, cpu_time, profiler)
+
+
+def save_profile(method: str, profile: CallProfile, wall_time: float, cpu_time: float, profiler=None):
+	stats = None
+	if profiler:
+		stream = io.StringIO()
+		pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_STATS_LINES)
+		stats = stream.getvalue()
+
+	try:
+		frappe.get_doc(
+			{
+				"doctype": "Shipping Profile",
+				"method": method,
+				"wall_time": wall_time * 1000,
+				"cpu_time": cpu_time * 1000,
+				"sql_count": profile.sql_count,
+				"sql_time": profile.sql_time * 1000,
+				"http_count": profile.http_count,
+				"http_time": profile.http_time * 1000,
+				"other_time": max(wall_time - profile.sql_time - profile.http_time, 0) * 1000,
+				"stats": stats,
+			}
+		).insert(ignore_permissions=True)
+	except Exception:
+		frappe.log_error(title="Shipping Profile Error")
@@ -0,0 +1,88 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+import hashlib
+import json
+import pickle
+
+import frappe
+from frappe.utils import cint, flt
+
+from erpnext_shipping.erpnext_shipping.jobs import BULK, enqueue_shipping_job
+
+DEFAULT_RATE_CACHE_TTL = 600  # seconds
+PARCEL_FIELDS = ("length", "width", "height", "weight", "count")
+
+
+def get_rate_fingerprint(rate_args: dict) -> str:
+	"""Return a hash of everything that influences the rates of a Shipment.
+
+	Parcels are reduced to their dimensions, so the fingerprint is the same whether they
+	come from the form or from the database.
+	"""
+	parcels = rate_args.get("parcels") or []
+	if isinstance(parcels, str):
+		parcels = json.loads(parcels)
+
+	data = dict(rate_args)
+	data["parcels"] = [{field: flt(parcel.get(field)) for field in PARCEL_FIELDS} for parcel in parcels]
+	data["value_of_goods"] = flt(data.get("value_of_goods"))
+	return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_cached_rates(shipment: str, fingerprint: str) -> list[dict] | None:
+	"""Return the stored rates of a Shipment, unless they expired or its parcels changed."""
+	cached = frappe.cache().get_value(get_cache_key(shipment))
+	if cached and cached["fingerprint"] == fingerprint:
+		return cached["rates"]
+
+
+def get_cached_rates_bulk(shipments: list[str]) -> dict[str, list[dict]]:
+	"""Return the stored rates of many Shipments in one Redis round trip.
+
+	Unlike `get_cached_rates` this does not compare fingerprints. It is meant for submitted
+	Shipments, whose parcels and addresses can no longer change.
+	"""
+	if not shipments:
+		return {}
+
+	cache = frappe.cache()
+	values = cache.mget([cache.make_key(get_cache_key(shipment)) for shipment in shipments])
+	return {
+		shipment: pickle.loads(value)["rates"]
+		for shipment, value in zip(shipments, values, strict=True)
+		if value is not None
+	}
+
+
+def set_cached_rates(shipment: str, fingerprint: str, rates: list[dict]):
+	ttl = cint(frappe.db.get_single_value("Shipping Settings", "rate_cache_ttl")) or DEFAULT_RATE_CACHE_TTL
+	frappe.cache().set_value(
+		get_cache_key(shipment), {"fingerprint": fingerprint, "rates": rates}, expires_in_sec=ttl
+	)
+
+
+def get_cache_key(shipment: str) -> str:
+	return f"erpnext_shipping:rates:{shipment}"
+
+
+def prefetch_shipping_rates(doc, method=None):
+	"""Shipment `on_submit`: fetch rates in the background so they are ready when asked for."""
+	if not frappe.db.get_single_value("Shipping Settings", "prefetch_rates_on_submit"):
+		return
+
+	enqueue_shipping_job(
+		"erpnext_shipping.erpnext_shipping.rate_cache.prefetch_shipment_rates",
+		BULK,
+		shipment=doc.name,
+		enqueue_after_commit=True,
+	)
+
+
+def prefetch_shipment_rates(shipment: str):
+	from erpnext_shipping.erpnext_shipping.shipping import fetch_shipping_rates, get_shipment_rate_args
+
+	shipment_doc = frappe.get_doc("Shipment", shipment)
+	if shipment_doc.shipment_id:
+		return
+
+	fetch_shipping_rates(shipment=shipment, **get_shipment_rate_args(shipment_doc))
@@ -0,0 +1,237 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Pick the cheapest eligible service for many Shipments at once.
+
+Quotes come from the cached SendCloud catalog and from rates cached per Shipment (see
+`rate_cache`); no provider is called. All eligibility and price checks run on a
+(shipment × service) matrix.
+"""
+
+import frappe
+import numpy as np
+from frappe.utils import cint, flt
+
+from erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud import SENDCLOUD_PROVIDER, SendCloudUtils
+from erpnext_shipping.erpnext_shipping.rate_cache import get_cached_rates_bulk
+from erpnext_shipping.erpnext_shipping.utils import match_parcel_service_type_carrier
+
+
+@frappe.whitelist()
+def get_cheapest_services(shipments=None, filters=None, preferred_only=False):
+	"""Return the cheapest eligible service per Shipment and a cost summary.
+
+	Shipments are given by name or selected with `filters`. Shipments without any eligible
+	quote are listed as unassigned.
+	"""
+	frappe.has_permission("Shipment", "read", throw=True)
+
+	if shipments:
+		filters = {"name": ("in", frappe.parse_json(shipments))}
+	shipment_data = get_shipment_data(
+		frappe.parse_json(filters) or {"docstatus": 1, "shipment_id": ("is", "not set")}
+	)
+	if not shipment_data:
+		return {"assignments": [], "summary": get_summary([], np.array([]))}
+
+	services, cost = get_cost_matrix(shipment_data)
+	allowed = None
+	if cint(preferred_only) and services:
+		preferred = match_parcel_service_type_carrier(
+			[frappe._dict(service) for service in services], "carrier", "service_name"
+		)
+		allowed = [bool(service.is_preferred) for service in preferred]
+
+	assignments, best_cost = assign_cheapest_services(
+		[shipment.name for shipment in shipment_data], services, cost, allowed
+	)
+	return {"assignments": assignments, "summary": get_summary(assignments, best_cost)}
+
+
+def assign_cheapest_services(
+	shipments: list[str], services: list[dict], cost: np.ndarray, allowed: list[bool] | None = None
+) -> tuple[list[dict], np.ndarray]:
+	"""Pick the cheapest service per row of a (shipment × service) cost matrix.
+
+	Only services marked in `allowed` are considered, if given. Returns one assignment per
+	Shipment, without a service if none was eligible, and the cost of each assignment.
+	"""
+	if allowed is not None:
+		cost = np.where(np.array(allowed, dtype=bool), cost, np.inf)
+
+	best_cost = np.full(len(shipments), np.inf)
+	best = np.zeros(len(shipments), dtype=int)
+	if services:
+		best = cost.argmin(axis=1)
+		best_cost = cost[np.arange(len(shipments)), best]
+
+	assignments = []
+	for shipment, service_idx, price in zip(shipments, best.tolist(), best_cost.tolist(), strict=True):
+		assignment = frappe._dict(shipment=shipment, service=None, total_price=None)
+		if price != np.inf:
+			assignment.service = services[service_idx]
+			assignment.total_price = price
+		assignments.append(assignment)
+
+	return assignments, best_cost
+
+
+def get_shipment_data(filters) -> list[dict]:
+	"""Load destination and parcel weights of Shipments with three queries."""
+	shipments = frappe.get_all(
+		"Shipment", filters=filters, fields=["name", "pickup_from_type", "delivery_address_name"]
+	)
+	if not shipments:
+		return []
+
+	names = [shipment.name for shipment in shipments]
+	parcels = {}
+	for parcel in frappe.get_all(
+		"Shipment Parcel",
+		filters={"parenttype": "Shipment", "parent": ("in", names)},
+		fields=["parent", "weight", "count"],
+	):
+		parcels.setdefault(parcel.parent, []).append(parcel)
+
+	country_codes = dict(frappe.get_all("Country", fields=["name", "code"], as_list=True))
+	countries = dict(
+		frappe.get_all(
+			"Address",
+			filters={"name": ("in", list({shipment.delivery_address_name for shipment in shipments}))},
+			fields=["name", "country"],
+			as_list=True,
+		)
+	)
+
+	for shipment in shipments:
+		shipment_parcels = parcels.get(shipment.name, [])
+		weights = [flt(parcel.weight) for parcel in shipment_parcels] or [0]
+		shipment.country_code = (
+			country_codes.get(countries.get(shipment.delivery_address_name)) or ""
+		).upper()
+		shipment.min_weight = min(weights)
+		shipment.max_weight = max(weights)
+		shipment.parcel_count = sum(cint(parcel.count) or 1 for parcel in shipment_parcels)
+
+	return shipments
+
+
+def get_cost_matrix(shipments: list[dict]) -> tuple[list[dict], np.ndarray]:
+	"""Return the candidate services and a (shipment × service) cost matrix.
+
+	Ineligible combinations cost infinity, as do all services for Shipments without
+	parcels. A source of quotes that fails is left out, so the Shipments can still be
+	assigned a service of the others.
+	"""
+	services, costs = [], [np.empty((len(shipments), 0))]
+	for get_matrix in (get_sendcloud_cost_matrix, get_cached_cost_matrix):
+		try:
+			source_services, source_cost = get_matrix(shipments)
+		except Exception:
+			frappe.log_error(title="Shipping Error")
+			continue
+
+		services += source_services
+		costs.append(source_cost)
+
+	cost = np.hstack(costs)
+	cost[np.array([not shipment.parcel_count for shipment in shipments], dtype=bool)] = np.inf
+	return services, cost
+
+
+def get_sendcloud_cost_matrix(shipments: list[dict]) -> tuple[list[dict], np.ndarray]:
+	if not frappe.db.get_single_value("SendCloud", "enabled"):
+		return [], np.empty((len(shipments), 0))
+
+	countries = sorted({shipment.country_code for shipment in shipments if shipment.country_code})
+	sendcloud = SendCloudUtils()
+	catalog = {country: sendcloud.get_shipping_methods(country) for country in countries}
+
+	services, service_idx = [], {}
+	for methods in catalog.values():
+		for method in methods:
+			if method.id not in service_idx:
+				service_idx[method.id] = len(services)
+				services.append(method)
+
+	# price of every method per destination country
+	price = np.full((len(countries) + 1, len(services)), np.inf)
+	for country_idx, country in enumerate(countries):
+		for method in catalog[country]:
+			price[country_idx, service_idx[method.id]] = method.price
+
+	min_weight = np.array([method.min_weight for method in services])
+	max_weight = np.array([method.max_weight for method in services])
+
+	country_pos = {country: idx for idx, country in enumerate(countries)}
+	shipment_country = np.array([country_pos.get(s.country_code, len(countries)) for s in shipments])
+	shipment_min = np.array([s.min_weight for s in shipments])[:, None]
+	shipment_max = np.array([s.max_weight for s in shipments])[:, None]
+	parcel_count = np.array([s.parcel_count for s in shipments])[:, None]
+	from_company = np.array([s.pickup_from_type == "Company" for s in shipments])[:, None]
+
+	eligible = (min_weight <= shipment_min) & (shipment_max < max_weight) & from_company
+	cost = np.where(eligible, price[shipment_country] * parcel_count, np.inf)
+
+	return [
+		frappe._dict(
+			service_provider=SENDCLOUD_PROVIDER,
+			carrier=method.carrier,
+			service_name=method.name,
+			service_id=method.id,
+		)
+		for method in services
+	], cost
+
+
+def get_cached_cost_matrix(shipments: list[dict]) -> tuple[list[dict], np.ndarray]:
+	"""Cost matrix of the quotes cached per Shipment, e.g. LetMeShip rates prefetched on submit."""
+	return get_rates_cost_matrix(shipments, get_cached_rates_bulk([shipment.name for shipment in shipments]))
+
+
+def get_rates_cost_matrix(
+	shipments: list[dict], rates: dict[str, list[dict]]
+) -> tuple[list[dict], np.ndarray]:
+	"""Cost matrix of the rates of each Shipment, keeping the lowest price per service.
+
+	SendCloud rates are left out, they are priced from the catalog.
+	"""
+	services, service_idx = [], {}
+	rows, cols, prices = [], [], []
+	for row, shipment in enumerate(shipments):
+		for rate in rates.get(shipment.name, []):
+			if rate["service_provider"] == SENDCLOUD_PROVIDER:
+				continue
+
+			key = (rate["service_provider"], rate["carrier"], rate["service_name"])
+			if key not in service_idx:
+				service_idx[key] = len(services)
+				services.append(
+					frappe._dict(
+						service_provider=key[0], carrier=key[1], service_name=key[2], service_id=None
+					)
+				)
+			rows.append(row)
+			cols.append(service_idx[key])
+			prices.append(flt(rate["total_price"]))
+
+	cost = np.full((len(shipments), len(services)), np.inf)
+	np.minimum.at(cost, (np.array(rows, dtype=int), np.array(cols, dtype=int)), np.array(prices))
+	return services, cost
+
+
+def get_summary(assignments: list[dict], best_cost: np.ndarray) -> dict:
+	assigned = np.isfinite(best_cost)
+	by_carrier = {}
+	for assignment in assignments:
+		if assignment.service:
+			carrier = by_carrier.setdefault(assignment.service.carrier, {"count": 0, "cost": 0.0})
+			carrier["count"] += 1
+			carrier["cost"] += assignment.total_price
+
+	return {
+		"shipments": len(assignments),
+		"assigned": int(assigned.sum()),
+		"unassigned": [a.shipment for a in assignments if not a.service],
+		"total_cost": float(best_cost[assigned].sum()),
+		"by_carrier": by_carrier,
+	}
@@ -0,0 +1,53 @@
+// Copyright (c) 2026, Frappe and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Carrier Price Analysis"] = {
+	filters: [
+		{
+			fieldname: "from_date",
+			label: __("From Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.add_months(frappe.datetime.get_today(), -1),
+		},
+		{
+			fieldname: "to_date",
+			label: __("To Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.get_today(),
+		},
+		{
+			fieldname: "group_by",
+			label: __("Group By"),
+			fieldtype: "Select",
+			options: ["Carrier", "Service", "Route", "Weight Band", "Route and Carrier"],
+			default: "Carrier",
+		},
+		{
+			fieldname: "service_provider",
+			label: __("Service Provider"),
+			fieldtype: "Select",
+			options: ["", "LetMeShip", "SendCloud", "EasyPost"],
+		},
+		{
+			fieldname: "carrier",
+			label: __("Carrier"),
+			fieldtype: "Data",
+		},
+		{
+			fieldname: "from_country",
+			label: __("From Country Code"),
+			fieldtype: "Data",
+		},
+		{
+			fieldname: "to_country",
+			label: __("To Country Code"),
+			fieldtype: "Data",
+		},
+		{
+			fieldname: "weight_band",
+			label: __("Weight Band (kg)"),
+			fieldtype: "Select",
+			options: ["", "0-1", "1-2", "2-5", "5-10", "10-20", "20-31.5", "31.5-50", "50+"],
+		},
+	],
+};
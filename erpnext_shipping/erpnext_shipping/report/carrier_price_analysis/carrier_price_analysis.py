@@ -0,0 +1,76 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+
+from erpnext_shipping.erpnext_shipping.doctype.shipping_rate_quote.shipping_rate_quote import (
+	GROUP_BY_FIELDS,
+	get_quote_statistics,
+)
+
+GROUP_COLUMNS = {
+	"service_provider": {"label": "Service Provider", "fieldtype": "Data", "width": 130},
+	"carrier": {"label": "Carrier", "fieldtype": "Data", "width": 130},
+	"service_name": {"label": "Service", "fieldtype": "Data", "width": 200},
+	"from_country": {"label": "From", "fieldtype": "Data", "width": 70},
+	"to_country": {"label": "To", "fieldtype": "Data", "width": 70},
+	"weight_band": {"label": "Weight Band (kg)", "fieldtype": "Data", "width": 120},
+}
+
+
+def execute(filters=None):
+	filters = frappe._dict(filters or {})
+	group_by = filters.group_by or "Carrier"
+	data = get_quote_statistics(filters, group_by)
+	return get_columns(group_by), data, None, get_chart(data, group_by)
+
+
+def get_columns(group_by: str) -> list[dict]:
+	columns = [
+		{"fieldname": field, **GROUP_COLUMNS[field], "label": _(GROUP_COLUMNS[field]["label"])}
+		for field in GROUP_BY_FIELDS[group_by]
+	]
+	columns.append(
+		{
+			"fieldname": "currency",
+			"label": _("Currency"),
+			"fieldtype": "Link",
+			"options": "Currency",
+			"width": 80,
+		}
+	)
+	columns.append({"fieldname": "quotes", "label": _("Quotes"), "fieldtype": "Int", "width": 90})
+	for fieldname, label in (
+		("min_price", _("Lowest Price")),
+		("avg_price", _("Average Price")),
+		("max_price", _("Highest Price")),
+	):
+		columns.append(
+			{
+				"fieldname": fieldname,
+				"label": label,
+				"fieldtype": "Currency",
+				"options": "currency",
+				"width": 120,
+			}
+		)
+	return columns
+
+
+def get_chart(data: list[dict], group_by: str) -> dict | None:
+	if not data:
+		return None
+
+	# the busiest groups, with one bar per group
+	rows = data[:20]
+	return {
+		"data": {
+			"labels": [
+				" / ".join(str(row.get(field) or "-") for field in (*GROUP_BY_FIELDS[group_by], "currency"))
+				for row in rows
+			],
+			"datasets": [{"name": _("Average Price"), "values": [row.avg_price for row in rows]}],
+		},
+		"type": "bar",
+	}
@@ -4,12 +4,43 @@ import json
 
 import frappe
 from erpnext.stock.doctype.shipment.shipment import get_company_contact
+from frappe import _
 
+from erpnext_shipping.erpnext_shipping.accounts import (
+	get_booking_account,
+	get_shipment_company,
+	validate_account_company,
+)
+from erpnext_shipping.erpnext_shipping.async_transport import is_async_enabled, run_concurrently
+from erpnext_shipping.erpnext_shipping.codec import loads
+from erpnext_shipping.erpnext_shipping.doctype.carrier_service_limit.carrier_service_limit import (
+	filter_services,
+	is_provider_eligible,
+	learn_service_limits,
+)
+from erpnext_shipping.erpnext_shipping.doctype.easypost.easypost import EASYPOST_PROVIDER, get_easypost_utils
 from erpnext_shipping.erpnext_shipping.doctype.letmeship.letmeship import (
 	LETMESHIP_PROVIDER,
 	get_letmeship_utils,
 )
 from erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud import SENDCLOUD_PROVIDER, SendCloudUtils
+from erpnext_shipping.erpnext_shipping.doctype.shipment_pickup.shipment_pickup import (
+	add_to_letmeship_pickup,
+	orders_letmeship_pickup,
+)
+from erpnext_shipping.erpnext_shipping.doctype.shipment_tracking_reference.shipment_tracking_reference import (
+	sync_tracking_references,
+)
+from erpnext_shipping.erpnext_shipping.doctype.shipping_label.shipping_label import store_label
+from erpnext_shipping.erpnext_shipping.doctype.shipping_outbox.shipping_outbox import queue_for_retry
+from erpnext_shipping.erpnext_shipping.doctype.shipping_rate_quote.shipping_rate_quote import record_quotes
+from erpnext_shipping.erpnext_shipping.jobs import BULK, INTERACTIVE, enqueue_shipping_job
+from erpnext_shipping.erpnext_shipping.profiling import profiled
+from erpnext_shipping.erpnext_shipping.rate_cache import (
+	get_cached_rates,
+	get_rate_fingerprint,
+	set_cached_rates,
+)
 from erpnext_shipping.erpnext_shipping.utils import (
 	get_address,
 	get_contact,
@@ -18,6 +49,7 @@ from erpnext_shipping.erpnext_shipping.utils import (
 
 
 @frappe.whitelist()
+@profiled
 def fetch_shipping_rates(
 	pickup_from_type,
 	delivery_to_type,
@@ -29,61 +61,238 @@ def fetch_shipping_rates(
 	value_of_goods,
 	pickup_contact_name=None,
 	delivery_contact_name=None,
+	shipment=None,
 ):
 	# Return Shipping Rates for the various Shipping Providers
-	shipment_prices = []
-	letmeship_enabled = frappe.db.get_single_value("LetMeShip", "enabled")
-	sendcloud_enabled = frappe.db.get_single_value("SendCloud", "enabled")
-	pickup_address = get_address(pickup_address_name)
-	delivery_address = get_address(delivery_address_name)
-	parcels = json.loads(parcels)
-
-	if letmeship_enabled:
-		pickup_contact = None
-		delivery_contact = None
-		if pickup_from_type != "Company":
-			pickup_contact = get_contact(pickup_contact_name)
-		else:
-			pickup_contact = get_company_contact(user=pickup_contact_name)
-			pickup_contact.email_id = pickup_contact.pop("email", None)
-
-		if delivery_to_type != "Company":
-			delivery_contact = get_contact(delivery_contact_name)
-		else:
-			delivery_contact = get_company_contact(user=pickup_contact_name)
-			delivery_contact.email_id = delivery_contact.pop("email", None)
-
-		letmeship = get_letmeship_utils()
-		letmeship_prices = (
-			letmeship.get_available_services(
-				delivery_to_type=delivery_to_type,
-				pickup_address=pickup_address,
-				delivery_address=delivery_address,
-				parcels=parcels,
-				description_of_content=description_of_content,
-				pickup_date=pickup_date,
-				value_of_goods=value_of_goods,
-				pickup_contact=pickup_contact,
-				delivery_contact=delivery_contact,
-			)
-			or []
+	# If a Shipment is given, rates prefetched on submit are reused until they expire.
+	if shipment:
+		fingerprint = get_rate_fingerprint(
+			{
+				"pickup_from_type": pickup_from_type,
+				"delivery_to_type": delivery_to_type,
+				"pickup_address_name": pickup_address_name,
+				"delivery_address_name": delivery_address_name,
+				"parcels": parcels,
+				"description_of_content": description_of_content,
+				"pickup_date": pickup_date,
+				"value_of_goods": value_of_goods,
+				"pickup_contact_name": pickup_contact_name,
+				"delivery_contact_name": delivery_contact_name,
+			}
 		)
-		letmeship_prices = match_parcel_service_type_carrier(letmeship_prices, "carrier", "service_name")
-		shipment_prices += letmeship_prices
+		cached_rates = get_cached_rates(shipment, fingerprint)
+		if cached_rates is not None:
+			return cached_rates
 
-	if sendcloud_enabled and pickup_from_type == "Company":
-		sendcloud = SendCloudUtils()
-		sendcloud_prices = (
-			sendcloud.get_available_services(delivery_address=delivery_address, parcels=parcels) or []
-		)
-		sendcloud_prices = match_parcel_service_type_carrier(sendcloud_prices, "carrier", "service_name")
-		shipment_prices += sendcloud_prices
+	shipment_prices = []
+	providers = get_rate_providers(pickup_from_type)
+	rate_args = get_rate_args(
+		providers,
+		pickup_from_type,
+		delivery_to_type,
+		pickup_address_name,
+		delivery_address_name,
+		parcels,
+		description_of_content,
+		pickup_date,
+		value_of_goods,
+		pickup_contact_name,
+		delivery_contact_name,
+		company=get_shipment_company(shipment),
+	)
+
+	for provider in providers:
+		shipment_prices += get_provider_rates(provider, **rate_args)
 
 	shipment_prices = sorted(shipment_prices, key=lambda k: k["total_price"])
+	if shipment:
+		set_cached_rates(shipment, fingerprint, shipment_prices)
+
 	return shipment_prices
 
 
 @frappe.whitelist()
+@profiled
+def fetch_shipping_rates_async(
+	rate_request_id,
+	pickup_from_type,
+	delivery_to_type,
+	pickup_address_name,
+	delivery_address_name,
+	parcels,
+	description_of_content,
+	pickup_date,
+	value_of_goods,
+	pickup_contact_name=None,
+	delivery_contact_name=None,
+	shipment=None,
+):
+	"""Fetch the rates of every provider in its own background job.
+
+	Each provider's rates are published as a `shipping_rates` realtime event as soon as they
+	are available. Returns the providers to wait for and the rates already known, which are
+	the prefetched rates of `shipment` if there are any.
+	"""
+	rate_args = {
+		"pickup_from_type": pickup_from_type,
+		"delivery_to_type": delivery_to_type,
+		"pickup_address_name": pickup_address_name,
+		"delivery_address_name": delivery_address_name,
+		"parcels": parcels,
+		"description_of_content": description_of_content,
+		"pickup_date": pickup_date,
+		"value_of_goods": value_of_goods,
+		"pickup_contact_name": pickup_contact_name,
+		"delivery_contact_name": delivery_contact_name,
+	}
+	if shipment:
+		cached_rates = get_cached_rates(shipment, get_rate_fingerprint(rate_args))
+		if cached_rates is not None:
+			return {"providers": [], "rates": cached_rates}
+
+	providers = get_rate_providers(pickup_from_type)
+	for provider in providers:
+		enqueue_shipping_job(
+			"erpnext_shipping.erpnext_shipping.shipping.publish_provider_rates",
+			INTERACTIVE,
+			provider=provider,
+			rate_request_id=rate_request_id,
+			company=get_shipment_company(shipment),
+			**rate_args,
+		)
+
+	return {"providers": providers, "rates": []}
+
+
+def publish_provider_rates(provider, rate_request_id, pickup_from_type, **kwargs):
+	rates = []
+	try:
+		rate_args = get_rate_args([provider], pickup_from_type, **kwargs)
+		rates = get_provider_rates(provider, **rate_args)
+	except Exception:
+		frappe.log_error(title="Shipping Error")
+
+	frappe.publish_realtime(
+		"shipping_rates",
+		{"rate_request_id": rate_request_id, "provider": provider, "rates": rates},
+		user=frappe.session.user,
+	)
+
+
+def get_rate_providers(pickup_from_type) -> list[str]:
+	"""Return the enabled providers that can quote a Shipment."""
+	providers = []
+	if frappe.db.get_single_value("LetMeShip", "enabled"):
+		providers.append(LETMESHIP_PROVIDER)
+	if frappe.db.get_single_value("SendCloud", "enabled") and pickup_from_type == "Company":
+		providers.append(SENDCLOUD_PROVIDER)
+	if frappe.db.get_single_value("EasyPost", "enabled"):
+		providers.append(EASYPOST_PROVIDER)
+	return providers
+
+
+def get_rate_args(
+	providers,
+	pickup_from_type,
+	delivery_to_type,
+	pickup_address_name,
+	delivery_address_name,
+	parcels,
+	description_of_content,
+	pickup_date,
+	value_of_goods,
+	pickup_contact_name=None,
+	delivery_contact_name=None,
+	company=None,
+) -> dict:
+	"""Resolve addresses and contacts once for all providers of a rate request."""
+	pickup_contact, delivery_contact = None, None
+	if LETMESHIP_PROVIDER in providers or EASYPOST_PROVIDER in providers:
+		pickup_contact, delivery_contact = get_pickup_delivery_contacts(
+			pickup_from_type, delivery_to_type, pickup_contact_name, delivery_contact_name
+		)
+
+	return {
+		"delivery_to_type": delivery_to_type,
+		"pickup_address": get_address(pickup_address_name),
+		"delivery_address": get_address(delivery_address_name),
+		"pickup_contact": pickup_contact,
+		"delivery_contact": delivery_contact,
+		"parcels": json.loads(parcels) if isinstance(parcels, str) else parcels,
+		"description_of_content": description_of_content,
+		"pickup_date": pickup_date,
+		"value_of_goods": value_of_goods,
+		"company": company,
+	}
+
+
+def get_provider_rates(
+	provider,
+	delivery_to_type,
+	pickup_address,
+	delivery_address,
+	pickup_contact,
+	delivery_contact,
+	parcels,
+	description_of_content,
+	pickup_date,
+	value_of_goods,
+	company=None,
+) -> list[dict]:
+	# Providers adjust addresses and contacts to their format, so each one gets its own copy.
+	pickup_address, delivery_address = frappe._dict(pickup_address), frappe._dict(delivery_address)
+	pickup_contact = pickup_contact and frappe._dict(pickup_contact)
+	delivery_contact = delivery_contact and frappe._dict(delivery_contact)
+	prices = []
+
+	if not is_provider_eligible(provider, parcels):
+		return prices
+
+	if provider == LETMESHIP_PROVIDER:
+		letmeship = get_letmeship_utils(company=company)
+		prices = letmeship.get_available_services(
+			delivery_to_type=delivery_to_type,
+			pickup_address=pickup_address,
+			delivery_address=delivery_address,
+			parcels=parcels,
+			description_of_content=description_of_content,
+			pickup_date=pickup_date,
+			value_of_goods=value_of_goods,
+			pickup_contact=pickup_contact,
+			delivery_contact=delivery_contact,
+		)
+	elif provider == SENDCLOUD_PROVIDER:
+		sendcloud = SendCloudUtils(company=company)
+		prices = sendcloud.get_available_services(delivery_address=delivery_address, parcels=parcels)
+	elif provider == EASYPOST_PROVIDER:
+		easypost = get_easypost_utils()
+		prices = easypost.get_available_services(
+			pickup_address=pickup_address,
+			delivery_address=delivery_address,
+			parcels=parcels,
+			pickup_contact=pickup_contact,
+			delivery_contact=delivery_contact,
+		)
+
+	prices = prices or []
+	if provider != SENDCLOUD_PROVIDER:
+		# SendCloud prices come from its catalog, which seeds the limits directly
+		try:
+			learn_service_limits(prices, parcels)
+		except Exception:
+			frappe.log_error(title="Shipping Error")
+
+	prices = match_parcel_service_type_carrier(filter_services(prices, parcels), "carrier", "service_name")
+	try:
+		record_quotes(prices, pickup_address, delivery_address, parcels)
+	except Exception:
+		frappe.log_error(title="Shipping Error")
+
+	return prices
+
+
+@frappe.whitelist()
+@profiled
 def create_shipment(
 	shipment,
 	pickup_from_type,
@@ -105,26 +314,39 @@ def create_shipment(
 	if delivery_notes is None:
 		delivery_notes = []
 
+	retry_payload = {
+		"shipment": shipment,
+		"pickup_from_type": pickup_from_type,
+		"delivery_to_type": delivery_to_type,
+		"pickup_address_name": pickup_address_name,
+		"delivery_address_name": delivery_address_name,
+		"shipment_parcel": shipment_parcel,
+		"description_of_content": description_of_content,
+		"pickup_date": pickup_date,
+		"value_of_goods": value_of_goods,
+		"service_data": service_data,
+		"pickup_contact_name": pickup_contact_name,
+		"delivery_contact_name": delivery_contact_name,
+		"delivery_notes": delivery_notes,
+	}
+	frappe.flags.shipping_exception = None
 	service_info = json.loads(service_data)
-	shipment_info, pickup_contact, delivery_contact = None, None, None
+	shipment_info = None
 	pickup_address = get_address(pickup_address_name)
 	delivery_address = get_address(delivery_address_name)
 	delivery_company_name = get_delivery_company_name(shipment)
+	pickup_contact, delivery_contact = get_pickup_delivery_contacts(
+		pickup_from_type, delivery_to_type, pickup_contact_name, delivery_contact_name
+	)
 
-	if pickup_from_type != "Company":
-		pickup_contact = get_contact(pickup_contact_name)
-	else:
-		pickup_contact = get_company_contact(user=pickup_contact_name)
-		pickup_contact.email_id = pickup_contact.pop("email", None)
-
-	if delivery_to_type != "Company":
-		delivery_contact = get_contact(delivery_contact_name)
-	else:
-		delivery_contact = get_company_contact(user=pickup_contact_name)
-		pickup_contact.email_id = pickup_contact.pop("email", None)
-
+	# book with the account that quoted the service
+	account_name = service_info.get("account")
+	company = get_shipment_company(shipment)
+	pickup_order = False
 	if service_info["service_provider"] == LETMESHIP_PROVIDER:
-		letmeship = get_letmeship_utils()
+		letmeship = get_letmeship_utils(account_name, company)
+		validate_account_company(letmeship.account, company)
+		pickup_order = orders_letmeship_pickup(shipment, letmeship.account.name, service_info["carrier"])
 		shipment_info = letmeship.create_shipment(
 			pickup_address=pickup_address,
 			delivery_company_name=delivery_company_name,
@@ -136,10 +358,12 @@ def create_shipment(
 			pickup_contact=pickup_contact,
 			delivery_contact=delivery_contact,
 			service_info=service_info,
+			pickup_order=pickup_order,
 		)
 
 	if service_info["service_provider"] == SENDCLOUD_PROVIDER:
-		sendcloud = SendCloudUtils()
+		sendcloud = SendCloudUtils(account_name, company)
+		validate_account_company(sendcloud.account, company)
 		shipment_info = sendcloud.create_shipment(
 			shipment=shipment,
 			delivery_company_name=delivery_company_name,
@@ -151,24 +375,197 @@ def create_shipment(
 			service_info=service_info,
 		)
 
+	if service_info["service_provider"] == EASYPOST_PROVIDER:
+		easypost = get_easypost_utils()
+		shipment_info = easypost.create_shipment(service_info=service_info)
+
 	if shipment_info:
-		shipment = frappe.get_doc("Shipment", shipment)
-		shipment.db_set(
-			{
-				"service_provider": shipment_info.get("service_provider"),
-				"carrier": shipment_info.get("carrier"),
-				"carrier_service": shipment_info.get("carrier_service"),
-				"shipment_id": shipment_info.get("shipment_id"),
-				"shipment_amount": shipment_info.get("shipment_amount"),
-				"awb_number": shipment_info.get("awb_number"),
-				"status": "Booked",
-			}
+		update_booked_shipment(frappe.get_doc("Shipment", shipment), shipment_info, delivery_notes)
+		if service_info["service_provider"] == LETMESHIP_PROVIDER:
+			add_to_letmeship_pickup(shipment, ordered=pickup_order)
+	else:
+		queue_for_retry("Create Shipment", shipment, service_info["service_provider"], retry_payload)
+
+	return shipment_info
+
+
+@frappe.whitelist()
+@profiled
+def enqueue_create_shipment(
+	shipment,
+	pickup_from_type,
+	delivery_to_type,
+	pickup_address_name,
+	delivery_address_name,
+	shipment_parcel,
+	description_of_content,
+	pickup_date,
+	value_of_goods,
+	service_data,
+	shipment_notific_email=None,
+	tracking_notific_email=None,
+	pickup_contact_name=None,
+	delivery_contact_name=None,
+	delivery_notes=None,
+):
+	"""Book the Shipment in a background job and stream its progress to the form.
+
+	Progress and result are published as `shipment_booking_progress` realtime events.
+	"""
+	frappe.has_permission("Shipment", "write", doc=shipment, throw=True)
+	job = enqueue_shipping_job(
+		"erpnext_shipping.erpnext_shipping.shipping.create_shipment_job",
+		INTERACTIVE,
+		shipment=shipment,
+		pickup_from_type=pickup_from_type,
+		delivery_to_type=delivery_to_type,
+		pickup_address_name=pickup_address_name,
+		delivery_address_name=delivery_address_name,
+		shipment_parcel=shipment_parcel,
+		description_of_content=description_of_content,
+		pickup_date=pickup_date,
+		value_of_goods=value_of_goods,
+		service_data=service_data,
+		pickup_contact_name=pickup_contact_name,
+		delivery_contact_name=delivery_contact_name,
+		delivery_notes=delivery_notes,
+	)
+	publish_booking_progress(shipment, "queued", description=_("Waiting for a background worker"))
+	return job.id
+
+
+def create_shipment_job(shipment, delivery_notes=None, **kwargs):
+	"""Book the Shipment and fetch its tracking info, reporting each step."""
+	publish_booking_progress(shipment, "progress", 1, _("Booking with provider"))
+	try:
+		shipment_info = create_shipment(shipment=shipment, delivery_notes=delivery_notes, **kwargs)
+	except Exception:
+		shipment_info = None
+		frappe.log_error(title="Shipping Error")
+
+	if not shipment_info:
+		publish_booking_progress(
+			shipment, "failed", description=_("Shipment could not be booked, see the Error Log for details.")
 		)
+		return
 
-		if delivery_notes:
-			update_delivery_note(delivery_notes=delivery_notes, shipment_info=shipment_info)
+	publish_booking_progress(shipment, "progress", 2, _("Fetching tracking information"))
+	update_tracking(shipment, shipment_info["service_provider"], shipment_info["shipment_id"], delivery_notes)
+	publish_booking_progress(shipment, "done", 3, shipment_info=shipment_info)
 
-	return shipment_info
+
+def publish_booking_progress(shipment, status, progress=0, description=None, shipment_info=None):
+	frappe.publish_realtime(
+		"shipment_booking_progress",
+		{
+			"shipment": shipment,
+			"status": status,
+			"progress": progress,
+			"total": 3,
+			"description": description,
+			"shipment_info": shipment_info,
+		},
+		user=frappe.session.user,
+	)
+
+
+def book_shipment(shipment_doc, service_info: dict):
+	"""Book a submitted Shipment with one of its rates, without going through the form."""
+	rate_args = get_shipment_rate_args(shipment_doc)
+	return create_shipment(
+		shipment=shipment_doc.name,
+		pickup_from_type=rate_args["pickup_from_type"],
+		delivery_to_type=rate_args["delivery_to_type"],
+		pickup_address_name=rate_args["pickup_address_name"],
+		delivery_address_name=rate_args["delivery_address_name"],
+		shipment_parcel=frappe.as_json(rate_args["parcels"]),
+		description_of_content=rate_args["description_of_content"],
+		pickup_date=rate_args["pickup_date"],
+		value_of_goods=rate_args["value_of_goods"],
+		service_data=frappe.as_json(service_info),
+		pickup_contact_name=rate_args["pickup_contact_name"],
+		delivery_contact_name=rate_args["delivery_contact_name"],
+		delivery_notes=[row.delivery_note for row in shipment_doc.shipment_delivery_note],
+	)
+
+
+def update_booked_shipment(shipment_doc, shipment_info: dict, delivery_notes=None):
+	"""Store the booking returned by a provider on the Shipment and its Delivery Notes."""
+	shipment_doc.db_set(
+		{
+			"service_provider": shipment_info.get("service_provider"),
+			"carrier": shipment_info.get("carrier"),
+			"carrier_service": shipment_info.get("carrier_service"),
+			"shipment_id": shipment_info.get("shipment_id"),
+			"shipment_amount": shipment_info.get("shipment_amount"),
+			"awb_number": shipment_info.get("awb_number"),
+			"shipping_account": shipment_info.get("account"),
+			"status": "Booked",
+		}
+	)
+	sync_tracking_references(
+		shipment_doc.name, shipment_doc.service_provider, shipment_doc.shipment_id, shipment_doc.awb_number
+	)
+
+	if delivery_notes:
+		update_delivery_note(delivery_notes=delivery_notes, shipment_info=shipment_info)
+
+
+def get_pickup_delivery_contacts(
+	pickup_from_type, delivery_to_type, pickup_contact_name, delivery_contact_name
+):
+	if pickup_from_type != "Company":
+		pickup_contact = get_contact(pickup_contact_name)
+	else:
+		pickup_contact = get_company_contact(user=pickup_contact_name)
+		pickup_contact.email_id = pickup_contact.pop("email", None)
+
+	if delivery_to_type != "Company":
+		delivery_contact = get_contact(delivery_contact_name)
+	else:
+		delivery_contact = get_company_contact(user=pickup_contact_name)
+		delivery_contact.email_id = delivery_contact.pop("email", None)
+
+	return pickup_contact, delivery_contact
+
+
+def get_shipment_parties(shipment_doc):
+	"""Return pickup and delivery address and contact of a Shipment document."""
+	pickup_contact_name = (
+		shipment_doc.pickup_contact_person
+		if shipment_doc.pickup_from_type == "Company"
+		else shipment_doc.pickup_contact_name
+	)
+	pickup_contact, delivery_contact = get_pickup_delivery_contacts(
+		shipment_doc.pickup_from_type,
+		shipment_doc.delivery_to_type,
+		pickup_contact_name,
+		shipment_doc.delivery_contact_name,
+	)
+	return (
+		get_address(shipment_doc.pickup_address_name),
+		get_address(shipment_doc.delivery_address_name),
+		pickup_contact,
+		delivery_contact,
+	)
+
+
+def get_shipment_rate_args(shipment_doc) -> dict:
+	"""Return the arguments of `fetch_shipping_rates` for a Shipment, as sent by the form."""
+	return {
+		"pickup_from_type": shipment_doc.pickup_from_type,
+		"delivery_to_type": shipment_doc.delivery_to_type,
+		"pickup_address_name": shipment_doc.pickup_address_name,
+		"delivery_address_name": shipment_doc.delivery_address_name,
+		"parcels": [parcel.as_dict() for parcel in shipment_doc.shipment_parcel],
+		"description_of_content": shipment_doc.description_of_content,
+		"pickup_date": shipment_doc.pickup_date,
+		"value_of_goods": shipment_doc.value_of_goods,
+		"pickup_contact_name": shipment_doc.pickup_contact_person
+		if shipment_doc.pickup_from_type == "Company"
+		else shipment_doc.pickup_contact_name,
+		"delivery_contact_name": shipment_doc.delivery_contact_name,
+	}
 
 
 def get_delivery_company_name(shipment: str) -> str | None:
@@ -184,56 +581,84 @@ def get_delivery_company_name(shipment: str) -> str | None:
 
 
 @frappe.whitelist()
-def print_shipping_label(shipment: str):
+@profiled
+def print_shipping_label(shipment: str, save_as_attachment=False):
+	frappe.has_permission("Shipment", "write", doc=shipment, throw=True)
 	shipment_doc = frappe.get_doc("Shipment", shipment)
 	service_provider = shipment_doc.service_provider
 	shipment_id = shipment_doc.shipment_id
+	account_name = get_booking_account(shipment_doc.get("shipping_account"))
+	frappe.flags.shipping_exception = None
+	shipping_label = None
 
 	if service_provider == LETMESHIP_PROVIDER:
-		letmeship = get_letmeship_utils()
+		letmeship = get_letmeship_utils(account_name)
 		shipping_label = letmeship.get_label(shipment_id)
+		if shipping_label and save_as_attachment:
+			save_label_as_attachment(shipment, bytes(loads(shipping_label)))
 	elif service_provider == SENDCLOUD_PROVIDER:
-		sendcloud = SendCloudUtils()
+		sendcloud = SendCloudUtils(account_name)
 		shipping_label = []
-		_labels = sendcloud.get_label(shipment_id)
+		_labels = sendcloud.get_label(shipment_id) or []
 		for label_url in _labels:
 			content = sendcloud.download_label(label_url)
 			file_url = save_label_as_attachment(shipment, content)
 			shipping_label.append(file_url)
+	elif service_provider == EASYPOST_PROVIDER:
+		easypost = get_easypost_utils()
+		shipping_label = []
+		for label_url in easypost.get_label(shipment_id) or []:
+			content = easypost.download_label(label_url)
+			shipping_label.append(save_label_as_attachment(shipment, content))
+
+	if not shipping_label:
+		queue_for_retry("Fetch Shipping Label", shipment, service_provider, {})
 
 	return shipping_label
 
 
 def save_label_as_attachment(shipment: str, content: bytes) -> str:
 	"""Store label as attachment to Shipment and return the URL."""
-	attachment = frappe.new_doc("File")
-
-	attachment.file_name = f"label_{shipment}.pdf"
-	attachment.content = content
-	attachment.folder = "Home/Attachments"
-	attachment.attached_to_doctype = "Shipment"
-	attachment.attached_to_name = shipment
-	attachment.is_private = 1
-	attachment.save()
-
-	return attachment.file_url
+	return store_label(shipment, content)
 
 
 @frappe.whitelist()
+@profiled
 def update_tracking(shipment, service_provider, shipment_id, delivery_notes=None):
 	if delivery_notes is None:
 		delivery_notes = []
 
 	# Update Tracking info in Shipment
+	frappe.flags.shipping_exception = None
 	tracking_data = None
+	account_name = get_booking_account(frappe.db.get_value("Shipment", shipment, "shipping_account"))
 	if service_provider == LETMESHIP_PROVIDER:
-		letmeship = get_letmeship_utils()
+		letmeship = get_letmeship_utils(account_name)
 		tracking_data = letmeship.get_tracking_data(shipment_id)
 	elif service_provider == SENDCLOUD_PROVIDER:
-		sendcloud = SendCloudUtils()
+		sendcloud = SendCloudUtils(account_name)
 		tracking_data = sendcloud.get_tracking_data(shipment_id)
+	elif service_provider == EASYPOST_PROVIDER:
+		easypost = get_easypost_utils()
+		tracking_data = easypost.get_tracking_data(shipment_id)
+
+	return apply_tracking_data(shipment, service_provider, shipment_id, delivery_notes, tracking_data)
+
 
+def apply_tracking_data(shipment, service_provider, shipment_id, delivery_notes, tracking_data):
+	"""Store tracking data fetched for a Shipment, or queue a retry if there is none."""
 	if not tracking_data:
+		queue_for_retry(
+			"Update Tracking",
+			shipment,
+			service_provider,
+			{
+				"shipment": shipment,
+				"service_provider": service_provider,
+				"shipment_id": shipment_id,
+				"delivery_notes": delivery_notes,
+			},
+		)
 		return
 
 	shipment = frappe.get_doc("Shipment", shipment)
@@ -245,10 +670,128 @@ def update_tracking(shipment, service_provider, shipment_id, delivery_notes=None
 			"tracking_url": tracking_data.get("tracking_url"),
 		}
 	)
+	sync_tracking_references(
+		shipment.name, shipment.service_provider, shipment.shipment_id, shipment.awb_number
+	)
 
 	if delivery_notes:
 		update_delivery_note(delivery_notes=delivery_notes, tracking_info=tracking_data)
 
+	return tracking_data
+
+
+def update_tracking_concurrently(shipments: list[dict]) -> list[dict | None]:
+	"""Update the tracking info of many Shipments over the async transport.
+
+	Each of `shipments` has the `name`, `service_provider`, `shipping_account`,
+	`shipment_id` and `delivery_notes` of a Shipment. Returns the tracking data per Shipment.
+	"""
+	provider_utils = get_provider_utils(
+		{(shipment["service_provider"], shipment["shipping_account"]) for shipment in shipments}
+	)
+
+	async def fetch(client, shipment):
+		frappe.flags.shipping_exception = None
+		utils = provider_utils.get((shipment["service_provider"], shipment["shipping_account"]))
+		tracking_data = await utils.aget_tracking_data(client, shipment["shipment_id"]) if utils else None
+		return tracking_data, frappe.flags.shipping_exception
+
+	results = run_concurrently(fetch, shipments)
+
+	tracking_infos = []
+	for shipment, result in zip(shipments, results, strict=True):
+		tracking_data, frappe.flags.shipping_exception = (
+			(None, result) if isinstance(result, BaseException) else result
+		)
+		tracking_infos.append(
+			apply_tracking_data(
+				shipment["name"],
+				shipment["service_provider"],
+				shipment["shipment_id"],
+				shipment["delivery_notes"],
+				tracking_data,
+			)
+		)
+
+	return tracking_infos
+
+
+@frappe.whitelist()
+def enqueue_fetch_shipping_labels(shipments):
+	"""Fetch the labels of many booked Shipments in the background."""
+	shipments = frappe.parse_json(shipments)
+	for shipment in shipments:
+		frappe.has_permission("Shipment", "write", doc=shipment, throw=True)
+
+	enqueue_shipping_job(
+		"erpnext_shipping.erpnext_shipping.shipping.fetch_shipping_labels",
+		BULK,
+		shipments=shipments,
+	)
+
+
+def fetch_shipping_labels(shipments: list[str]) -> dict[str, list[str]]:
+	"""Fetch the labels of many Shipments and attach them. Returns the file URLs per Shipment.
+
+	Labels are requested concurrently if the async transport is enabled.
+	"""
+	if not is_async_enabled():
+		return {shipment: print_shipping_label(shipment, save_as_attachment=True) for shipment in shipments}
+
+	shipment_docs = frappe.get_all(
+		"Shipment",
+		filters={"name": ("in", shipments), "shipment_id": ("is", "set")},
+		fields=["name", "service_provider", "shipping_account", "shipment_id"],
+	)
+	provider_utils = get_provider_utils(
+		{(doc.service_provider, doc.shipping_account) for doc in shipment_docs}
+	)
+
+	async def fetch(client, shipment_doc):
+		frappe.flags.shipping_exception = None
+		utils = provider_utils.get((shipment_doc.service_provider, shipment_doc.shipping_account))
+		contents = []
+		if shipment_doc.service_provider == LETMESHIP_PROVIDER:
+			label = await utils.aget_label(client, shipment_doc.shipment_id)
+			contents = [bytes(loads(label))] if label else []
+		elif utils:
+			for label_url in await utils.aget_label(client, shipment_doc.shipment_id) or []:
+				contents.append(await utils.adownload_label(client, label_url))
+
+		if not all(contents):
+			contents = []
+		return contents, frappe.flags.shipping_exception
+
+	results = run_concurrently(fetch, shipment_docs)
+
+	file_urls = {}
+	for shipment_doc, result in zip(shipment_docs, results, strict=True):
+		contents, frappe.flags.shipping_exception = (
+			([], result) if isinstance(result, BaseException) else result
+		)
+		file_urls[shipment_doc.name] = [
+			save_label_as_attachment(shipment_doc.name, content) for content in contents
+		]
+		if not contents:
+			queue_for_retry("Fetch Shipping Label", shipment_doc.name, shipment_doc.service_provider, {})
+
+	return file_urls
+
+
+def get_provider_utils(provider_accounts) -> dict:
+	"""Return a client for each `(service_provider, account_name)` in `provider_accounts`."""
+	provider_utils = {}
+	for service_provider, account_name in provider_accounts:
+		key = (service_provider, account_name)
+		if service_provider == LETMESHIP_PROVIDER:
+			provider_utils[key] = get_letmeship_utils(get_booking_account(account_name))
+		elif service_provider == SENDCLOUD_PROVIDER:
+			provider_utils[key] = SendCloudUtils(get_booking_account(account_name))
+		elif service_provider == EASYPOST_PROVIDER:
+			provider_utils[key] = get_easypost_utils()
+
+	return provider_utils
+
 
 def update_delivery_note(delivery_notes, shipment_info=None, tracking_info=None):
 	# Update Shipment Info in Delivery Note
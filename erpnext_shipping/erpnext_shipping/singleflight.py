@@ -0,0 +1,74 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Collapse identical concurrent provider calls into one.
+
+The first caller of a flight takes a Redis lock and makes the upstream call. Callers with
+the same key arriving meanwhile, from any worker, wait for its result instead of calling
+the provider themselves. Only use this for calls without side effects.
+"""
+
+import hashlib
+import json
+import pickle
+import time
+from collections.abc import Callable
+from typing import Any
+
+import frappe
+
+FLIGHT_TIMEOUT = 30  # seconds a leader may take before waiters give up on it
+RESULT_TTL = 5  # seconds a result is shared with callers arriving after the flight
+POLL_INTERVAL = 0.05
+
+# delete lock KEYS[1] only if it still holds the token ARGV[1]: once FLIGHT_TIMEOUT has
+# passed, the lock may belong to a new leader
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("del", KEYS[1]) end
+return 0
+"""
+
+
+def get_flight_key(provider: str, endpoint: str, payload: Any = None) -> str:
+	"""Return the key of a call, independent of the order of keys in its payload."""
+	normalized = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+	digest = hashlib.sha256(f"{provider}|{endpoint}|{normalized}".encode()).hexdigest()
+	return f"erpnext_shipping:flight:{digest}"
+
+
+def single_flight(provider: str, endpoint: str, payload: Any, call: Callable[[], Any]) -> Any:
+	"""Return the result of `call`, sharing it with identical concurrent calls.
+
+	`payload` must contain everything that makes the call differ from others, including
+	credentials or account if the same endpoint is used with several.
+	"""
+	cache = frappe.cache()
+	key = get_flight_key(provider, endpoint, payload)
+	lock_key = cache.make_key(f"{key}:lock")
+	result_key = cache.make_key(f"{key}:result")
+
+	result = cache.get(result_key)
+	if result is not None:
+		return pickle.loads(result)
+
+	token = frappe.generate_hash(length=10)
+	if cache.set(lock_key, token, nx=True, ex=FLIGHT_TIMEOUT):
+		try:
+			result = call()
+			cache.set(result_key, pickle.dumps(result), ex=RESULT_TTL)
+			return result
+		finally:
+			release = cache.register_script(RELEASE_SCRIPT)
+			release(keys=[lock_key], args=[token])
+
+	deadline = time.monotonic() + FLIGHT_TIMEOUT
+	while time.monotonic() < deadline:
+		leader_busy = cache.exists(lock_key)
+		result = cache.get(result_key)
+		if result is not None:
+			return pickle.loads(result)
+		if not leader_busy:
+			# the leader failed, so there is no result to share
+			break
+		time.sleep(POLL_INTERVAL)
+
+	return call()
@@ -0,0 +1,45 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+from unittest import TestCase
+
+import frappe
+
+from erpnext_shipping.erpnext_shipping.accounts import (
+	DEFAULT_ACCOUNT,
+	ProviderAccount,
+	get_account,
+	get_booking_account,
+	validate_account_company,
+)
+
+ACCOUNTS = [
+	ProviderAccount("SendCloud", DEFAULT_ACCOUNT, "key", "secret"),
+	ProviderAccount("SendCloud", "Company A", "key-a", "secret-a", company="A"),
+	ProviderAccount("SendCloud", "Company B", "key-b", "secret-b", company="B"),
+]
+
+
+class TestAccounts(TestCase):
+	def test_named_account(self):
+		self.assertEqual(get_account(ACCOUNTS, "Company B").api_key, "key-b")
+
+	def test_company_account_is_preferred(self):
+		self.assertEqual(get_account(ACCOUNTS, company="A").name, "Company A")
+
+	def test_other_companies_accounts_are_not_used(self):
+		self.assertEqual(get_account(ACCOUNTS, company="C").name, DEFAULT_ACCOUNT)
+		self.assertEqual(get_account(ACCOUNTS).name, DEFAULT_ACCOUNT)
+
+	def test_shipments_booked_before_accounts(self):
+		self.assertEqual(get_booking_account(None), DEFAULT_ACCOUNT)
+		self.assertEqual(get_booking_account(""), DEFAULT_ACCOUNT)
+		self.assertEqual(get_booking_account("Company A"), "Company A")
+
+	def test_reserved_account_of_other_company(self):
+		validate_account_company(ACCOUNTS[1], "A")
+		validate_account_company(ACCOUNTS[0], "B")
+		with self.assertRaises(frappe.PermissionError):
+			validate_account_company(ACCOUNTS[1], "B")
+		with self.assertRaises(frappe.PermissionError):
+			validate_account_company(ACCOUNTS[1], None)
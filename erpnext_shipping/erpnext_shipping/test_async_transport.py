@@ -0,0 +1,98 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase, skipUnless
+
+import frappe
+
+from erpnext_shipping.erpnext_shipping.async_transport import httpx, run_concurrently
+
+
+class StandInProvider(BaseHTTPRequestHandler):
+	"""Answers `/<delay in ms>/<status>` after the delay, and counts the requests in flight."""
+
+	lock = threading.Lock()
+	in_flight = 0
+	max_in_flight = 0
+
+	def do_GET(self):
+		delay, status = self.path.strip("/").split("/")
+		with self.lock:
+			StandInProvider.in_flight += 1
+			StandInProvider.max_in_flight = max(StandInProvider.max_in_flight, StandInProvider.in_flight)
+		time.sleep(int(delay) / 1000)
+		with self.lock:
+			StandInProvider.in_flight -= 1
+
+		payload = self.path.encode()
+		self.send_response(int(status))
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def log_message(self, *args):
+		pass
+
+
+@skipUnless(httpx, "httpx is not installed")
+class TestAsyncTransport(TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInProvider)
+		threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+		cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+
+	def setUp(self):
+		StandInProvider.max_in_flight = 0
+
+	async def fetch(self, client, item):
+		delay, status = item
+		response = await client.get(f"{self.base_url}/{delay}/{status}")
+		response.raise_for_status()
+		return response.text
+
+	def test_results_in_order(self):
+		# later items answer first
+		items = [(200 - 20 * i, 200) for i in range(10)]
+		results = run_concurrently(self.fetch, items, max_in_flight=10)
+		self.assertEqual(results, [f"/{delay}/{status}" for delay, status in items])
+
+	def test_max_in_flight(self):
+		run_concurrently(self.fetch, [(50, 200)] * 8, max_in_flight=3)
+		self.assertLessEqual(StandInProvider.max_in_flight, 3)
+
+	def test_exceptions_are_returned(self):
+		results = run_concurrently(self.fetch, [(10, 200), (10, 503), (10, 200)], max_in_flight=3)
+		self.assertEqual(results[0], "/10/200")
+		self.assertIsInstance(results[1], httpx.HTTPStatusError)
+		self.assertEqual(results[2], "/10/200")
+
+	def test_flags_stay_with_their_call(self):
+		async def fetch_and_report(client, item):
+			# like `show_error_alert`, report the error through the flags
+			frappe.flags.shipping_exception = None
+			try:
+				await self.fetch(client, item)
+			except httpx.HTTPError as e:
+				frappe.flags.shipping_exception = e
+			# let the other calls run before the flag is read
+			await asyncio.sleep(0.05)
+			return frappe.flags.shipping_exception
+
+		frappe.flags.shipping_exception = None
+		results = run_concurrently(
+			fetch_and_report, [(10, 503), (30, 200), (20, 422), (40, 200)], max_in_flight=4
+		)
+
+		self.assertEqual(
+			[result.response.status_code if result else None for result in results], [503, None, 422, None]
+		)
+		self.assertIsNone(frappe.flags.shipping_exception)
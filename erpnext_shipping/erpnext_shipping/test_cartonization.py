@@ -0,0 +1,36 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.cartonization import get_parcel_rows, pack_items
+
+BOXES = (
+	("Small", 20, 20, 10, 5),
+	("Large", 40, 40, 40, 20),
+)
+
+
+class TestCartonization(FrappeTestCase):
+	def test_pieces_share_the_smallest_box(self):
+		parcels = pack_items((((10, 10, 10, 1.0), 4),), BOXES)
+		self.assertEqual(
+			get_parcel_rows(parcels), [{"length": 20, "width": 20, "height": 10, "weight": 4.0, "count": 1}]
+		)
+
+	def test_rotation_and_weight_limit(self):
+		# lying flat, 15 x 18 x 5 pieces fit two per small box, but not three by weight
+		parcels = pack_items((((5, 15, 18, 2.0), 4),), BOXES)
+		self.assertEqual(
+			get_parcel_rows(parcels), [{"length": 20, "width": 20, "height": 10, "weight": 4.0, "count": 2}]
+		)
+
+	def test_oversized_piece_is_its_own_parcel(self):
+		parcels = pack_items((((50, 10, 10, 3.0), 1), ((10, 10, 10, 1.0), 1)), BOXES)
+		self.assertEqual(
+			sorted(get_parcel_rows(parcels), key=lambda row: row["length"]),
+			[
+				{"length": 20, "width": 20, "height": 10, "weight": 1.0, "count": 1},
+				{"length": 50, "width": 10, "height": 10, "weight": 3.0, "count": 1},
+			],
+		)
@@ -0,0 +1,46 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+from unittest import TestCase
+
+import requests
+
+from erpnext_shipping.erpnext_shipping.codec import decode_response, dumps, loads, select_fields
+
+
+def make_response(content: bytes) -> requests.Response:
+	response = requests.Response()
+	response._content = content
+	response.status_code = 200
+	return response
+
+
+class TestCodec(TestCase):
+	def test_round_trip(self):
+		data = {"parcels": [{"weight": 1.5, "id": 7}], "name": "Ä"}
+		self.assertEqual(loads(dumps(data)), data)
+
+	def test_select_fields(self):
+		data = {
+			"shipping_methods": [
+				{
+					"id": 1,
+					"name": "Small",
+					"properties": {},
+					"countries": [{"iso_2": "DE", "price": 4, "lead_time": 1}],
+				}
+			],
+			"next": None,
+		}
+		fields = {"shipping_methods": {"id": None, "countries": ("iso_2", "price")}}
+		self.assertEqual(
+			select_fields(data, fields),
+			{"shipping_methods": [{"id": 1, "countries": [{"iso_2": "DE", "price": 4}]}]},
+		)
+
+	def test_decode_response(self):
+		response = make_response(b'{"id": 1, "status": {"message": "ok"}}')
+		self.assertEqual(decode_response(response, ("id",)), {"id": 1})
+
+		with self.assertRaises(requests.exceptions.JSONDecodeError):
+			decode_response(make_response(b"<html>Bad Gateway</html>"))
@@ -0,0 +1,118 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+from unittest.mock import patch
+
+import frappe
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.hedging import (
+	BUDGET_WINDOW,
+	MIN_SAMPLES,
+	STATS_KEY,
+	get_first_successful,
+	get_hedge_threshold,
+	hedged_call,
+	record_call,
+	take_hedge,
+)
+
+NOW = 1_800_000_000.0
+
+
+def answer_after(seconds: float, value=None, error: Exception | None = None):
+	time.sleep(seconds)
+	if error:
+		raise error
+	return value
+
+
+class TestHedging(TestCase):
+	def test_faster_attempt_wins(self):
+		with ThreadPoolExecutor(max_workers=2) as executor:
+			first = executor.submit(answer_after, 0.2, "first")
+			second = executor.submit(answer_after, 0.01, "second")
+			self.assertIs(get_first_successful(first, second), second)
+
+	def test_failed_attempt_does_not_win(self):
+		with ThreadPoolExecutor(max_workers=2) as executor:
+			first = executor.submit(answer_after, 0.01, error=ConnectionError())
+			second = executor.submit(answer_after, 0.05, "second")
+			self.assertIs(get_first_successful(first, second), second)
+
+	def test_all_failed_returns_first(self):
+		with ThreadPoolExecutor(max_workers=2) as executor:
+			first = executor.submit(answer_after, 0.05, error=ConnectionError())
+			second = executor.submit(answer_after, 0.01, error=TimeoutError())
+			self.assertIs(get_first_successful(first, second), first)
+
+
+class TestHedgeBudget(FrappeTestCase):
+	"""Thresholds and budgets, run against the site's Redis."""
+
+	def setUp(self):
+		self.key = f"Test Provider {self.id()}"
+		self.settings = {"hedge_rate_requests": 1, "hedge_percentile": 0, "max_hedge_rate": 0}
+		for patcher in (
+			patch.object(
+				frappe.db, "get_single_value", side_effect=lambda _doctype, field: self.settings[field]
+			),
+			# keep the calls in one budget window
+			patch("time.time", return_value=NOW),
+		):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def tearDown(self):
+		cache = frappe.cache()
+		cache.delete(
+			cache.make_key(f"{STATS_KEY}:latency:{self.key}"),
+			cache.make_key(f"{STATS_KEY}:budget:{self.key}:{int(NOW // BUDGET_WINDOW)}"),
+		)
+		cache.hdel(
+			cache.make_key(STATS_KEY),
+			*(f"{self.key}|{counter}" for counter in ("calls", "hedged", "hedge_won")),
+		)
+
+	def record_calls(self, latencies):
+		for latency in latencies:
+			record_call(self.key, latency, False, False)
+
+	def test_no_threshold_without_enough_samples(self):
+		self.record_calls([0.1] * (MIN_SAMPLES - 1))
+		self.assertIsNone(get_hedge_threshold(self.key))
+
+	def test_threshold_is_percentile(self):
+		latencies = [0.01 * i for i in range(1, MIN_SAMPLES + 1)]
+		self.record_calls(latencies)
+		self.assertAlmostEqual(get_hedge_threshold(self.key), np.percentile(latencies, 95))
+
+		self.settings["hedge_percentile"] = 50
+		self.assertAlmostEqual(get_hedge_threshold(self.key), np.percentile(latencies, 50))
+
+	def test_hedges_are_limited_to_budget(self):
+		# 10 % of the calls of the minute, including the current one
+		self.record_calls([0.1] * 9)
+		self.assertTrue(take_hedge(self.key))
+		self.assertFalse(take_hedge(self.key))
+
+		self.record_calls([0.1] * 10)
+		self.assertTrue(take_hedge(self.key))
+		self.assertFalse(take_hedge(self.key))
+
+	def test_hedge_is_reported(self):
+		self.record_calls([0.001] * MIN_SAMPLES)
+		hedges = []
+
+		result = hedged_call(
+			"Test Provider",
+			self.id(),
+			lambda: answer_after(0.05, "answer"),
+			on_hedge=lambda: hedges.append(True),
+		)
+		self.assertEqual(result, "answer")
+		self.assertEqual(hedges, [True])
@@ -0,0 +1,74 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import os
+import socket
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+import frappe
+
+from erpnext_shipping.erpnext_shipping import label_printing
+from erpnext_shipping.erpnext_shipping.label_printing import send_to_network_printer, write_to_spool
+
+LABEL = b"^XA^FO50,50^ADN,36,20^FDSHIP-0001^FS^XZ"
+
+
+class TestLabelPrinting(TestCase):
+	def test_spool_files(self):
+		with tempfile.TemporaryDirectory() as directory:
+			paths = write_to_spool(directory, [LABEL, LABEL], "zpl")
+			self.assertEqual(len(paths), 2)
+			self.assertEqual(sorted(os.listdir(directory)), sorted(os.path.basename(path) for path in paths))
+			for path in paths:
+				with open(path, "rb") as f:
+					self.assertEqual(f.read(), LABEL)
+
+	def test_network_printer(self):
+		received = []
+		with socket.create_server(("127.0.0.1", 0)) as server:
+
+			def accept():
+				connection, _address = server.accept()
+				with connection:
+					while data := connection.recv(4096):
+						received.append(data)
+
+			thread = threading.Thread(target=accept)
+			thread.start()
+			send_to_network_printer("127.0.0.1", server.getsockname()[1], [LABEL, LABEL])
+			thread.join(timeout=5)
+
+		self.assertEqual(b"".join(received), LABEL * 2)
+
+	def test_bulk_printing_skips_unsupported_shipments(self):
+		providers = {
+			"SHIP-1": "EasyPost",
+			"SHIP-2": "LetMeShip",
+			"SHIP-3": "SendCloud",
+			"SHIP-4": "SendCloud",
+		}
+
+		def get_raw_labels(shipment):
+			if shipment == "SHIP-4":
+				frappe.throw("Label not found")
+			return [LABEL]
+
+		with (
+			patch.object(label_printing, "get_raw_label_format", return_value="ZPL"),
+			patch.object(
+				label_printing.frappe.db, "get_value", side_effect=lambda _dt, name, _f: providers[name]
+			),
+			patch.object(label_printing, "get_raw_labels", side_effect=get_raw_labels),
+			patch.object(label_printing, "send_to_printer") as send_to_printer,
+			patch.object(label_printing.frappe, "log_error") as log_error,
+		):
+			labels, skipped = label_printing.print_raw_labels(list(providers))
+
+		self.assertEqual(labels, [LABEL, LABEL])
+		self.assertEqual(skipped, ["SHIP-2"])
+		send_to_printer.assert_called_once_with([LABEL, LABEL])
+		# one for the failed fetch of SHIP-4, one for the skipped SHIP-2
+		self.assertEqual(log_error.call_count, 2)
@@ -0,0 +1,96 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+from unittest import TestCase
+from unittest.mock import patch
+
+import frappe
+import numpy as np
+
+from erpnext_shipping.erpnext_shipping import rate_shopping
+from erpnext_shipping.erpnext_shipping.rate_shopping import (
+	assign_cheapest_services,
+	get_cost_matrix,
+	get_rates_cost_matrix,
+	get_summary,
+)
+
+SERVICES = [
+	frappe._dict(service_provider="LetMeShip", carrier="DHL", service_name="Paket"),
+	frappe._dict(service_provider="LetMeShip", carrier="UPS", service_name="Standard"),
+	frappe._dict(service_provider="EasyPost", carrier="USPS", service_name="Priority"),
+]
+
+
+class TestRateShopping(TestCase):
+	def test_cheapest_per_shipment(self):
+		cost = np.array([[9.0, 7.5, np.inf], [12.0, 15.0, 11.0]])
+		assignments, best_cost = assign_cheapest_services(["SHIP-1", "SHIP-2"], SERVICES, cost)
+
+		self.assertEqual([a.service.carrier for a in assignments], ["UPS", "USPS"])
+		self.assertEqual([a.total_price for a in assignments], [7.5, 11.0])
+		self.assertEqual(get_summary(assignments, best_cost)["total_cost"], 18.5)
+
+	def test_preferred_only(self):
+		cost = np.array([[9.0, 7.5, np.inf], [12.0, 15.0, 11.0]])
+		assignments, _best_cost = assign_cheapest_services(
+			["SHIP-1", "SHIP-2"], SERVICES, cost, allowed=[True, False, False]
+		)
+
+		self.assertEqual([a.service.carrier for a in assignments], ["DHL", "DHL"])
+		self.assertEqual([a.total_price for a in assignments], [9.0, 12.0])
+
+	def test_shipments_without_rates(self):
+		cost = np.array([[np.inf, np.inf, np.inf], [12.0, np.inf, np.inf]])
+		assignments, best_cost = assign_cheapest_services(["SHIP-1", "SHIP-2"], SERVICES, cost)
+		summary = get_summary(assignments, best_cost)
+
+		self.assertIsNone(assignments[0].service)
+		self.assertEqual(summary["assigned"], 1)
+		self.assertEqual(summary["unassigned"], ["SHIP-1"])
+		self.assertEqual(summary["total_cost"], 12.0)
+
+		# no services at all
+		assignments, best_cost = assign_cheapest_services(["SHIP-1"], [], np.empty((1, 0)))
+		self.assertEqual(get_summary(assignments, best_cost)["unassigned"], ["SHIP-1"])
+
+	def test_rates_cost_matrix(self):
+		shipments = [frappe._dict(name="SHIP-1"), frappe._dict(name="SHIP-2")]
+		rate = {"service_provider": "LetMeShip", "carrier": "DHL", "service_name": "Paket"}
+		services, cost = get_rates_cost_matrix(
+			shipments,
+			{
+				"SHIP-1": [
+					{**rate, "total_price": 9.0},
+					{**rate, "total_price": 8.0},
+					{
+						"service_provider": "SendCloud",
+						"carrier": "DPD",
+						"service_name": "Home",
+						"total_price": 1,
+					},
+				],
+			},
+		)
+
+		self.assertEqual([service.carrier for service in services], ["DHL"])
+		self.assertEqual(cost.tolist(), [[8.0], [np.inf]])
+
+	def test_shipments_without_parcels_are_not_priced(self):
+		shipments = [frappe._dict(name="SHIP-1", parcel_count=2), frappe._dict(name="SHIP-2", parcel_count=0)]
+		with (
+			patch.object(
+				rate_shopping,
+				"get_sendcloud_cost_matrix",
+				return_value=(SERVICES[:1], np.array([[9.0], [0.0]])),
+			),
+			patch.object(
+				rate_shopping,
+				"get_cached_cost_matrix",
+				return_value=(SERVICES[1:2], np.array([[8.0], [np.inf]])),
+			),
+		):
+			services, cost = get_cost_matrix(shipments)
+
+		self.assertEqual(services, SERVICES[:2])
+		self.assertEqual(cost.tolist(), [[9.0, 8.0], [np.inf, np.inf]])
@@ -0,0 +1,81 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import pickle
+import threading
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.singleflight import RESULT_TTL, get_flight_key, single_flight
+
+
+class TestSingleFlight(FrappeTestCase):
+	"""The flight lock and result, run against the site's Redis."""
+
+	def setUp(self):
+		self.payload = {"test": self.id()}
+		key = get_flight_key("Test Provider", "rates", self.payload)
+		self.cache = frappe.cache()
+		self.lock_key = self.cache.make_key(f"{key}:lock")
+		self.result_key = self.cache.make_key(f"{key}:result")
+		self.calls = 0
+
+	def tearDown(self):
+		self.cache.delete(self.lock_key, self.result_key)
+
+	def call(self):
+		self.calls += 1
+		return {"price": 9.5}
+
+	def fly(self, call=None):
+		return single_flight("Test Provider", "rates", self.payload, call or self.call)
+
+	def later(self, action):
+		"""Run `action` shortly after, as another worker would."""
+		timer = threading.Timer(0.1, action)
+		timer.start()
+		self.addCleanup(timer.join)
+
+	def test_leader_shares_its_result(self):
+		self.assertEqual(self.fly(), {"price": 9.5})
+		self.assertFalse(self.cache.exists(self.lock_key))
+		self.assertTrue(0 < self.cache.ttl(self.result_key) <= RESULT_TTL)
+
+		# callers arriving within the TTL get the result without calling
+		self.assertEqual(self.fly(), {"price": 9.5})
+		self.assertEqual(self.calls, 1)
+
+	def test_follower_waits_for_leader(self):
+		self.cache.set(self.lock_key, "leader")
+		self.later(lambda: self.cache.set(self.result_key, pickle.dumps({"price": 7.0}), ex=RESULT_TTL))
+
+		self.assertEqual(self.fly(), {"price": 7.0})
+		self.assertEqual(self.calls, 0)
+
+	def test_follower_calls_when_leader_fails(self):
+		self.cache.set(self.lock_key, "leader")
+		# the leader releases its lock without a result
+		self.later(lambda: self.cache.delete(self.lock_key))
+
+		self.assertEqual(self.fly(), {"price": 9.5})
+		self.assertEqual(self.calls, 1)
+
+	def test_failing_leader_releases_lock(self):
+		def fail():
+			raise ConnectionError
+
+		with self.assertRaises(ConnectionError):
+			self.fly(fail)
+
+		self.assertFalse(self.cache.exists(self.lock_key))
+		self.assertFalse(self.cache.exists(self.result_key))
+
+	def test_leader_keeps_lock_of_next_leader(self):
+		def slow_call():
+			# the lock expired during the call and another caller took it
+			self.cache.set(self.lock_key, "next-leader")
+			return self.call()
+
+		self.fly(slow_call)
+		self.assertEqual(self.cache.get(self.lock_key), b"next-leader")
@@ -0,0 +1,125 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+from unittest import TestCase
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping import tracking_refresh
+from erpnext_shipping.erpnext_shipping.tracking_refresh import (
+	MAX_ATTEMPTS,
+	RENEW_EVERY,
+	RUN_KEY,
+	claim_batch,
+	create_run,
+	finish_batch,
+	get_lease_key,
+	get_pending_batches,
+	get_run_key,
+	get_run_state,
+	process_tracking_refresh,
+	record_progress,
+	release_lease,
+)
+
+
+class TestTrackingRefresh(TestCase):
+	def test_done_batches_are_not_pending(self):
+		self.assertEqual(get_pending_batches(3, {0, 2}, {0: 1, 2: 1}, set()), [1])
+
+	def test_leased_batches_stay_pending(self):
+		self.assertEqual(get_pending_batches(2, set(), {0: 1, 1: MAX_ATTEMPTS}, {0, 1}), [0, 1])
+
+	def test_failed_batches_are_given_up(self):
+		self.assertEqual(get_pending_batches(2, set(), {0: MAX_ATTEMPTS, 1: 1}, set()), [1])
+
+
+class TestTrackingRefreshLeases(FrappeTestCase):
+	"""The lease scripts, run against the site's Redis."""
+
+	def setUp(self):
+		self.runs = {}
+		self.run = self.create_run([["SHIP-1", "SHIP-2"], ["SHIP-3"]])
+
+	def tearDown(self):
+		# keep the scheduled jobs from picking up the test runs
+		cache = frappe.cache()
+		pipeline = cache.pipeline(transaction=False)
+		for run, batches in self.runs.items():
+			pipeline.delete(get_run_key(run), *(get_lease_key(run, index) for index in range(batches)))
+			pipeline.srem(cache.make_key(f"{RUN_KEY}:runs"), run)
+		pipeline.execute()
+
+	def create_run(self, batches: list[list[str]]) -> str:
+		run = create_run(batches)
+		self.runs[run] = len(batches)
+		return run
+
+	def expire_lease(self, index: int):
+		frappe.cache().delete(get_lease_key(self.run, index))
+
+	def test_workers_claim_different_batches(self):
+		self.assertEqual(claim_batch(self.run, "worker-a"), (0, ["SHIP-1", "SHIP-2"], 0))
+		self.assertEqual(claim_batch(self.run, "worker-b"), (1, ["SHIP-3"], 0))
+		self.assertIsNone(claim_batch(self.run, "worker-c"))
+
+	def test_expired_lease_is_claimed_again(self):
+		claim_batch(self.run, "worker-a")
+		self.expire_lease(0)
+		self.assertEqual(claim_batch(self.run, "worker-b")[0], 0)
+
+	def test_lost_lease(self):
+		claim_batch(self.run, "worker-a")
+		self.expire_lease(0)
+		claim_batch(self.run, "worker-b")
+
+		# worker-a can neither record progress nor finish or release worker-b's batch
+		self.assertFalse(record_progress(self.run, 0, "worker-a", 1))
+		finish_batch(self.run, 0, "worker-a")
+		release_lease(self.run, 0, "worker-a")
+
+		_batches, done, _attempts, leased = get_run_state(self.run)
+		self.assertEqual((done, leased), (set(), {0}))
+		self.assertTrue(record_progress(self.run, 0, "worker-b", 1))
+
+	def test_finish_and_release(self):
+		claim_batch(self.run, "worker-a")
+		finish_batch(self.run, 0, "worker-a")
+		claim_batch(self.run, "worker-a")
+		release_lease(self.run, 1, "worker-a")
+
+		_batches, done, attempts, leased = get_run_state(self.run)
+		self.assertEqual((done, attempts, leased), ({0}, {0: 1, 1: 1}, set()))
+		# a released batch can be claimed again, a finished one can't
+		self.assertEqual(claim_batch(self.run, "worker-b")[0], 1)
+		self.assertIsNone(claim_batch(self.run, "worker-c"))
+
+	def test_batch_is_given_up(self):
+		for _attempt in range(MAX_ATTEMPTS):
+			self.assertEqual(claim_batch(self.run, "worker-a")[0], 0)
+			release_lease(self.run, 0, "worker-a")
+
+		self.assertEqual(claim_batch(self.run, "worker-b")[0], 1)
+		self.assertEqual(get_pending_batches(*get_run_state(self.run)), [1])
+
+	def test_progress_is_resumed(self):
+		claim_batch(self.run, "worker-a")
+		record_progress(self.run, 0, "worker-a", 1)
+		self.expire_lease(0)
+		self.assertEqual(claim_batch(self.run, "worker-b"), (0, ["SHIP-1", "SHIP-2"], 1))
+
+	def test_takeover_refreshes_the_rest(self):
+		shipments = [f"SHIP-{i}" for i in range(2 * RENEW_EVERY + 5)]
+		run = self.create_run([shipments])
+		claim_batch(run, "worker-a")
+		record_progress(run, 0, "worker-a", RENEW_EVERY)
+		frappe.cache().delete(get_lease_key(run, 0))
+
+		refreshed = []
+		with patch.object(tracking_refresh, "refresh_tracking", refreshed.extend):
+			process_tracking_refresh(run)
+
+		self.assertEqual(refreshed, shipments[RENEW_EVERY:])
+		self.assertEqual(get_run_state(run)[1], {0})
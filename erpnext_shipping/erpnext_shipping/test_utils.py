@@ -0,0 +1,41 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+from unittest import TestCase
+from unittest.mock import patch
+
+import frappe
+
+from erpnext_shipping.erpnext_shipping import async_transport, shipping
+from erpnext_shipping.erpnext_shipping.utils import refresh_tracking
+
+
+class TestRefreshTracking(TestCase):
+	def setUp(self):
+		self.shipment_doc = frappe._dict(
+			name="SHIP-0001",
+			service_provider="EasyPost",
+			shipment_id="shp_1",
+			shipment_delivery_note=[frappe._dict(delivery_note="DN-1"), frappe._dict(delivery_note="DN-2")],
+		)
+
+	def test_async_refresh_passes_delivery_notes(self):
+		with (
+			patch.object(async_transport, "is_async_enabled", return_value=True),
+			patch.object(frappe, "get_doc", return_value=self.shipment_doc),
+			patch.object(shipping, "update_tracking_concurrently") as update_tracking_concurrently,
+		):
+			refresh_tracking(["SHIP-0001"])
+
+		(shipments,) = update_tracking_concurrently.call_args.args
+		self.assertEqual(shipments[0]["delivery_notes"], ["DN-1", "DN-2"])
+
+	def test_refresh_passes_delivery_notes(self):
+		with (
+			patch.object(async_transport, "is_async_enabled", return_value=False),
+			patch.object(frappe, "get_doc", return_value=self.shipment_doc),
+			patch.object(shipping, "update_tracking", return_value=None) as update_tracking,
+		):
+			refresh_tracking(["SHIP-0001"])
+
+		update_tracking.assert_called_once_with("SHIP-0001", "EasyPost", "shp_1", ["DN-1", "DN-2"])
@@ -0,0 +1,49 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext_shipping.erpnext_shipping.write_buffer import MAX_ATTEMPTS, flush_entries, push_entries
+
+
+class TestWriteBuffer(FrappeTestCase):
+	def setUp(self):
+		self.key = f"erpnext_shipping:test_buffer:{frappe.generate_hash(length=10)}"
+		self.written = []
+
+	def write(self, entries):
+		self.written.append([entry["n"] for entry in entries])
+
+	def fail(self, entries):
+		raise ValueError("cannot write")
+
+	def test_batches_in_order(self):
+		push_entries(self.key, [{"n": n} for n in range(5)], max_size=100)
+		flush_entries(self.key, 2, self.write)
+		self.assertEqual(self.written, [[0, 1], [2, 3], [4]])
+
+		flush_entries(self.key, 2, self.write)
+		self.assertEqual(len(self.written), 3)
+
+	def test_buffer_size(self):
+		push_entries(self.key, [{"n": n} for n in range(5)], max_size=3)
+		flush_entries(self.key, 10, self.write)
+		self.assertEqual(self.written, [[2, 3, 4]])
+
+	def test_failed_batch_is_kept(self):
+		push_entries(self.key, [{"n": n} for n in range(3)], max_size=100)
+		flush_entries(self.key, 2, self.fail)
+		# pushed while the batch was failing
+		push_entries(self.key, [{"n": 3}], max_size=100)
+
+		flush_entries(self.key, 2, self.write)
+		self.assertEqual(self.written, [[0, 1], [2, 3]])
+
+	def test_failing_batch_is_given_up(self):
+		push_entries(self.key, [{"n": n} for n in range(3)], max_size=100)
+		for _attempt in range(MAX_ATTEMPTS):
+			flush_entries(self.key, 2, self.fail)
+
+		flush_entries(self.key, 2, self.write)
+		self.assertEqual(self.written, [[2]])
@@ -0,0 +1,265 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Tracking refresh shared between workers.
+
+The scheduled job splits the open Shipments into batches, stores them in Redis as a run
+and enqueues a few workers on the background lane. A worker claims a batch with a lease,
+renews the lease while it works and marks the batch done when it is finished, then claims
+the next one. No two workers hold the same batch at the same time.
+
+A worker records in the run how far it got after every few Shipments. If it dies, its
+lease expires and the batch can be claimed again by a worker that carries on from there,
+so at most the Shipments of one step are requested twice. Every few minutes
+`reclaim_tracking_refresh` enqueues a worker for runs that have such batches left. A batch
+that failed `MAX_ATTEMPTS` times is given up until the next run.
+
+Runs are kept per site, as the keys are prefixed like all other cache keys.
+"""
+
+import frappe
+from frappe.utils import cint
+
+from erpnext_shipping.erpnext_shipping.codec import dumps, loads
+from erpnext_shipping.erpnext_shipping.jobs import BACKGROUND, enqueue_shipping_job
+from erpnext_shipping.erpnext_shipping.profiling import profiled
+from erpnext_shipping.erpnext_shipping.utils import get_open_shipments, refresh_tracking
+
+RUN_KEY = "erpnext_shipping:tracking_refresh"
+RUN_TTL = 24 * 60 * 60  # seconds
+LEASE_TTL = 5 * 60  # seconds
+RENEW_EVERY = 25  # Shipments refreshed between two lease renewals and progress records
+MAX_ATTEMPTS = 3
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_WORKERS = 2
+
+# claim batch ARGV[2] of run KEYS[1] for worker ARGV[1], unless it is done, leased or given up
+CLAIM_SCRIPT = """
+if redis.call("hexists", KEYS[1], "done:" .. ARGV[2]) == 1 then return false end
+if tonumber(redis.call("hget", KEYS[1], "attempts:" .. ARGV[2]) or "0") >= tonumber(ARGV[4]) then
+	return false
+end
+if not redis.call("set", KEYS[2], ARGV[1], "NX", "EX", ARGV[3]) then return false end
+redis.call("hincrby", KEYS[1], "attempts:" .. ARGV[2], 1)
+return {
+	redis.call("hget", KEYS[1], "batch:" .. ARGV[2]),
+	redis.call("hget", KEYS[1], "progress:" .. ARGV[2]) or "0",
+}
+"""
+
+# record that worker ARGV[1] refreshed the first ARGV[3] Shipments of batch ARGV[2] of run
+# KEYS[1] and extend its lease KEYS[2], if the worker still holds it
+PROGRESS_SCRIPT = """
+if redis.call("get", KEYS[2]) ~= ARGV[1] then return 0 end
+redis.call("hset", KEYS[1], "progress:" .. ARGV[2], ARGV[3])
+return redis.call("expire", KEYS[2], ARGV[4])
+"""
+
+# mark batch ARGV[2] of run KEYS[1] done, unless another worker has taken over its lease
+FINISH_SCRIPT = """
+local owner = redis.call("get", KEYS[2])
+if owner and owner ~= ARGV[1] then return 0 end
+redis.call("hset", KEYS[1], "done:" .. ARGV[2], 1)
+redis.call("del", KEYS[2])
+return 1
+"""
+
+# give up the lease KEYS[1] if worker ARGV[1] holds it
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("del", KEYS[1]) end
+return 0
+"""
+
+
+def start_tracking_refresh():
+	"""Scheduled job: split the open Shipments into batches and enqueue workers for them."""
+	if any(get_pending_batches(*get_run_state(run)) for run in get_runs()):
+		# the previous run is not done yet, its workers keep going
+		return
+
+	shipments = get_open_shipments()
+	if not shipments:
+		return
+
+	batch_size = (
+		cint(frappe.db.get_single_value("Shipping Settings", "tracking_batch_size")) or DEFAULT_BATCH_SIZE
+	)
+	batches = [shipments[start : start + batch_size] for start in range(0, len(shipments), batch_size)]
+	run = create_run(batches)
+
+	workers = (
+		cint(frappe.db.get_single_value("Shipping Settings", "tracking_refresh_workers")) or DEFAULT_WORKERS
+	)
+	for _worker in range(min(workers, len(batches))):
+		enqueue_worker(run)
+
+
+def create_run(batches: list[list[str]]) -> str:
+	run = frappe.generate_hash(length=10)
+	cache = frappe.cache()
+	pipeline = cache.pipeline()
+	pipeline.hset(
+		get_run_key(run),
+		mapping={
+			"batches": len(batches),
+			**{f"batch:{index}": dumps(batch) for index, batch in enumerate(batches)},
+		},
+	)
+	pipeline.expire(get_run_key(run), RUN_TTL)
+	pipeline.sadd(cache.make_key(f"{RUN_KEY}:runs"), run)
+	pipeline.execute()
+	return run
+
+
+def reclaim_tracking_refresh():
+	"""Scheduled job: enqueue a worker for every run with batches nobody is working on."""
+	cache = frappe.cache()
+	for run in get_runs():
+		batches, done, attempts, leased = get_run_state(run)
+		if not batches:
+			# expired
+			pipeline = cache.pipeline(transaction=False)
+			pipeline.srem(cache.make_key(f"{RUN_KEY}:runs"), run)
+			pipeline.execute()
+		elif any(index not in leased for index in get_pending_batches(batches, done, attempts, leased)):
+			enqueue_worker(run)
+
+
+def enqueue_worker(run: str):
+	enqueue_shipping_job(
+		"erpnext_shipping.erpnext_shipping.tracking_refresh.process_tracking_refresh",
+		BACKGROUND,
+		run=run,
+	)
+
+
+@profiled
+def process_tracking_refresh(run: str):
+	"""Background job: refresh batches of `run` until none is left to claim."""
+	worker = frappe.generate_hash(length=10)
+	while claim := claim_batch(run, worker):
+		index, shipments, progress = claim
+		try:
+			finished = refresh_batch(run, index, worker, shipments, progress)
+		except Exception:
+			frappe.db.rollback()
+			release_lease(run, index, worker)
+			raise
+
+		if finished:
+			finish_batch(run, index, worker)
+
+
+def refresh_batch(run: str, index: int, worker: str, shipments: list[str], progress: int = 0) -> bool:
+	"""Refresh the Shipments of a batch from `progress` on, recording progress in between.
+
+	Returns False if the lease was lost to another worker, which then carries on from the
+	progress recorded last.
+	"""
+	from erpnext_shipping.erpnext_shipping.async_transport import is_async_enabled
+
+	# requests sent concurrently finish well within a lease
+	chunk_size = len(shipments) if is_async_enabled() else RENEW_EVERY
+	for start in range(progress, len(shipments), chunk_size):
+		refresh_tracking(shipments[start : start + chunk_size])
+		frappe.db.commit()
+
+		if not record_progress(run, index, worker, min(start + chunk_size, len(shipments))):
+			return False
+
+	return True
+
+
+def claim_batch(run: str, worker: str) -> tuple[int, list[str], int] | None:
+	"""Lease the first batch of `run` that is neither done nor leased by another worker.
+
+	Returns its index, its Shipments and how many of them were refreshed already.
+	"""
+	cache = frappe.cache()
+	claim = cache.register_script(CLAIM_SCRIPT)
+	batches, done, attempts, leased = get_run_state(run)
+	for index in get_pending_batches(batches, done, attempts, leased):
+		if index in leased:
+			continue
+
+		claimed = claim(
+			keys=[get_run_key(run), get_lease_key(run, index)],
+			args=[worker, index, LEASE_TTL, MAX_ATTEMPTS],
+		)
+		if claimed:
+			batch, progress = claimed
+			return index, loads(batch), cint(progress)
+
+	return None
+
+
+def record_progress(run: str, index: int, worker: str, progress: int) -> bool:
+	"""Record the Shipments refreshed so far and renew the lease. False if the lease was lost."""
+	record = frappe.cache().register_script(PROGRESS_SCRIPT)
+	return bool(
+		record(keys=[get_run_key(run), get_lease_key(run, index)], args=[worker, index, progress, LEASE_TTL])
+	)
+
+
+def finish_batch(run: str, index: int, worker: str):
+	finish = frappe.cache().register_script(FINISH_SCRIPT)
+	finish(keys=[get_run_key(run), get_lease_key(run, index)], args=[worker, index])
+
+
+def release_lease(run: str, index: int, worker: str):
+	release = frappe.cache().register_script(RELEASE_SCRIPT)
+	release(keys=[get_lease_key(run, index)], args=[worker])
+
+
+def get_runs() -> list[str]:
+	cache = frappe.cache()
+	pipeline = cache.pipeline(transaction=False)
+	pipeline.smembers(cache.make_key(f"{RUN_KEY}:runs"))
+	(runs,) = pipeline.execute()
+	return sorted(frappe.safe_decode(run) for run in runs)
+
+
+def get_run_state(run: str) -> tuple[int, set[int], dict[int, int], set[int]]:
+	"""Return the number of batches of `run`, the done ones, the attempts per batch and the
+	leased ones.
+	"""
+	cache = frappe.cache()
+	pipeline = cache.pipeline(transaction=False)
+	pipeline.hget(get_run_key(run), "batches")
+	(batches,) = pipeline.execute()
+	batches = cint(batches)
+	if not batches:
+		return 0, set(), {}, set()
+
+	for index in range(batches):
+		pipeline.hget(get_run_key(run), f"done:{index}")
+		pipeline.hget(get_run_key(run), f"attempts:{index}")
+		pipeline.exists(get_lease_key(run, index))
+	values = pipeline.execute()
+
+	done = {index for index in range(batches) if values[3 * index]}
+	attempts = {index: cint(values[3 * index + 1]) for index in range(batches)}
+	leased = {index for index in range(batches) if values[3 * index + 2]}
+	return batches, done, attempts, leased
+
+
+def get_pending_batches(
+	batches: int, done: set[int], attempts: dict[int, int], leased: set[int]
+) -> list[int]:
+	"""Return the batches that still have to be refreshed, leased or not.
+
+	>>> get_pending_batches(4, {0}, {0: 1, 1: 1, 2: 3}, {1})
+	[1, 3]
+	"""
+	return [
+		index
+		for index in range(batches)
+		if index not in done and (index in leased or attempts.get(index, 0) < MAX_ATTEMPTS)
+	]
+
+
+def get_run_key(run: str) -> str:
+	return frappe.cache().make_key(f"{RUN_KEY}:{run}")
+
+
+def get_lease_key(run: str, index: int) -> str:
+	return frappe.cache().make_key(f"{RUN_KEY}:{run}:lease:{index}")
@@ -1,9 +1,13 @@
 # Copyright (c) 2020, Frappe Technologies and contributors
 # For license information, please see license.txt
+import sys
+
 import frappe
 from frappe import _
 from frappe.utils.data import get_link_to_form
 
+from erpnext_shipping.erpnext_shipping.profiling import profiled
+
 
 def get_tracking_url(carrier, tracking_number):
 	# Return the formatted Tracking URL.
@@ -23,6 +27,7 @@ def get_address(address_name):
 			"address_line1",
 			"address_line2",
 			"city",
+			"state",
 			"pincode",
 			"country",
 		],
@@ -89,22 +94,33 @@ def match_parcel_service_type_carrier(
 	return shipment_prices
 
 
-def show_error_alert(action):
-	log = frappe.log_error(title="Shipping Error")
-	link_to_log = get_link_to_form("Error Log", log.name, "See what happened.")
+def show_error_alert(action, service_provider=None, endpoint=None):
+	from erpnext_shipping.erpnext_shipping.doctype.shipping_error_summary.shipping_error_summary import (
+		log_provider_error,
+	)
+
+	# keep the exception, so that callers can tell whether retrying may help
+	frappe.flags.shipping_exception = sys.exc_info()[1]
+	doctype, name = log_provider_error(action, service_provider, endpoint)
+	link_to_log = get_link_to_form(doctype, name, "See what happened.")
 	frappe.msgprint(
 		msg=_("An Error occurred while {0}. {1}").format(action, link_to_log), indicator="orange", alert=True
 	)
 
 
+@profiled
 def update_tracking_info_daily():
-	"""Daily scheduled event to update Tracking info for not delivered Shipments
+	"""Update Tracking info for not delivered Shipments in the current job
 
-	Also Updates the related Delivery Notes.
+	Also Updates the related Delivery Notes. The scheduler uses
+	`tracking_refresh.start_tracking_refresh` instead, which shares the work between workers.
 	"""
-	from erpnext_shipping.erpnext_shipping.shipping import update_tracking
+	refresh_tracking(get_open_shipments())
+
 
-	shipments = frappe.get_all(
+def get_open_shipments() -> list[str]:
+	"""Return the booked Shipments whose tracking info may still change."""
+	return frappe.get_all(
 		"Shipment",
 		filters={
 			"docstatus": 1,
@@ -112,14 +128,38 @@ def update_tracking_info_daily():
 			"shipment_id": ["!=", ""],
 			"tracking_status": ["!=", "Delivered"],
 		},
+		order_by="name",
+		pluck="name",
 	)
+
+
+def refresh_tracking(shipments: list[str]):
+	"""Update the Tracking info of the given Shipments and their Delivery Notes."""
+	from erpnext_shipping.erpnext_shipping.async_transport import is_async_enabled
+	from erpnext_shipping.erpnext_shipping.shipping import update_tracking, update_tracking_concurrently
+
+	if is_async_enabled():
+		update_tracking_concurrently(
+			[
+				{
+					"name": shipment_doc.name,
+					"service_provider": shipment_doc.service_provider,
+					"shipping_account": shipment_doc.get("shipping_account"),
+					"shipment_id": shipment_doc.shipment_id,
+					"delivery_notes": [row.delivery_note for row in shipment_doc.shipment_delivery_note],
+				}
+				for shipment_doc in (frappe.get_doc("Shipment", shipment) for shipment in shipments)
+			]
+		)
+		return
+
 	for shipment in shipments:
-		shipment_doc = frappe.get_doc("Shipment", shipment.name)
+		shipment_doc = frappe.get_doc("Shipment", shipment)
 		tracking_info = update_tracking(
-			shipment.name,
+			shipment,
 			shipment_doc.service_provider,
 			shipment_doc.shipment_id,
-			shipment_doc.shipment_delivery_notes,
+			[row.delivery_note for row in shipment_doc.shipment_delivery_note],
 		)
 
 		if tracking_info:
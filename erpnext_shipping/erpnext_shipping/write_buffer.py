@@ -0,0 +1,68 @@
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Database writes buffered in Redis and done in batches by a scheduled job.
+
+Callers push entries to a Redis list with one round trip. The flush job moves a batch to
+a processing list, writes it and removes it from there only after the commit, so a failed
+write doesn't lose the batch: the next flush tries it again. A batch that fails
+`MAX_ATTEMPTS` times is given up and logged, so that one bad entry doesn't block the
+buffer.
+"""
+
+import pickle
+from collections.abc import Callable
+
+import frappe
+
+MAX_ATTEMPTS = 3
+
+# move up to ARGV[1] entries of buffer KEYS[1] to the processing list KEYS[2], unless it
+# still holds a batch; return the size of the batch to write
+CLAIM_SCRIPT = """
+if redis.call("llen", KEYS[2]) == 0 then
+	local entries = redis.call("lrange", KEYS[1], 0, ARGV[1] - 1)
+	if #entries == 0 then return 0 end
+	redis.call("rpush", KEYS[2], unpack(entries))
+	redis.call("ltrim", KEYS[1], #entries, -1)
+end
+return redis.call("llen", KEYS[2])
+"""
+
+
+def push_entries(buffer_key: str, entries: list[dict], max_size: int):
+	"""Append entries to a buffer, keeping the latest `max_size` if the flush job doesn't run."""
+	if not entries:
+		return
+
+	cache = frappe.cache()
+	key = cache.make_key(buffer_key)
+	pipeline = cache.pipeline(transaction=False)
+	pipeline.rpush(key, *(pickle.dumps(entry) for entry in entries))
+	pipeline.ltrim(key, -max_size, -1)
+	pipeline.execute()
+
+
+def flush_entries(buffer_key: str, batch_size: int, write: Callable[[list[dict]], None]):
+	"""Call `write` with batches of the buffered entries and commit after each of them."""
+	cache = frappe.cache()
+	key = cache.make_key(buffer_key)
+	processing_key = cache.make_key(f"{buffer_key}:processing")
+	attempts_key = cache.make_key(f"{buffer_key}:attempts")
+	claim = cache.register_script(CLAIM_SCRIPT)
+
+	while claim(keys=[key, processing_key], args=[batch_size]):
+		pipeline = cache.pipeline(transaction=False)
+		pipeline.lrange(processing_key, 0, -1)
+		(entries,) = pipeline.execute()
+		try:
+			write([pickle.loads(entry) for entry in entries])
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(title="Shipping Error")
+			if cache.incr(attempts_key) >= MAX_ATTEMPTS:
+				# give the batch up
+				cache.delete(processing_key, attempts_key)
+			break
+
+		cache.delete(processing_key, attempts_key)
@@ -32,7 +32,7 @@ app_include_js = "shipping.bundle.js"
 
 # include js in doctype views
 doctype_js = {"Shipment": "public/js/shipment.js"}
-# doctype_list_js = {"doctype" : "public/js/doctype_list.js"}
+doctype_list_js = {"Shipment": "public/js/shipment_list.js"}
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
 # doctype_calendar_js = {"doctype" : "public/js/doctype_calendar.js"}
 
@@ -89,18 +89,49 @@ after_install = "erpnext_shipping.install.after_install"
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# }
-# }
+doc_events = {
+	"Shipment": {
+		"on_submit": [
+			"erpnext_shipping.erpnext_shipping.rate_cache.prefetch_shipping_rates",
+			"erpnext_shipping.erpnext_shipping.doctype.carrier_selection_rule.carrier_selection_rule.auto_book_shipment",
+		],
+	}
+}
 
 # Scheduled Tasks
 # ---------------
 
-scheduler_events = {"daily": ["erpnext_shipping.erpnext_shipping.utils.update_tracking_info_daily"]}
+scheduler_events = {
+	"daily": [
+		"erpnext_shipping.erpnext_shipping.tracking_refresh.start_tracking_refresh",
+		"erpnext_shipping.erpnext_shipping.doctype.shipping_label.shipping_label.compact_label_storage",
+	],
+	"cron": {
+		"* * * * *": [
+			"erpnext_shipping.erpnext_shipping.doctype.shipping_api_log.shipping_api_log.flush_api_logs",
+			"erpnext_shipping.erpnext_shipping.doctype.carrier_service_limit.carrier_service_limit.flush_service_limits",
+			"erpnext_shipping.erpnext_shipping.doctype.shipping_rate_quote.shipping_rate_quote.flush_rate_quotes",
+		],
+		"*/5 * * * *": [
+			"erpnext_shipping.erpnext_shipping.doctype.shipping_outbox.shipping_outbox.replay_outbox",
+			"erpnext_shipping.erpnext_shipping.tracking_refresh.reclaim_tracking_refresh",
+		],
+	},
+}
+
+# Background job lanes of the shipping integration, see erpnext_shipping/erpnext_shipping/jobs.py.
+# Jobs use `queue` if a worker is configured for it, else `fallback`.
+shipping_job_lanes = {
+	"interactive": {"queue": "shipping_interactive", "fallback": "short"},
+	"bulk": {"queue": "shipping_bulk", "fallback": "long"},
+	"background": {"queue": "shipping_background", "fallback": "long"},
+}
+
+default_log_clearing_doctypes = {
+	"Shipping Error Summary": 30,
+	"Shipping API Log": 7,
+	"Shipping Profile": 7,
+}
 
 # Testing
 # -------
@@ -169,6 +200,7 @@ shipping_custom_fields = {
 			"fieldtype": "Data",
 			"read_only": 1,
 			"translatable": 0,
+			"search_index": 1,
 			"insert_after": "shipping_col_break",
 		},
 		{
@@ -195,5 +227,61 @@ shipping_custom_fields = {
 			"translatable": 0,
 			"insert_after": "tracking_status",
 		},
-	]
+	],
+	"Shipment": [
+		{
+			"fieldname": "shipping_account",
+			"label": "Provider Account",
+			"fieldtype": "Data",
+			"read_only": 1,
+			"translatable": 0,
+			"no_copy": 1,
+			"insert_after": "service_provider",
+		},
+		{
+			"fieldname": "shipment_pickup",
+			"label": "Shipment Pickup",
+			"fieldtype": "Link",
+			"options": "Shipment Pickup",
+			"read_only": 1,
+			"no_copy": 1,
+			"insert_after": "shipping_account",
+		},
+	],
+	"Item": [
+		{
+			"fieldname": "shipping_dimensions_section",
+			"label": "Shipping Dimensions",
+			"fieldtype": "Section Break",
+			"collapsible": 1,
+			"insert_after": "weight_uom",
+		},
+		{
+			"fieldname": "shipping_length",
+			"label": "Length (cm)",
+			"fieldtype": "Float",
+			"insert_after": "shipping_dimensions_section",
+		},
+		{
+			"fieldname": "shipping_width",
+			"label": "Width (cm)",
+			"fieldtype": "Float",
+			"insert_after": "shipping_length",
+		},
+		{
+			"fieldname": "shipping_height",
+			"label": "Height (cm)",
+			"fieldtype": "Float",
+			"insert_after": "shipping_width",
+		},
+	],
+	"Shipment Parcel Template": [
+		{
+			"fieldname": "max_weight",
+			"label": "Max Weight (kg)",
+			"fieldtype": "Float",
+			"description": "Used when packing items into parcels. Leave empty for no limit.",
+			"insert_after": "weight",
+		},
+	],
 }
@@ -2,7 +2,25 @@
 // For license information, please see license.txt
 
 frappe.ui.form.on("Shipment", {
+	setup: function (frm) {
+		frappe.realtime.off("shipment_booking_progress");
+		frappe.realtime.on("shipment_booking_progress", (data) => {
+			if (data.shipment === frm.doc.name) {
+				frm.events.show_booking_progress(frm, data);
+			}
+		});
+	},
+
 	refresh: function (frm) {
+		if (frm.doc.docstatus === 0 && (frm.doc.shipment_delivery_note || []).length) {
+			frm.add_custom_button(
+				__("Pack Parcels"),
+				function () {
+					return frm.events.pack_parcels(frm);
+				},
+				__("Tools")
+			);
+		}
 		if (frm.doc.docstatus === 1 && !frm.doc.shipment_id) {
 			frm.add_custom_button(__("Fetch Shipping Rates"), function () {
 				return frm.events.fetch_shipping_rates(frm);
@@ -16,6 +34,15 @@ frappe.ui.form.on("Shipment", {
 				},
 				__("Tools")
 			);
+			if (["EasyPost", "SendCloud"].includes(frm.doc.service_provider)) {
+				frm.add_custom_button(
+					__("Print on Label Printer"),
+					function () {
+						return frm.events.print_raw_label(frm);
+					},
+					__("Tools")
+				);
+			}
 			if (frm.doc.tracking_status != "Delivered") {
 				frm.add_custom_button(
 					__("Update Tracking"),
@@ -49,41 +76,111 @@ frappe.ui.form.on("Shipment", {
 		}
 	},
 
+	pack_parcels: function (frm) {
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.cartonization.get_packed_parcels",
+			freeze: true,
+			freeze_message: __("Packing Parcels"),
+			args: {
+				delivery_notes: frm.doc.shipment_delivery_note.map((d) => d.delivery_note),
+			},
+			callback: function (r) {
+				if (r.message) {
+					frm.clear_table("shipment_parcel");
+					r.message.forEach((parcel) => frm.add_child("shipment_parcel", parcel));
+					frm.refresh_field("shipment_parcel");
+					frm.dirty();
+				}
+			},
+		});
+	},
+
 	fetch_shipping_rates: function (frm) {
-		if (!frm.doc.shipment_id) {
-			frappe.call({
-				method: "erpnext_shipping.erpnext_shipping.shipping.fetch_shipping_rates",
-				freeze: true,
-				freeze_message: __("Fetching Shipping Rates"),
-				args: {
-					pickup_from_type: frm.doc.pickup_from_type,
-					delivery_to_type: frm.doc.delivery_to_type,
-					pickup_address_name: frm.doc.pickup_address_name,
-					delivery_address_name: frm.doc.delivery_address_name,
-					parcels: frm.doc.shipment_parcel,
-					description_of_content: frm.doc.description_of_content,
-					pickup_date: frm.doc.pickup_date,
-					pickup_contact_name:
-						frm.doc.pickup_from_type === "Company"
-							? frm.doc.pickup_contact_person
-							: frm.doc.pickup_contact_name,
-					delivery_contact_name: frm.doc.delivery_contact_name,
-					value_of_goods: frm.doc.value_of_goods,
-				},
-				callback: function (r) {
-					if (r.message && r.message.length) {
-						select_from_available_services(frm, r.message);
-					} else {
-						frappe.msgprint({
-							message: __("No Shipment Services available"),
-							title: __("Note"),
-						});
-					}
-				},
-			});
-		} else {
+		if (frm.doc.shipment_id) {
 			frappe.throw(__("Shipment already created"));
 		}
+
+		const args = {
+			pickup_from_type: frm.doc.pickup_from_type,
+			delivery_to_type: frm.doc.delivery_to_type,
+			pickup_address_name: frm.doc.pickup_address_name,
+			delivery_address_name: frm.doc.delivery_address_name,
+			parcels: frm.doc.shipment_parcel,
+			description_of_content: frm.doc.description_of_content,
+			pickup_date: frm.doc.pickup_date,
+			pickup_contact_name:
+				frm.doc.pickup_from_type === "Company"
+					? frm.doc.pickup_contact_person
+					: frm.doc.pickup_contact_name,
+			delivery_contact_name: frm.doc.delivery_contact_name,
+			value_of_goods: frm.doc.value_of_goods,
+			shipment: frm.doc.name,
+		};
+
+		frappe.db
+			.get_single_value("Shipping Settings", "stream_shipping_rates")
+			.then((stream_shipping_rates) => {
+				if (stream_shipping_rates) {
+					frm.events.stream_shipping_rates(frm, args);
+					return;
+				}
+
+				frappe.call({
+					method: "erpnext_shipping.erpnext_shipping.shipping.fetch_shipping_rates",
+					freeze: true,
+					freeze_message: __("Fetching Shipping Rates"),
+					args: args,
+					callback: function (r) {
+						if (r.message && r.message.length) {
+							select_from_available_services(frm, r.message);
+						} else {
+							frappe.msgprint({
+								message: __("No Shipment Services available"),
+								title: __("Note"),
+							});
+						}
+					},
+				});
+			});
+	},
+
+	stream_shipping_rates: function (frm, args) {
+		// Open the dialog at once and add each provider's rates when they arrive
+		const rate_request_id = frappe.utils.get_random(10);
+		let dialog = null;
+		let early_rates = [];
+		const on_rates = (data) => {
+			if (data.rate_request_id !== rate_request_id) {
+				return;
+			}
+			if (dialog) {
+				dialog.add_services(data.provider, data.rates);
+			} else {
+				// a provider may answer before the dialog exists
+				early_rates.push(data);
+			}
+		};
+
+		frappe.realtime.on("shipping_rates", on_rates);
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.shipping.fetch_shipping_rates_async",
+			args: { rate_request_id: rate_request_id, ...args },
+			callback: function (r) {
+				const { providers, rates } = r.message || {};
+				if (!providers?.length && !rates?.length) {
+					frappe.realtime.off("shipping_rates", on_rates);
+					frappe.msgprint({
+						message: __("No Shipment Services available"),
+						title: __("Note"),
+					});
+					return;
+				}
+
+				dialog = select_from_available_services(frm, rates, providers);
+				dialog.onhide = () => frappe.realtime.off("shipping_rates", on_rates);
+				early_rates.forEach((data) => dialog.add_services(data.provider, data.rates));
+			},
+		});
 	},
 
 	print_shipping_label: function (frm) {
@@ -115,6 +212,46 @@ frappe.ui.form.on("Shipment", {
 		});
 	},
 
+	print_raw_label: function (frm) {
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.label_printing.print_raw_label",
+			freeze: true,
+			freeze_message: __("Sending Label to Printer"),
+			args: {
+				shipment: frm.doc.name,
+			},
+			callback: function (r) {
+				if (r.message) {
+					frappe.show_alert({
+						message: __("{0} label(s) sent to the label printer", [r.message]),
+						indicator: "green",
+					});
+				}
+			},
+		});
+	},
+
+	show_booking_progress: function (frm, data) {
+		const title = __("Creating Shipment");
+		if (data.status === "queued" || data.status === "progress") {
+			frappe.show_progress(title, data.progress, data.total, data.description);
+		} else if (data.status === "done") {
+			frappe.hide_progress();
+			frm.reload_doc();
+			frappe.msgprint({
+				message: __("Shipment {1} has been created with {0}.", [
+					data.shipment_info.service_provider,
+					data.shipment_info.shipment_id.bold(),
+				]),
+				title: __("Shipment Created"),
+				indicator: "green",
+			});
+		} else if (data.status === "failed") {
+			frappe.hide_progress();
+			frappe.msgprint({ message: data.description, title: title, indicator: "red" });
+		}
+	},
+
 	update_tracking: function (frm, service_provider, shipment_id) {
 		let delivery_notes = [];
 		(frm.doc.shipment_delivery_note || []).forEach((d) => {
@@ -139,8 +276,8 @@ frappe.ui.form.on("Shipment", {
 	},
 });
 
-function select_from_available_services(frm, available_services) {
-	const arranged_services = available_services.reduce(
+function arrange_services(available_services) {
+	return available_services.reduce(
 		(prev, curr) => {
 			if (curr.is_preferred) {
 				prev.preferred_services.push(curr);
@@ -151,6 +288,10 @@ function select_from_available_services(frm, available_services) {
 		},
 		{ preferred_services: [], other_services: [] }
 	);
+}
+
+function select_from_available_services(frm, available_services, pending_providers = []) {
+	let arranged_services = arrange_services(available_services);
 
 	const dialog = new frappe.ui.Dialog({
 		title: __("Select Service to Create Shipment"),
@@ -169,12 +310,31 @@ function select_from_available_services(frm, available_services) {
 		delivery_notes.push(d.delivery_note);
 	});
 
-	dialog.fields_dict.available_services.$wrapper.html(
-		frappe.render_template("shipment_service_selector", {
-			header_columns: [__("Platform"), __("Carrier"), __("Parcel Service"), __("Price"), ""],
-			data: arranged_services,
-		})
-	);
+	const render = () => {
+		dialog.fields_dict.available_services.$wrapper.html(
+			frappe.render_template("shipment_service_selector", {
+				header_columns: [
+					__("Platform"),
+					__("Carrier"),
+					__("Parcel Service"),
+					__("Price"),
+					"",
+				],
+				data: arranged_services,
+				pending_providers: pending_providers,
+			})
+		);
+	};
+	render();
+
+	dialog.add_services = function (provider, services) {
+		available_services = available_services
+			.concat(services)
+			.sort((a, b) => a.total_price - b.total_price);
+		arranged_services = arrange_services(available_services);
+		pending_providers = pending_providers.filter((p) => p !== provider);
+		render();
+	};
 
 	dialog.$body.on("click", ".btn", function () {
 		let service_type = $(this).attr("data-type");
@@ -184,48 +344,62 @@ function select_from_available_services(frm, available_services) {
 	});
 
 	frm.select_row = function (service_data) {
-		frappe.call({
-			method: "erpnext_shipping.erpnext_shipping.shipping.create_shipment",
-			freeze: true,
-			freeze_message: __("Creating Shipment"),
-			args: {
-				shipment: frm.doc.name,
-				pickup_from_type: frm.doc.pickup_from_type,
-				delivery_to_type: frm.doc.delivery_to_type,
-				pickup_address_name: frm.doc.pickup_address_name,
-				delivery_address_name: frm.doc.delivery_address_name,
-				shipment_parcel: frm.doc.shipment_parcel,
-				description_of_content: frm.doc.description_of_content,
-				pickup_date: frm.doc.pickup_date,
-				pickup_contact_name:
-					frm.doc.pickup_from_type === "Company"
-						? frm.doc.pickup_contact_person
-						: frm.doc.pickup_contact_name,
-				delivery_contact_name: frm.doc.delivery_contact_name,
-				value_of_goods: frm.doc.value_of_goods,
-				service_data: service_data,
-				delivery_notes: delivery_notes,
-			},
-			callback: function (r) {
-				if (!r.exc) {
-					frm.reload_doc();
-					frappe.msgprint({
-						message: __("Shipment {1} has been created with {0}.", [
-							r.message.service_provider,
-							r.message.shipment_id.bold(),
-						]),
-						title: __("Shipment Created"),
-						indicator: "green",
+		const args = {
+			shipment: frm.doc.name,
+			pickup_from_type: frm.doc.pickup_from_type,
+			delivery_to_type: frm.doc.delivery_to_type,
+			pickup_address_name: frm.doc.pickup_address_name,
+			delivery_address_name: frm.doc.delivery_address_name,
+			shipment_parcel: frm.doc.shipment_parcel,
+			description_of_content: frm.doc.description_of_content,
+			pickup_date: frm.doc.pickup_date,
+			pickup_contact_name:
+				frm.doc.pickup_from_type === "Company"
+					? frm.doc.pickup_contact_person
+					: frm.doc.pickup_contact_name,
+			delivery_contact_name: frm.doc.delivery_contact_name,
+			value_of_goods: frm.doc.value_of_goods,
+			service_data: service_data,
+			delivery_notes: delivery_notes,
+		};
+
+		frappe.db
+			.get_single_value("Shipping Settings", "enqueue_shipment_booking")
+			.then((enqueue_shipment_booking) => {
+				if (enqueue_shipment_booking) {
+					frappe.call({
+						method: "erpnext_shipping.erpnext_shipping.shipping.enqueue_create_shipment",
+						args: args,
 					});
-					frm.events.update_tracking(
-						frm,
-						r.message.service_provider,
-						r.message.shipment_id
-					);
+				} else {
+					create_shipment(frm, args);
 				}
-			},
-		});
+			});
 		dialog.hide();
 	};
 	dialog.show();
+	return dialog;
+}
+
+function create_shipment(frm, args) {
+	frappe.call({
+		method: "erpnext_shipping.erpnext_shipping.shipping.create_shipment",
+		freeze: true,
+		freeze_message: __("Creating Shipment"),
+		args: args,
+		callback: function (r) {
+			if (!r.exc) {
+				frm.reload_doc();
+				frappe.msgprint({
+					message: __("Shipment {1} has been created with {0}.", [
+						r.message.service_provider,
+						r.message.shipment_id.bold(),
+					]),
+					title: __("Shipment Created"),
+					indicator: "green",
+				});
+				frm.events.update_tracking(frm, r.message.service_provider, r.message.shipment_id);
+			}
+		},
+	});
 }
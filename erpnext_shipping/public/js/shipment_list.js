@@ -0,0 +1,123 @@
+// Copyright (c) 2026, Frappe and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Shipment"] = frappe.listview_settings["Shipment"] || {};
+frappe.listview_settings["Shipment"].add_fields = [
+	...(frappe.listview_settings["Shipment"].add_fields || []),
+	"shipment_id",
+];
+
+const shipment_onload = frappe.listview_settings["Shipment"].onload;
+frappe.listview_settings["Shipment"].onload = function (listview) {
+	shipment_onload && shipment_onload(listview);
+
+	listview.page.add_action_item(__("Book by Carrier Selection Rules"), function () {
+		const shipments = listview
+			.get_checked_items()
+			.filter((d) => d.docstatus === 1 && !d.shipment_id)
+			.map((d) => d.name);
+		if (!shipments.length) {
+			frappe.msgprint(__("Please select submitted Shipments that have not been booked yet."));
+			return;
+		}
+
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.doctype.carrier_selection_rule.carrier_selection_rule.enqueue_book_shipments_by_rules",
+			args: { shipments: shipments },
+			callback: function (r) {
+				if (!r.exc) {
+					frappe.show_alert({
+						message: __("Booking {0} Shipments in the background", [shipments.length]),
+						indicator: "blue",
+					});
+				}
+			},
+		});
+	});
+
+	listview.page.add_action_item(__("Fetch Shipping Labels"), function () {
+		const shipments = listview
+			.get_checked_items()
+			.filter((d) => d.docstatus === 1 && d.shipment_id)
+			.map((d) => d.name);
+		if (!shipments.length) {
+			frappe.msgprint(__("Please select booked Shipments."));
+			return;
+		}
+
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.shipping.enqueue_fetch_shipping_labels",
+			args: { shipments: shipments },
+			callback: function (r) {
+				if (!r.exc) {
+					frappe.show_alert({
+						message: __("Fetching the labels of {0} Shipments in the background", [
+							shipments.length,
+						]),
+						indicator: "blue",
+					});
+				}
+			},
+		});
+	});
+
+	listview.page.add_action_item(__("Print on Label Printer"), function () {
+		const shipments = listview
+			.get_checked_items()
+			.filter((d) => d.docstatus === 1 && d.shipment_id)
+			.map((d) => d.name);
+		if (!shipments.length) {
+			frappe.msgprint(__("Please select booked Shipments."));
+			return;
+		}
+
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.label_printing.enqueue_print_raw_labels",
+			args: { shipments: shipments },
+			callback: function (r) {
+				if (!r.exc) {
+					frappe.show_alert({
+						message: __("Printing the labels of {0} Shipments in the background", [
+							shipments.length,
+						]),
+						indicator: "blue",
+					});
+				}
+			},
+		});
+	});
+
+	listview.page.add_action_item(__("Book Pickups"), function () {
+		frappe.prompt(
+			{
+				fieldname: "pickup_date",
+				fieldtype: "Date",
+				label: __("Pickup Date"),
+				default: frappe.datetime.get_today(),
+				reqd: 1,
+			},
+			(values) => {
+				frappe.call({
+					method: "erpnext_shipping.erpnext_shipping.doctype.shipment_pickup.shipment_pickup.enqueue_pickup_booking",
+					args: { pickup_date: values.pickup_date },
+					callback: function (r) {
+						if (r.exc) return;
+						if (r.message) {
+							frappe.show_alert({
+								message: __("Booking one pickup per address and carrier in the background"),
+								indicator: "blue",
+							});
+						} else {
+							frappe.show_alert({
+								message: __("The pickups of this date are being booked already"),
+								indicator: "orange",
+							});
+						}
+					},
+				});
+			},
+			__("Book Carrier Pickups"),
+			__("Book")
+		);
+	});
+};